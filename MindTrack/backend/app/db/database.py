@@ -1,8 +1,11 @@
 import os
 from typing import Generator
-from sqlalchemy import create_engine
+import logging
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import declarative_base, sessionmaker, Session
 
+from app.db import instrumentation, slow_query
+
 # app/db/database.py
 """
 Database setup for MindTrack.
@@ -25,17 +28,27 @@ Environment:
 # Read DB URL from environment, default to sqlite for local development
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./mindtrack.db")
 
-# If using SQLite, disable same-thread check (required for SQLite + multithreaded frameworks)
-# For PostgreSQL, ensure SSL mode is properly set
-connect_args = {}
-if DATABASE_URL.startswith("sqlite"):
-    connect_args["check_same_thread"] = False
-elif DATABASE_URL.startswith("postgresql"):
-    # Railway provides PostgreSQL URLs with SSL enabled
-    connect_args["sslmode"] = "require"
+def connect_args_for(url: str) -> dict:
+    """Driver options for a database URL (shared with jobs that open their own engine)."""
+    connect_args = {}
+    # If using SQLite, disable same-thread check (required for SQLite + multithreaded frameworks)
+    # For PostgreSQL, ensure SSL mode is properly set
+    if url.startswith("sqlite"):
+        connect_args["check_same_thread"] = False
+    elif url.startswith("postgresql"):
+        # Railway provides PostgreSQL URLs with SSL enabled
+        connect_args["sslmode"] = "require"
+    return connect_args
+
 
 # Create engine
-engine = create_engine(DATABASE_URL, connect_args=connect_args, pool_pre_ping=True)
+engine = create_engine(DATABASE_URL, connect_args=connect_args_for(DATABASE_URL), pool_pre_ping=True)
+# Per-request query counts and DB time (see app/db/instrumentation.py)
+instrumentation.install(engine)
+# Statements over SLOW_QUERY_THRESHOLD_MS are logged with their plan (see app/db/slow_query.py)
+slow_query.install_from_env()
+
+logger = logging.getLogger(__name__)
 
 # Declarative base for models to inherit from
 Base = declarative_base()
@@ -63,6 +76,34 @@ def init_db() -> None:
     Call this on application startup (e.g. in FastAPI startup event).
     """
     Base.metadata.create_all(bind=engine)
+    _sync_existing_tables()
+
+
+def _sync_existing_tables() -> None:
+    """
+    create_all() skips tables that already exist. Add nullable columns and
+    indexes introduced after a table was first created, so an existing local
+    database (e.g. ./mindtrack.db) keeps working without a migration step.
+    """
+    inspector = inspect(engine)
+    existing = set(inspector.get_table_names())
+    quote = engine.dialect.identifier_preparer.quote
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing:
+            continue
+        present = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in present or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=engine.dialect)
+            with engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} {column_type}"))
+            logger.info("Added column %s.%s", table.name, column.name)
+        for index in table.indexes:
+            try:
+                index.create(bind=engine, checkfirst=True)
+            except Exception as e:
+                logger.warning("Could not create index %s on %s: %s", index.name, table.name, e)
 
 
 # Usage notes:
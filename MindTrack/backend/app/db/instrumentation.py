@@ -0,0 +1,162 @@
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from sqlalchemy import event
+
+# app/db/instrumentation.py
+"""
+Per-request SQL accounting.
+
+install(engine) adds before/after_cursor_execute hooks that time every
+statement. Inside track() (opened per HTTP request by SQLStatsMiddleware)
+the statements are counted into a RequestStats held in a contextvar, so
+concurrent requests never mix. Process-wide totals feed /metrics.
+
+At the end of a request, any statement executed more than
+SQL_REPEAT_WARN_THRESHOLD times (default 10) is logged as a likely N+1.
+With SQL_DEBUG_HEADERS=true responses carry X-DB-Query-Count and
+X-DB-Time-Ms.
+"""
+
+logger = logging.getLogger(__name__)
+
+REPEAT_WARN_THRESHOLD = int(os.getenv("SQL_REPEAT_WARN_THRESHOLD", "10"))
+
+
+@dataclass
+class RequestStats:
+    queries: int = 0
+    db_time: float = 0.0
+    statements: Counter = field(default_factory=Counter)
+    label: str = ""
+
+    def repeated(self, threshold: int = REPEAT_WARN_THRESHOLD) -> Dict[str, int]:
+        return {stmt: n for stmt, n in self.statements.items() if n > threshold}
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("sql_request_stats", default=None)
+
+_totals_lock = threading.Lock()
+_totals = {"queries": 0, "db_time_s": 0.0, "repeat_warnings": 0}
+
+# Listeners may observe statements executed by any module; they must stay cheap
+_listeners: list = []
+
+
+def current() -> Optional[RequestStats]:
+    return _current.get()
+
+
+def _before(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("_query_start", []).append(time.perf_counter())
+
+
+def _after(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("_query_start")
+    elapsed = time.perf_counter() - starts.pop() if starts else 0.0
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_time += elapsed
+        stats.statements[statement] += 1
+    with _totals_lock:
+        _totals["queries"] += 1
+        _totals["db_time_s"] += elapsed
+    for listener in _listeners:
+        listener(statement, parameters, elapsed, conn)
+
+
+def install(engine: Any) -> None:
+    """Attach the timing hooks to an engine (idempotent)."""
+    if not event.contains(engine, "before_cursor_execute", _before):
+        event.listen(engine, "before_cursor_execute", _before)
+        event.listen(engine, "after_cursor_execute", _after)
+
+
+def add_listener(fn: Callable[[str, Any, float, Any], None]) -> None:
+    """Call fn(statement, parameters, elapsed_s, connection) after every statement."""
+    if fn not in _listeners:
+        _listeners.append(fn)
+
+
+def remove_listener(fn: Callable[[str, Any, float, Any], None]) -> None:
+    if fn in _listeners:
+        _listeners.remove(fn)
+
+
+@contextmanager
+def track(label: str = "", threshold: int = REPEAT_WARN_THRESHOLD) -> Iterator[RequestStats]:
+    """Count the statements run in this context; warn about repeated ones on exit."""
+    stats = RequestStats(label=label)
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+        repeated = stats.repeated(threshold)
+        if repeated:
+            with _totals_lock:
+                _totals["repeat_warnings"] += 1
+            for stmt, n in sorted(repeated.items(), key=lambda kv: -kv[1]):
+                logger.warning("Possible N+1 in %s: statement ran %d times: %s",
+                               stats.label or "request", n, " ".join(stmt.split())[:200])
+
+
+def totals() -> Dict[str, Any]:
+    with _totals_lock:
+        return dict(_totals)
+
+
+def route_template(scope: Dict[str, Any]) -> Optional[str]:
+    """Matched route template including router prefixes, e.g. /habits/user/{user_id}; None if unrouted."""
+    # Newer FastAPI keeps the router's own route in scope["route"] and the prefixed path here
+    effective = (scope.get("fastapi") or {}).get("effective_route_context")
+    path = getattr(effective, "path", None)
+    if path:
+        return path
+    return getattr(scope.get("route"), "path", None)
+
+
+def route_label(scope: Dict[str, Any]) -> str:
+    """Method and route template (e.g. GET /habits/user/{user_id}); the raw path if unrouted."""
+    return f"{scope.get('method', '')} {route_template(scope) or scope.get('path', '')}"
+
+
+def debug_headers_enabled() -> bool:
+    return os.getenv("SQL_DEBUG_HEADERS", "false").lower() in ("1", "true", "yes")
+
+
+class SQLStatsMiddleware:
+    """ASGI middleware opening a track() scope per HTTP request."""
+
+    def __init__(self, app: Any, headers: Optional[bool] = None):
+        self.app = app
+        self.headers = headers  # None: follow SQL_DEBUG_HEADERS
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        add_headers = debug_headers_enabled() if self.headers is None else self.headers
+        with track() as stats:
+
+            async def send_with_headers(message):
+                if add_headers and message["type"] == "http.response.start":
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-db-query-count", str(stats.queries).encode()))
+                    headers.append((b"x-db-time-ms", f"{stats.db_time * 1000:.2f}".encode()))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_headers)
+            finally:
+                # Label the N+1 warning with the matched route
+                stats.label = route_label(scope)
@@ -0,0 +1,244 @@
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from app.db import instrumentation
+from app.observability import metrics
+
+# app/db/slow_query.py
+"""
+Slow-query log.
+
+Registered as an instrumentation listener, so it sees every statement run
+through the application engine (and the engines of the worker and
+recompute jobs). A statement slower than SLOW_QUERY_THRESHOLD_MS (default
+250; 0 disables the log) is fingerprinted by its normalized SQL (literals and
+IN-lists collapsed). For each fingerprint:
+
+- the first occurrence in a SLOW_QUERY_DEDUP_SECONDS window (default 300)
+  is logged with the parameter shape (types only, never values), the
+  duration and the plan: EXPLAIN QUERY PLAN on SQLite, EXPLAIN on
+  PostgreSQL, run on the same connection and parameters (in a savepoint,
+  so a failing EXPLAIN cannot abort the application's transaction)
+- later occurrences in the window are only counted, and the count is
+  reported with the next log line
+- at most SLOW_QUERY_MAX_PER_MINUTE reports (default 30) are written per
+  process, so a pathological burst cannot flood the log or the database
+  with EXPLAINs
+
+A plan that scans a watched table (habit_entries, badges, reminders) without
+an index is called out explicitly. recent() feeds GET /admin/slow-queries.
+"""
+
+logger = logging.getLogger(__name__)
+
+WATCHED_TABLES = ("habit_entries", "badges", "reminders")
+MAX_FINGERPRINTS = 500
+
+_IN_LIST = re.compile(r"\(\s*(?:\?|%s|%\(\w+\)s|:\w+|\$\d+)(?:\s*,\s*(?:\?|%s|%\(\w+\)s|:\w+|\$\d+))+\s*\)")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|\$\d+|(?<![:\w]):\w+")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])")
+_EXPLAINABLE = ("select", "with", "update", "delete")
+
+
+def normalize(statement: str) -> str:
+    """SQL with literals and placeholder lists collapsed, so equivalent statements share a fingerprint."""
+    sql = " ".join(statement.split())
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _PLACEHOLDER.sub("?", sql)
+    return _IN_LIST.sub("(?, ...)", sql)
+
+
+def _type_name(value: Any) -> str:
+    return "null" if value is None else type(value).__name__
+
+
+def parameter_shape(parameters: Any) -> Any:
+    """Types of the bound parameters (never their values)."""
+    if isinstance(parameters, dict):
+        return {k: _type_name(v) for k, v in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (list, tuple, dict)):
+            return f"{len(parameters)} x {parameter_shape(parameters[0])}"
+        return [_type_name(v) for v in parameters]
+    return _type_name(parameters)
+
+
+def explain(conn: Any, statement: str, parameters: Any) -> List[str]:
+    """
+    Plan of a statement as text lines, via a raw DBAPI cursor (bypasses the
+    engine's event hooks). Inside a transaction the EXPLAIN runs in a
+    savepoint: on PostgreSQL a failed statement would otherwise abort the
+    caller's transaction.
+    """
+    dialect = conn.engine.dialect.name
+    prefix = "EXPLAIN QUERY PLAN " if dialect == "sqlite" else "EXPLAIN "
+    raw = conn.connection
+    savepoint = conn.in_transaction() and getattr(raw, "autocommit", False) is not True
+    cursor = raw.cursor()
+    try:
+        if savepoint:
+            cursor.execute("SAVEPOINT slow_query_explain")
+        try:
+            cursor.execute(prefix + statement, parameters)
+            rows = cursor.fetchall()
+        except Exception:
+            if savepoint:
+                cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+            raise
+        finally:
+            if savepoint:
+                cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+    finally:
+        cursor.close()
+    if dialect == "sqlite":
+        # (id, parent, notused, detail)
+        return [str(row[-1]) for row in rows]
+    return [str(row[0]) for row in rows]
+
+
+def full_scans(plan: List[str], tables=WATCHED_TABLES) -> List[str]:
+    """Watched tables read without an index according to the plan."""
+    found = []
+    for line in plan:
+        for table in tables:
+            sqlite_scan = re.search(rf"\bSCAN (?:TABLE )?{table}\b(?! USING (?:COVERING )?INDEX)", line)
+            pg_scan = f"Seq Scan on {table}" in line
+            if (sqlite_scan or pg_scan) and table not in found:
+                found.append(table)
+    return found
+
+
+@dataclass
+class SlowQueryStats:
+    fingerprint: str
+    count: int = 0
+    total_s: float = 0.0
+    max_s: float = 0.0
+    suppressed: int = 0
+    last_logged: float = 0.0
+    last_plan: List[str] = field(default_factory=list)
+    full_scans: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "fingerprint": self.fingerprint,
+            "count": self.count,
+            "total_ms": self.total_s * 1000.0,
+            "max_ms": self.max_s * 1000.0,
+            "plan": self.last_plan,
+            "full_scans": self.full_scans,
+        }
+
+
+class SlowQueryLog:
+    """Instrumentation listener that reports slow statements (see module docstring)."""
+
+    def __init__(self, threshold_s: float, dedup_seconds: float = 300.0, max_per_minute: int = 30,
+                 explain_plans: bool = True, clock=time.monotonic):
+        self.threshold_s = threshold_s
+        self.dedup_seconds = dedup_seconds
+        self.max_per_minute = max_per_minute
+        self.explain_plans = explain_plans
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._stats: "OrderedDict[str, SlowQueryStats]" = OrderedDict()
+        self._window_start = 0.0
+        self._window_reports = 0
+
+    def __call__(self, statement: str, parameters: Any, elapsed: float, conn: Any) -> None:
+        if elapsed < self.threshold_s:
+            return
+        fingerprint = normalize(statement)
+        now = self._clock()
+        with self._lock:
+            stats = self._stats.get(fingerprint)
+            if stats is None:
+                stats = self._stats[fingerprint] = SlowQueryStats(fingerprint)
+                while len(self._stats) > MAX_FINGERPRINTS:
+                    self._stats.popitem(last=False)
+            else:
+                self._stats.move_to_end(fingerprint)
+            stats.count += 1
+            stats.total_s += elapsed
+            stats.max_s = max(stats.max_s, elapsed)
+            due = not stats.last_logged or now - stats.last_logged >= self.dedup_seconds
+            if due and now - self._window_start >= 60.0:
+                self._window_start, self._window_reports = now, 0
+            if not due or self._window_reports >= self.max_per_minute:
+                stats.suppressed += 1
+                return
+            self._window_reports += 1
+            stats.last_logged = now
+            suppressed, stats.suppressed = stats.suppressed, 0
+
+        plan: List[str] = []
+        if self.explain_plans and not _is_executemany(parameters) \
+                and statement.lstrip().lower().startswith(_EXPLAINABLE):
+            try:
+                plan = explain(conn, statement, parameters)
+            except Exception as e:
+                plan = [f"EXPLAIN failed: {type(e).__name__}: {e}"]
+        scans = full_scans(plan)
+        stats.last_plan, stats.full_scans = plan, scans
+
+        metrics.DB_SLOW_QUERIES.inc(full_scan="yes" if scans else "no")
+        logger.warning(
+            "Slow query %.1fms%s%s: %s | params=%s | plan: %s",
+            elapsed * 1000.0,
+            f" (+{suppressed} similar since last report)" if suppressed else "",
+            f" [full scan on {', '.join(scans)}]" if scans else "",
+            fingerprint[:1000],
+            parameter_shape(parameters),
+            " / ".join(plan) or "n/a",
+        )
+
+    def recent(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Slowest fingerprints seen (by max duration)."""
+        with self._lock:
+            stats = list(self._stats.values())
+        stats.sort(key=lambda s: s.max_s, reverse=True)
+        return [s.to_dict() for s in stats[:limit]]
+
+
+def _is_executemany(parameters: Any) -> bool:
+    return isinstance(parameters, (list, tuple)) and bool(parameters) \
+        and isinstance(parameters[0], (list, tuple, dict))
+
+
+_log: Optional[SlowQueryLog] = None
+
+
+def get_log() -> Optional[SlowQueryLog]:
+    return _log
+
+
+def install_from_env() -> Optional[SlowQueryLog]:
+    """Register the slow-query listener per SLOW_QUERY_* settings (idempotent)."""
+    global _log
+    threshold_ms = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "250"))
+    if threshold_ms <= 0:
+        return None
+    if _log is None:
+        _log = SlowQueryLog(
+            threshold_s=threshold_ms / 1000.0,
+            dedup_seconds=float(os.getenv("SLOW_QUERY_DEDUP_SECONDS", "300")),
+            max_per_minute=int(os.getenv("SLOW_QUERY_MAX_PER_MINUTE", "30")),
+            explain_plans=os.getenv("SLOW_QUERY_EXPLAIN", "true").lower() in ("1", "true", "yes"),
+        )
+        instrumentation.add_listener(_log)
+    return _log
+
+
+def uninstall() -> None:
+    global _log
+    if _log is not None:
+        instrumentation.remove_listener(_log)
+        _log = None
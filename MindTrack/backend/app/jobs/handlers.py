@@ -0,0 +1,27 @@
+import logging
+from datetime import date
+from typing import Any, Dict
+
+from app.services import job_queue, rollup_service
+
+# handlers.py
+"""
+Job handlers for post-write work. Every handler recomputes from the current
+rows and upserts, so running a job twice (at-least-once delivery) is safe.
+"""
+
+logger = logging.getLogger(__name__)
+
+HABIT_ENTRIES_WRITTEN = "habit.entries_written"
+
+
+@job_queue.handler(HABIT_ENTRIES_WRITTEN)
+def habit_entries_written(db: Any, payload: Dict[str, Any]) -> None:
+    """
+    Follow-up of a habit entry write: rebuild the user's rollups for the
+    touched days. Streak badges are awarded inline by the write itself, so
+    the response can report them.
+    """
+    dates = sorted(date.fromisoformat(d) for d in payload.get("dates", ()))
+    if dates:
+        rollup_service.refresh_rollups(db, dates[0], dates[-1], user_ids=[payload["user_id"]])
@@ -0,0 +1,267 @@
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db import instrumentation
+from app.db.database import DATABASE_URL, connect_args_for
+
+# nightly_recompute.py
+"""
+Bulk recompute of derived data (daily rollups, streak badges, rule badges)
+for every user, e.g. after a data fix or a badge rule change.
+
+Users are split into shards of --shard-size consecutive ids (keyset bounds,
+so a shard is an index range scan). Shards run in a process pool, each with
+its own engine; inside a shard users are processed --batch-size at a time
+with a fixed number of queries per batch:
+
+- rollups: two GROUP BY reads, one DELETE and one bulk INSERT
+- streaks: one read of done dates, one read of held badges, one INSERT
+- rules:   one rollup matrix read, one read of held badges, one INSERT
+
+Every finished shard is recorded in a JSON checkpoint (written atomically).
+Re-running with the same arguments skips finished shards, so an interrupted
+run resumes where it stopped (without --as-of, on the checkpoint's day);
+--fresh starts over. Progress and the final
+report include users/s and the projected time for 1M users.
+
+    python -m app.jobs.nightly_recompute --workers 8 --checkpoint /tmp/recompute.json
+"""
+
+logger = logging.getLogger(__name__)
+
+STEPS = ("rollups", "streaks", "rules")
+ONE_MILLION = 1_000_000
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+# ---- shard worker ----
+
+_session_factory: Optional[Callable[[], Any]] = None
+
+
+def _init_worker(database_url: str) -> None:
+    """Process pool initializer: one engine per process, never shared across a fork."""
+    global _session_factory
+    engine = create_engine(database_url, connect_args=connect_args_for(database_url), pool_pre_ping=True)
+    instrumentation.install(engine)
+    _session_factory = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+
+
+def process_shard(
+    shard: Dict[str, Any],
+    params: Dict[str, Any],
+    session_factory: Optional[Callable[[], Any]] = None,
+) -> Dict[str, Any]:
+    """Run the requested steps for the users in (shard["after"], shard["until"]]."""
+    # Imported here so pool workers import the services after their engine exists
+    from app.services import badge_rules, badge_service, habit_service, rollup_service
+
+    factory = session_factory or _session_factory
+    as_of = date.fromisoformat(params["as_of"])
+    start = as_of - timedelta(days=params["days"] - 1)
+    steps = params["steps"]
+    stats = {"index": shard["index"], "users": 0, "rollup_rows": 0, "streak_badges": 0, "rule_badges": 0}
+    began = time.perf_counter()
+    db = factory()
+    try:
+        for batch in rollup_service.iter_user_batches(
+            db, params["batch_size"], after=shard["after"], until=shard["until"]
+        ):
+            stats["users"] += len(batch)
+            if "rollups" in steps:
+                stats["rollup_rows"] += rollup_service.refresh_rollups(db, start, as_of, user_ids=batch)
+            if "streaks" in steps:
+                best = habit_service.compute_best_streaks(db, batch)
+                stats["streak_badges"] += len(badge_service.award_streak_badges_bulk(db, best))
+            if "rules" in steps:
+                result = badge_rules.evaluate_rules(db, as_of=as_of, user_ids=batch, batch_size=len(batch))
+                stats["rule_badges"] += result["awarded"]
+    finally:
+        db.close()
+    stats["seconds"] = time.perf_counter() - began
+    return stats
+
+
+# ---- checkpoint ----
+
+
+def _load_checkpoint(path: Optional[str]) -> Optional[Dict[str, Any]]:
+    if not path or not os.path.exists(path):
+        return None
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def _save_checkpoint(path: Optional[str], state: Dict[str, Any]) -> None:
+    if not path:
+        return
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as fh:
+        json.dump(state, fh, indent=2, default=str)
+    os.replace(tmp, path)
+
+
+def plan_shards(db: Any, shard_size: int) -> List[Dict[str, Any]]:
+    """Shards covering every user id; the last one is open-ended so users created mid-run are included."""
+    from app.services import rollup_service
+
+    bounds = [str(b) for b in rollup_service.shard_bounds(db, shard_size)]
+    edges: List[Optional[str]] = [None, *bounds]
+    return [
+        {"index": i, "after": after, "until": bounds[i] if i < len(bounds) else None}
+        for i, after in enumerate(edges)
+    ]
+
+
+# ---- driver ----
+
+
+def _throughput(users: int, seconds: float) -> Dict[str, Any]:
+    rate = users / seconds if seconds else 0.0
+    return {
+        "users_per_s": rate,
+        "projected_1m_users_s": ONE_MILLION / rate if rate else None,
+    }
+
+
+def run(
+    as_of: Optional[date] = None,
+    days: int = 62,
+    steps: Sequence[str] = STEPS,
+    shard_size: int = 20000,
+    batch_size: int = 2000,
+    workers: int = os.cpu_count() or 1,
+    checkpoint: Optional[str] = None,
+    fresh: bool = False,
+    database_url: str = DATABASE_URL,
+    session_factory: Optional[Callable[[], Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Recompute everything for all users and return the run report. With
+    workers <= 1 (or a session_factory) shards run in this process.
+    """
+    unknown = set(steps) - set(STEPS)
+    if unknown:
+        raise ValueError(f"Unknown steps {sorted(unknown)}; expected a subset of {STEPS}")
+    params = {
+        "as_of": (as_of or _utcnow().date() - timedelta(days=1)).isoformat(),
+        "days": days,
+        "steps": [s for s in STEPS if s in steps],
+        "batch_size": batch_size,
+    }
+    inline = workers <= 1 or session_factory is not None
+    if session_factory is None:
+        _init_worker(database_url)
+        session_factory = _session_factory
+
+    state = None if fresh else _load_checkpoint(checkpoint)
+    if state is not None and as_of is None:
+        # A resume after midnight UTC keeps the day the run started with
+        params["as_of"] = state["params"]["as_of"]
+    if state is not None and state["params"] != params:
+        raise ValueError(
+            f"Checkpoint {checkpoint} was written for {state['params']}; resume with the same "
+            f"arguments (including --as-of), or pass --fresh to start over"
+        )
+    if state is None:
+        db = session_factory()
+        try:
+            shards = plan_shards(db, shard_size)
+        finally:
+            db.close()
+        state = {"params": params, "started_at": _utcnow().isoformat(), "shards": shards, "done": {}}
+        _save_checkpoint(checkpoint, state)
+
+    pending = [s for s in state["shards"] if str(s["index"]) not in state["done"]]
+    skipped = len(state["shards"]) - len(pending)
+    logger.info("Recompute %s: %d shards (%d already done), workers=%d",
+                params, len(state["shards"]), skipped, 1 if inline else workers)
+
+    began = time.perf_counter()
+    processed = 0
+
+    def record(stats: Dict[str, Any]) -> None:
+        nonlocal processed
+        state["done"][str(stats["index"])] = stats
+        _save_checkpoint(checkpoint, state)
+        processed += stats["users"]
+        elapsed = time.perf_counter() - began
+        logger.info("Shard %d done: %d users in %.1fs (%d/%d shards, %.0f users/s overall)",
+                    stats["index"], stats["users"], stats["seconds"], len(state["done"]),
+                    len(state["shards"]), processed / elapsed if elapsed else 0.0)
+
+    if inline:
+        for shard in pending:
+            record(process_shard(shard, params, session_factory))
+    elif pending:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(database_url,)) as pool:
+            futures = [pool.submit(process_shard, shard, params) for shard in pending]
+            try:
+                for future in as_completed(futures):
+                    record(future.result())
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+
+    elapsed = time.perf_counter() - began
+    done = state["done"].values()
+    state["finished_at"] = _utcnow().isoformat()
+    _save_checkpoint(checkpoint, state)
+    report = {
+        "params": params,
+        "shards": len(state["shards"]),
+        "shards_skipped": skipped,
+        "users": sum(s["users"] for s in done),
+        "users_this_run": processed,
+        "rollup_rows": sum(s["rollup_rows"] for s in done),
+        "streak_badges": sum(s["streak_badges"] for s in done),
+        "rule_badges": sum(s["rule_badges"] for s in done),
+        "elapsed_s": elapsed,
+        **_throughput(processed, elapsed),
+    }
+    logger.info("Recompute finished: %s", report)
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Recompute rollups, streak badges and rule badges for all users")
+    parser.add_argument("--as-of", type=date.fromisoformat, default=None, help="last day to recompute (default: yesterday UTC)")
+    parser.add_argument("--days", type=int, default=62, help="days of rollups rebuilt, ending at --as-of")
+    parser.add_argument("--steps", default=",".join(STEPS), help="comma-separated subset of rollups,streaks,rules")
+    parser.add_argument("--shard-size", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--checkpoint", default=None, help="JSON checkpoint file; an existing one is resumed")
+    parser.add_argument("--fresh", action="store_true", help="ignore an existing checkpoint")
+    parser.add_argument("--report", default=None, help="also write the report JSON here")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    report = run(
+        as_of=args.as_of, days=args.days, steps=[s.strip() for s in args.steps.split(",") if s.strip()],
+        shard_size=args.shard_size, batch_size=args.batch_size, workers=args.workers,
+        checkpoint=args.checkpoint, fresh=args.fresh,
+    )
+    print(json.dumps(report, indent=2, default=str))
+    if args.report:
+        with open(args.report, "w") as fh:
+            json.dump(report, fh, indent=2, default=str)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
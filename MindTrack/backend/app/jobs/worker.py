@@ -0,0 +1,55 @@
+import argparse
+import logging
+import signal
+import threading
+from typing import List, Optional
+
+from app.db.database import SessionLocal, init_db
+from app.jobs import handlers  # noqa: F401  (register handlers)
+from app.services.job_queue import DEFAULT_LEASE_SECONDS, JobWorker
+
+# worker.py
+"""
+Job worker process: python -m app.jobs.worker [--threads N]
+
+Runs N polling threads against the jobs table until SIGINT/SIGTERM, then
+finishes the jobs in hand. Run as many processes as needed; claims are
+exclusive (see services/job_queue).
+"""
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run MindTrack background job workers")
+    parser.add_argument("--threads", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    parser.add_argument("--lease-seconds", type=float, default=DEFAULT_LEASE_SECONDS)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    workers = [
+        JobWorker(SessionLocal, batch_size=args.batch_size, poll_interval=args.poll_interval,
+                  lease_seconds=args.lease_seconds)
+        for _ in range(max(1, args.threads))
+    ]
+    stopped = threading.Event()
+
+    def shutdown(signum, frame):
+        logger.info("Signal %s received, stopping job workers", signum)
+        stopped.set()
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+    for worker in workers:
+        worker.start()
+    stopped.wait()
+    for worker in workers:
+        worker.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
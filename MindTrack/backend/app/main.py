@@ -1,4 +1,4 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 import logging
@@ -6,8 +6,12 @@ import os
 import uvicorn
 from sqlalchemy.orm import Session
 
+from app.db import instrumentation
 from app.db.database import get_db, init_db, Base, engine
+from app.db.instrumentation import SQLStatsMiddleware
+from app.observability import capture, metrics, profiling, tracing
 from app.models import User, DailyHabitEntry, Badge, Reminder, SensorSummary
+from app.services import job_queue, leader_election, nightly_jobs, reminder_delivery, reminder_scheduler
 
 # Load environment variables
 load_dotenv()
@@ -33,7 +37,37 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-DB-Query-Count", "X-DB-Time-Ms", "X-Profile-Id", "X-Trace-Id"],
 )
+if tracing.enabled():
+    # Statements of sampled requests become db.query spans
+    app.add_middleware(tracing.TracingMiddleware)
+    instrumentation.add_listener(tracing.record_statement)
+if profiling.enabled():
+    # Not installed at all when off, so unprofiled traffic pays nothing
+    app.add_middleware(profiling.ProfilingMiddleware)
+if capture.enabled():
+    # Redacted sample of requests for benchmarks/replay.py
+    app.add_middleware(capture.CaptureMiddleware)
+# Added last = outermost: the SQL scope wraps the metrics middleware so it can read per-request query counts
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(SQLStatsMiddleware)
+metrics.instrument_pool(engine)
+
+def start_periodic_jobs():
+    """Run on the elected leader worker only (see leader_election)."""
+    if reminder_scheduler.is_enabled():
+        pipeline = reminder_delivery.start_pipeline()
+        reminder_scheduler.start_scheduler(dispatch=pipeline.submit)
+        logger.info("Reminder scheduler started")
+    if nightly_jobs.is_enabled():
+        nightly_jobs.start_nightly_jobs()
+        logger.info("Nightly jobs started")
+
+def stop_periodic_jobs():
+    nightly_jobs.stop_nightly_jobs()
+    reminder_scheduler.stop_scheduler()
+    reminder_delivery.stop_pipeline()
 
 # Initialize database on startup
 @app.on_event("startup")
@@ -41,6 +75,23 @@ async def startup_event():
     logger.info("Initializing database...")
     init_db()
     logger.info("Database initialized successfully")
+    if tracing.enabled():
+        tracing.start_exporter()
+    if capture.enabled():
+        capture.start_writer()
+    if reminder_scheduler.is_enabled() or nightly_jobs.is_enabled():
+        # Every worker runs this hook; only the lease holder starts the jobs
+        leader_election.start_election(on_elected=start_periodic_jobs, on_demoted=stop_periodic_jobs)
+    if job_queue.in_process_enabled():
+        # Claims are exclusive, so every worker may run one
+        job_queue.start_in_process_worker()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    leader_election.stop_election()
+    job_queue.stop_in_process_worker()
+    tracing.stop_exporter()
+    capture.stop_writer()
 
 # Root endpoint
 @app.get("/", tags=["root"])
@@ -61,24 +112,46 @@ async def health_check(db: Session = Depends(get_db)):
         # Test database connection with a simple query
         from sqlalchemy import text
         db.execute(text("SELECT 1"))
-        return {
+        result = {
             "status": "healthy",
             "database": "connected"
         }
+        if reminder_scheduler.is_enabled() or nightly_jobs.is_enabled():
+            result["scheduler_leader"] = leader_election.is_leader()
+        result["jobs"] = job_queue.stats(db)
+        result["sql"] = instrumentation.totals()
+        exporter = tracing.get_exporter()
+        if exporter is not None:
+            result["tracing"] = exporter.stats()
+        writer = capture.get_writer()
+        if writer is not None:
+            result["traffic_capture"] = writer.stats()
+        pipeline = reminder_delivery.get_pipeline()
+        if pipeline is not None:
+            result["reminder_delivery"] = pipeline.stats()
+        return result
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail=f"Database connection failed: {str(e)}"
         )
 
+# Prometheus scrape endpoint
+@app.get("/metrics", tags=["health"], include_in_schema=False)
+async def prometheus_metrics():
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 # Import and include routers
-from app.routers import users, habits, badges, insights, ml_predictions
+from app.routers import users, habits, badges, insights, ml_predictions, reminders, admin
 
 app.include_router(users.router, prefix="/users", tags=["users"])
 app.include_router(habits.router, prefix="/habits", tags=["habits"])
 app.include_router(badges.router, prefix="/badges", tags=["badges"])
 app.include_router(insights.router, prefix="/insights", tags=["insights"])
 app.include_router(ml_predictions.router, prefix="/predictions", tags=["ml-predictions"])
+app.include_router(reminders.router, prefix="/reminders", tags=["reminders"])
+app.include_router(admin.router, prefix="/admin", tags=["admin"],
+                   dependencies=[Depends(admin.require_admin)], include_in_schema=False)
 
 def create_app():
     """Application factory for tests and external runners that expect a callable."""
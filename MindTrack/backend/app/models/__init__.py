@@ -4,9 +4,12 @@ from .habit_entry import DailyHabitEntry
 from .reminder import Reminder
 from .sensor import SensorSummary
 from .badge import Badge
+from .scheduler_lease import SchedulerLease
+from .rollup import UserDailyRollup
+from .job import Job
 
 # app/models/__init__.py
 
 
 
-__all__ = ["Base", "User", "DailyHabitEntry", "Reminder", "SensorSummary", "Badge"]
\ No newline at end of file
+__all__ = ["Base", "User", "DailyHabitEntry", "Reminder", "SensorSummary", "Badge", "SchedulerLease", "UserDailyRollup", "Job"]
\ No newline at end of file
@@ -2,7 +2,7 @@ import datetime
 from typing import Optional, TYPE_CHECKING
 from uuid import UUID, uuid4
 from pydantic import BaseModel
-from sqlalchemy import Column, String, DateTime, ForeignKey
+from sqlalchemy import Column, String, DateTime, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 from sqlalchemy.orm import relationship, Session
 from app.db.database import Base
@@ -23,6 +23,9 @@ class Badge(Base):
     # relationship: many badges -> one user
     user = relationship("User", back_populates="badges")
 
+    # One badge name per user; awards insert with ON CONFLICT DO NOTHING on it
+    __table_args__ = (Index("ux_badges_user_id_name", "user_id", "name", unique=True),)
+
 
 def award_badge(session: Session, user_id: UUID, name: str, description: Optional[str] = None) -> Badge:
     """
@@ -1,7 +1,7 @@
 import uuid
 from datetime import date, datetime
 from enum import Enum as PyEnum
-from typing import Optional
+from typing import List, Optional
 from uuid import UUID
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 from sqlalchemy.orm import relationship
@@ -18,6 +18,7 @@ from sqlalchemy import (
     DateTime,
     ForeignKey,
     Float,
+    Index,
     Text,
 )
 
@@ -79,6 +80,13 @@ class DailyHabitEntry(Base):
     # Relationship: many-to-one with User (assumes User has daily_habit_entries back_populates)
     user = relationship("User", back_populates="daily_habit_entries")
 
+    __table_args__ = (
+        # Upsert lookup and per-habit streak fetch: (user_id, habit_name, date)
+        Index("ix_habit_entries_user_habit_date", "user_id", "habit_name", "date"),
+        # Date windows of one user (completion rate, listings, rollups)
+        Index("ix_habit_entries_user_date", "user_id", "date"),
+    )
+
     def to_dict(self) -> dict:
         """
         Serialize the model into a JSON-serializable dict.
@@ -119,6 +127,24 @@ class HabitEntryCreate(HabitEntryBase):
     pass
 
 
+class HabitEntryBulkItem(BaseModel):
+    entry_date: str = Field(..., description="Date of the habit entry (YYYY-MM-DD)")
+    habit_name: str = Field(..., max_length=255)
+    target_value: Optional[float] = None
+    status: str
+    notes: Optional[str] = None
+    mood: Optional[float] = None
+
+
+class HabitEntryBulkCreate(BaseModel):
+    """
+    Several entries of one user saved in one request (e.g. the dashboard's
+    "Save Progress").
+    """
+    user_id: str = Field(..., description="User UUID owning these entries")
+    entries: List[HabitEntryBulkItem] = Field(..., max_length=366)
+
+
 class HabitEntryResponse(HabitEntryBase):
     entry_id: UUID
     timestamp: datetime
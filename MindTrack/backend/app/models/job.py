@@ -0,0 +1,39 @@
+from sqlalchemy import Column, DateTime, Index, Integer, JSON, String, Text
+from sqlalchemy.sql import func
+from app.db.database import Base
+
+
+class Job(Base):
+    """
+    Durable background job (see services/job_queue).
+
+    Fields:
+    - id: autoincrement primary key, also the FIFO order
+    - kind: handler name, e.g. "habit.entries_written"
+    - payload: JSON arguments for the handler
+    - status: queued | running | done | failed
+    - attempts / max_attempts: deliveries so far and the retry budget
+    - run_after: not claimed before this time (retry backoff, delays)
+    - locked_by / locked_until: claim token and visibility timeout; a running
+      job whose lock expired is redelivered (at-least-once)
+    - last_error: message of the last failed attempt
+    """
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    kind = Column(String(64), nullable=False)
+    payload = Column(JSON, nullable=False, default=dict)
+    status = Column(String(16), nullable=False, default="queued")
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_after = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    locked_by = Column(String(64), nullable=True)
+    locked_until = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # Claim query: queued jobs by run_after, expired running jobs by locked_until
+        Index("ix_jobs_status_run_after", "status", "run_after"),
+    )
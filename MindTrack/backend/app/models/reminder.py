@@ -1,9 +1,9 @@
 import uuid
 from datetime import datetime
 from enum import Enum as PyEnum
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel, Field
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, String, func
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index, String, func
 from sqlalchemy.dialects.postgresql import UUID as PGUUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.types import Enum as SQLEnum
@@ -29,6 +29,8 @@ class Reminder(Base):
     - enabled: boolean, default True
     - created_at: timestamp when created
     - last_triggered: timestamp when last triggered (nullable)
+    - next_fire_at: next UTC instant the reminder is due, derived from time_of_day,
+      repeat and the user's timezone (nullable until computed)
 
     Relationship:
     - many-to-one with User (user.reminders)
@@ -43,9 +45,21 @@ class Reminder(Base):
     enabled = Column(Boolean, nullable=False, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     last_triggered = Column(DateTime(timezone=True), nullable=True)
+    next_fire_at = Column(DateTime(timezone=True), nullable=True)
 
     user = relationship("User", back_populates="reminders")
 
+    __table_args__ = (
+        # Partial index: due-reminder scans only ever look at enabled rows.
+        # The predicate matches the `enabled == True` filter used by the queries.
+        Index(
+            "ix_reminders_enabled_next_fire_at",
+            "next_fire_at",
+            postgresql_where=(enabled == True),  # noqa: E712
+            sqlite_where=(enabled == True),  # noqa: E712
+        ),
+    )
+
 
 # Pydantic schemas
 class ReminderBase(BaseModel):
@@ -59,11 +73,30 @@ class ReminderCreate(ReminderBase):
     user_id: uuid.UUID
 
 
+class ReminderUpdate(BaseModel):
+    habit_name: Optional[str] = Field(None, max_length=255)
+    time_of_day: Optional[str] = Field(None, pattern=r"^\d{2}:\d{2}$")
+    repeat: Optional[RepeatEnum] = None
+    enabled: Optional[bool] = None
+
+
+class ReminderBulkItem(ReminderBase):
+    # Omit to match an existing reminder of the same habit and time, or create one
+    reminder_id: Optional[uuid.UUID] = None
+
+
+class ReminderBulkUpsert(BaseModel):
+    items: List[ReminderBulkItem] = Field(..., max_length=500)
+    # Delete the user's reminders that are not in items (full sync)
+    replace: bool = False
+
+
 class ReminderResponse(ReminderBase):
     reminder_id: uuid.UUID
     user_id: uuid.UUID
     created_at: datetime
     last_triggered: Optional[datetime] = None
+    next_fire_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
\ No newline at end of file
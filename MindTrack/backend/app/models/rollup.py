@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Date, ForeignKey, Integer
+from sqlalchemy.dialects.postgresql import UUID as PGUUID
+from app.db.database import Base
+
+
+class UserDailyRollup(Base):
+    """
+    Per-user, per-day aggregate of habit entries and sensor data, rebuilt by
+    rollup_service and read by the badge rule engine.
+
+    Fields:
+    - user_id, date: composite primary key
+    - entries_total / entries_done: habit entries logged / marked done that day
+    - total_steps, active_minutes, minutes_asleep: from sensor_summaries (nullable)
+    """
+    __tablename__ = "user_daily_rollups"
+
+    user_id = Column(PGUUID(as_uuid=True), ForeignKey("users.user_id", ondelete="CASCADE"), primary_key=True)
+    date = Column(Date, primary_key=True)
+    entries_total = Column(Integer, nullable=False, default=0)
+    entries_done = Column(Integer, nullable=False, default=0)
+    total_steps = Column(Integer, nullable=True)
+    active_minutes = Column(Integer, nullable=True)
+    minutes_asleep = Column(Integer, nullable=True)
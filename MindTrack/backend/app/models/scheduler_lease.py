@@ -0,0 +1,20 @@
+from sqlalchemy import Column, DateTime, String
+from app.db.database import Base
+
+
+class SchedulerLease(Base):
+    """
+    Named lease used for leader election between backend workers.
+
+    Fields:
+    - name: lease name, e.g. "scheduler" (primary key)
+    - holder: id of the worker holding it (host:pid:nonce)
+    - acquired_at: when the current holder took the lease
+    - expires_at: the lease is free once this passes without a renewal
+    """
+    __tablename__ = "scheduler_leases"
+
+    name = Column(String(64), primary_key=True)
+    holder = Column(String(128), nullable=False)
+    acquired_at = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
@@ -0,0 +1,322 @@
+import glob
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import os
+import queue
+import random
+import re
+import secrets
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qsl
+
+from app.db import instrumentation
+
+# app/observability/capture.py
+"""
+Sampled traffic capture for reproducing production load.
+
+CaptureMiddleware records a TRAFFIC_CAPTURE_SAMPLE_RATE fraction of API
+requests (default 0.05; admin, health, metrics and docs are never captured):
+method, path, route, query, JSON body, response status and latency. Records
+are queued (bounded; dropped and counted when full) for a writer thread that
+appends gzip-compressed JSON lines under TRAFFIC_CAPTURE_DIR, starting a new
+file after TRAFFIC_CAPTURE_MAX_BYTES of records and keeping the newest
+TRAFFIC_CAPTURE_MAX_FILES files.
+
+Nothing personal is written:
+
+- UUIDs (user, entry and reminder ids) in the path, query or body become
+  stable pseudonyms: a keyed hash shaped as a UUID
+- habit names become "habit-<hash>", so per-habit cardinality survives
+- dates, statuses, times of day, repeat and timezone are kept as-is, as are
+  numbers, booleans and nulls (also as query-string text)
+- any other string (names, notes, preferences, ...) becomes "<redacted:N>"
+  with N its length
+- non-JSON bodies are reduced to their size
+
+Pseudonyms are keyed with TRAFFIC_CAPTURE_SALT; without it a random key is
+drawn per process, so set it to keep one user's pseudonym stable across
+workers and restarts. benchmarks/replay.py re-issues captured requests.
+
+Enable with TRAFFIC_CAPTURE_ENABLED=true; when off, no middleware is installed.
+"""
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = float(os.getenv("TRAFFIC_CAPTURE_SAMPLE_RATE", "0.05"))
+CAPTURE_DIR = os.getenv("TRAFFIC_CAPTURE_DIR", os.path.join(tempfile.gettempdir(), "mindtrack-captures"))
+MAX_FILE_BYTES = int(os.getenv("TRAFFIC_CAPTURE_MAX_BYTES", str(20 * 1024 * 1024)))
+MAX_FILES = int(os.getenv("TRAFFIC_CAPTURE_MAX_FILES", "10"))
+MAX_BODY_BYTES = 64 * 1024
+EXCLUDED_PREFIXES = ("/admin", "/health", "/metrics", "/docs", "/redoc", "/openapi.json")
+
+KEPT_KEYS = frozenset({"status", "date", "entry_date", "start_date", "end_date",
+                       "time_of_day", "repeat", "timezone"})
+PSEUDONYM_KEYS = frozenset({"habit_name"})
+REDACTED = re.compile(r"^<redacted:(\d+)>$")
+_SCALAR_TEXT = re.compile(r"^(?:-?\d+(?:\.\d+)?|true|false)$", re.IGNORECASE)
+_UUID = re.compile(r"^[0-9a-fA-F]{8}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{12}$")
+
+
+def enabled() -> bool:
+    return os.getenv("TRAFFIC_CAPTURE_ENABLED", "false").lower() in ("1", "true", "yes")
+
+
+def is_uuid(value: str) -> bool:
+    return bool(_UUID.match(value))
+
+
+class Redactor:
+    """Pseudonymizes ids and habit names and redacts free text (see module docstring)."""
+
+    def __init__(self, salt: Optional[bytes] = None):
+        env_salt = os.getenv("TRAFFIC_CAPTURE_SALT")
+        self._key = salt or (env_salt.encode() if env_salt else secrets.token_bytes(32))
+
+    def _digest(self, value: str) -> bytes:
+        return hmac.new(self._key, value.encode(), hashlib.sha256).digest()
+
+    def pseudonym(self, value: str) -> str:
+        # Normalized first, so dashed and hex spellings of one id agree
+        return str(uuid.UUID(bytes=self._digest(str(uuid.UUID(value)))[:16], version=4))
+
+    def habit(self, value: str) -> str:
+        return "habit-" + self._digest(value).hex()[:10]
+
+    def value(self, key: Optional[str], value: Any) -> Any:
+        if isinstance(value, dict):
+            return {k: self.value(k, v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self.value(key, v) for v in value]
+        if not isinstance(value, str):
+            return value
+        if is_uuid(value):
+            return self.pseudonym(value)
+        if key in PSEUDONYM_KEYS:
+            return self.habit(value)
+        if key in KEPT_KEYS or _SCALAR_TEXT.match(value):
+            return value
+        return f"<redacted:{len(value)}>"
+
+    def path(self, path: str) -> str:
+        return "/".join(self.pseudonym(p) if is_uuid(p) else p for p in path.split("/"))
+
+    def query(self, query_string: str) -> List[Tuple[str, Any]]:
+        return [(k, self.value(k, v)) for k, v in parse_qsl(query_string, keep_blank_values=True)]
+
+
+# ---- writer ----
+
+
+class CaptureWriter:
+    """Background thread appending records to rotating .jsonl.gz files. submit() never blocks."""
+
+    def __init__(self, directory: str = CAPTURE_DIR, max_bytes: int = MAX_FILE_BYTES,
+                 max_files: int = MAX_FILES, queue_size: int = 10000):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._file: Any = None
+        self._file_bytes = 0
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        self.files = 0
+
+    def submit(self, record: Dict[str, Any]) -> bool:
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _rotate(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        os.makedirs(self.directory, exist_ok=True)
+        # Sorts by creation time (UTC, microseconds; the sequence breaks ties); the pid keeps workers apart
+        now = time.time()
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime(now)) + f".{int(now * 1e6) % 1000000:06d}"
+        name = f"capture-{stamp}-{os.getpid()}-{self.files:05d}.jsonl.gz"
+        self._file = gzip.open(os.path.join(self.directory, name), "wt", encoding="utf-8")
+        self._file_bytes = 0
+        self.files += 1
+        for stale in capture_files(self.directory)[:-self.max_files or None]:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, separators=(",", ":"), default=str) + "\n"
+        if self._file is None or self._file_bytes + len(line) > self.max_bytes:
+            self._rotate()
+        self._file.write(line)
+        self._file_bytes += len(line)
+        self.written += 1
+
+    def _run(self) -> None:
+        while True:
+            record = self._queue.get()
+            try:
+                if record is None:
+                    return
+                self._write(record)
+                if self._queue.empty():
+                    self._file.flush()
+            except Exception as e:
+                self.errors += 1
+                logger.warning("Traffic capture write failed: %s", e)
+            finally:
+                self._queue.task_done()
+
+    def start(self) -> "CaptureWriter":
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="traffic-capture", daemon=True)
+            self._thread.start()
+        return self
+
+    def flush(self) -> None:
+        """Block until every submitted record is written to the current file."""
+        self._queue.join()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def stats(self) -> Dict[str, int]:
+        return {"written": self.written, "dropped": self.dropped, "errors": self.errors,
+                "files": self.files, "queued": self._queue.qsize()}
+
+
+_writer: Optional[CaptureWriter] = None
+
+
+def get_writer() -> Optional[CaptureWriter]:
+    return _writer
+
+
+def start_writer(directory: str = CAPTURE_DIR) -> CaptureWriter:
+    global _writer
+    if _writer is None:
+        _writer = CaptureWriter(directory).start()
+    return _writer
+
+
+def stop_writer() -> None:
+    global _writer
+    if _writer is not None:
+        _writer.stop()
+        _writer = None
+
+
+def capture_files(path: str) -> List[str]:
+    """Capture files under a directory (or the file itself), oldest first."""
+    if os.path.isdir(path):
+        return sorted(glob.glob(os.path.join(path, "capture-*.jsonl.gz")))
+    return [path]
+
+
+def read_captures(paths: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """Records of capture files or directories; a truncated last line (live file) is skipped."""
+    for path in paths:
+        for name in capture_files(path):
+            try:
+                with gzip.open(name, "rt", encoding="utf-8") as fh:
+                    for line in fh:
+                        try:
+                            yield json.loads(line)
+                        except json.JSONDecodeError:
+                            continue
+            except (EOFError, OSError) as e:
+                logger.warning("Stopped reading %s: %s", name, e)
+
+
+# ---- middleware ----
+
+
+class CaptureMiddleware:
+    """ASGI middleware submitting a redacted record of sampled requests to the writer."""
+
+    def __init__(self, app: Any, sample_rate: float = SAMPLE_RATE, writer: Optional[CaptureWriter] = None,
+                 redactor: Optional[Redactor] = None):
+        self.app = app
+        self.sample_rate = sample_rate
+        self._writer = writer
+        self.redactor = redactor or Redactor()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("path", "").startswith(EXCLUDED_PREFIXES) \
+                or random.random() >= self.sample_rate:
+            await self.app(scope, receive, send)
+            return
+        writer = self._writer or get_writer()
+        if writer is None:
+            await self.app(scope, receive, send)
+            return
+
+        chunks: List[bytes] = []
+        size = 0
+        response: Dict[str, Any] = {}
+        started = time.perf_counter()
+        wall = time.time()
+
+        async def receive_wrapper():
+            nonlocal size
+            message = await receive()
+            if message["type"] == "http.request":
+                body = message.get("body", b"")
+                size += len(body)
+                if size <= MAX_BODY_BYTES:
+                    chunks.append(body)
+            return message
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            writer.submit(self._record(scope, b"".join(chunks) if size <= MAX_BODY_BYTES else None,
+                                       size, response.get("status", 500), wall,
+                                       (time.perf_counter() - started) * 1000.0))
+
+    def _record(self, scope: Dict[str, Any], body: Optional[bytes], size: int, status: int,
+                wall: float, duration_ms: float) -> Dict[str, Any]:
+        headers = dict(scope.get("headers") or [])
+        content_type = headers.get(b"content-type", b"").decode("latin-1")
+        redacted_body = None
+        if body and "json" in content_type:
+            try:
+                redacted_body = self.redactor.value(None, json.loads(body))
+            except ValueError:
+                pass
+        return {
+            "ts": wall,
+            "method": scope.get("method"),
+            "path": self.redactor.path(scope.get("path", "")),
+            "route": instrumentation.route_template(scope),
+            "query": self.redactor.query(scope.get("query_string", b"").decode("latin-1")),
+            "content_type": content_type or None,
+            "body": redacted_body,
+            "body_bytes": size,
+            "status": status,
+            "duration_ms": duration_ms,
+        }
@@ -0,0 +1,226 @@
+import gc
+import os
+import sys
+import threading
+import tracemalloc
+import types
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.observability import metrics
+
+# app/observability/memory.py
+"""
+Memory diagnostics for long-running workers.
+
+tracemalloc is off by default (it slows allocation). start() turns it on,
+take_snapshot() keeps up to TRACEMALLOC_MAX_SNAPSHOTS (default 5) snapshots
+in memory, and top()/diff() report allocation sites of one snapshot or the
+growth between two. The admin API exposes all of these.
+
+components() estimates what the long-lived objects cost (the served model,
+in-process caches, drift sketches), together with pool occupancy and the
+process RSS, to help size workers. Sizes come from deep_sizeof(), an
+approximate object-graph walk that counts each NumPy buffer once.
+"""
+
+MAX_SNAPSHOTS = int(os.getenv("TRACEMALLOC_MAX_SNAPSHOTS", "5"))
+DEFAULT_FRAMES = int(os.getenv("TRACEMALLOC_FRAMES", "10"))
+
+# Shared, immortal objects that would otherwise pull the whole interpreter in
+_SKIP_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType,
+               types.MethodType, types.CodeType, types.FrameType)
+
+_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+_snapshots: "OrderedDict[int, Tuple[str, tracemalloc.Snapshot]]" = OrderedDict()
+_next_id = 1
+_lock = threading.Lock()
+
+
+def _utcnow() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _extra_referents(obj: Any) -> List[Any]:
+    # Cython extension types (e.g. sklearn's Tree) hide their buffers from gc;
+    # their pickled state exposes them as arrays
+    if type(obj).__module__.startswith("sklearn.tree") and hasattr(obj, "__getstate__"):
+        try:
+            state = obj.__getstate__()
+        except Exception:
+            return []
+        return list(state.values()) if isinstance(state, dict) else []
+    return []
+
+
+def deep_sizeof(obj: Any, max_objects: int = 2_000_000) -> int:
+    """Approximate bytes reachable from obj (each object and NumPy buffer counted once)."""
+    seen_ids = set()
+    seen_buffers = set()
+    # Objects built on the fly (pickled state) must outlive the walk, or their ids get reused
+    keep_alive: List[Any] = []
+    total = 0
+    stack = [obj]
+    while stack and len(seen_ids) < max_objects:
+        o = stack.pop()
+        if id(o) in seen_ids or isinstance(o, _SKIP_TYPES):
+            continue
+        seen_ids.add(id(o))
+        if isinstance(o, np.ndarray):
+            total += sys.getsizeof(o) - (o.nbytes if o.flags.owndata else 0)
+            buffer = (o.__array_interface__["data"][0], o.nbytes)
+            if buffer not in seen_buffers:
+                seen_buffers.add(buffer)
+                total += o.nbytes
+            if o.dtype.hasobject:
+                stack.extend(o.ravel().tolist())
+            continue
+        total += sys.getsizeof(o)
+        stack.extend(gc.get_referents(o))
+        extra = _extra_referents(o)
+        keep_alive.extend(extra)
+        stack.extend(extra)
+    return total
+
+
+# ---- tracemalloc snapshots ----
+
+
+def status() -> Dict[str, Any]:
+    tracing = tracemalloc.is_tracing()
+    current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+    with _lock:
+        snapshots = [{"id": sid, "taken_at": taken_at} for sid, (taken_at, _) in _snapshots.items()]
+    return {
+        "tracing": tracing,
+        "frames": tracemalloc.get_traceback_limit() if tracing else 0,
+        "traced_bytes": current,
+        "traced_peak_bytes": peak,
+        "snapshots": snapshots,
+    }
+
+
+def start(frames: int = DEFAULT_FRAMES) -> Dict[str, Any]:
+    """Start tracing (no-op when already on). Only allocations made from now on are seen."""
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+    return status()
+
+
+def stop() -> Dict[str, Any]:
+    """Stop tracing and drop stored snapshots."""
+    tracemalloc.stop()
+    with _lock:
+        _snapshots.clear()
+    return status()
+
+
+def take_snapshot() -> int:
+    """Store a snapshot and return its id; the oldest is evicted beyond MAX_SNAPSHOTS."""
+    global _next_id
+    if not tracemalloc.is_tracing():
+        raise RuntimeError("tracemalloc is not running; start it first")
+    snapshot = tracemalloc.take_snapshot().filter_traces(_FILTERS)
+    with _lock:
+        snapshot_id = _next_id
+        _next_id += 1
+        _snapshots[snapshot_id] = (_utcnow(), snapshot)
+        while len(_snapshots) > MAX_SNAPSHOTS:
+            _snapshots.popitem(last=False)
+    return snapshot_id
+
+
+def _get(snapshot_id: int) -> tracemalloc.Snapshot:
+    with _lock:
+        entry = _snapshots.get(snapshot_id)
+    if entry is None:
+        raise KeyError(f"Snapshot {snapshot_id} not found")
+    return entry[1]
+
+
+def _site(trace: Any) -> List[str]:
+    return [f"{frame.filename}:{frame.lineno}" for frame in trace.traceback]
+
+
+def top(snapshot_id: int, key_type: str = "lineno", limit: int = 25) -> Dict[str, Any]:
+    """Largest allocation sites of one snapshot, grouped by lineno, filename or traceback."""
+    snapshot = _get(snapshot_id)
+    stats = snapshot.statistics(key_type)
+    return {
+        "snapshot": snapshot_id,
+        "total_bytes": sum(s.size for s in stats),
+        "top": [{"site": _site(s), "size_bytes": s.size, "count": s.count} for s in stats[:limit]],
+    }
+
+
+def diff(base_id: int, current_id: int, key_type: str = "lineno", limit: int = 25) -> Dict[str, Any]:
+    """Allocation sites that grew most between two snapshots."""
+    stats = _get(current_id).compare_to(_get(base_id), key_type)
+    return {
+        "base": base_id,
+        "current": current_id,
+        "size_diff_bytes": sum(s.size_diff for s in stats),
+        "top": [{"site": _site(s), "size_diff_bytes": s.size_diff, "size_bytes": s.size,
+                 "count_diff": s.count_diff, "count": s.count} for s in stats[:limit]],
+    }
+
+
+# ---- per-component accounting ----
+
+
+def rss_bytes() -> Optional[int]:
+    """Current resident set size (Linux /proc); None where unavailable."""
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def _pool_stats(engine: Any) -> Dict[str, Any]:
+    pool = engine.pool
+    out: Dict[str, Any] = {"class": type(pool).__name__}
+    for key, method in (("size", "size"), ("checked_out", "checkedout"),
+                        ("idle", "checkedin"), ("overflow", "overflow")):
+        fn = getattr(pool, method, None)
+        if callable(fn):
+            out[key] = fn()
+    return out
+
+
+def components() -> Dict[str, Any]:
+    """Approximate memory held by each long-lived component of this worker."""
+    from app.db.database import engine
+    from app.routers import ml_predictions
+    from app.services import drift_service, forest_service, reminder_service
+
+    pipeline = ml_predictions.ml_pipeline
+    monitor = drift_service.get_monitor(ml_predictions.PIPELINE_PATH)
+    return {
+        "rss_bytes": rss_bytes(),
+        "ml_pipeline": {
+            "loaded": pipeline is not None,
+            "bytes": deep_sizeof(pipeline) if pipeline is not None else 0,
+            "path": ml_predictions.PIPELINE_PATH,
+        },
+        "forest_flat_cache": forest_service.cache_stats(),
+        "reminder_listing_cache": reminder_service.listing_cache_stats(),
+        "drift_monitor": {"bytes": deep_sizeof(monitor) if monitor is not None else 0},
+        "db_pool": _pool_stats(engine),
+        "gc": {"objects": len(gc.get_objects()), "counts": list(gc.get_count())},
+        "heavy_modules": sorted(m for m in ("numpy", "pandas", "sklearn", "joblib", "scipy") if m in sys.modules),
+        "tracemalloc": {k: v for k, v in status().items() if k != "snapshots"},
+    }
+
+
+metrics.gauge_func("process_resident_memory_bytes", "Resident memory size in bytes.",
+                   lambda: [({}, rss_bytes())])
@@ -0,0 +1,318 @@
+import bisect
+import threading
+import time
+import weakref
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.db import instrumentation
+
+# app/observability/metrics.py
+"""
+Minimal Prometheus metrics: counters, histograms and callback gauges,
+rendered in the text exposition format (0.0.4) by render().
+
+Writes are lock-free: every thread updates its own shard (a plain dict
+reached through threading.local), and only a scrape walks all shards and
+sums them. A lock is taken once per thread per metric, when its shard is
+created, and once more when the thread exits: its shard is then folded into
+a per-metric "retired" total, so threadpool churn does not grow the shard
+list.
+
+MetricsMiddleware records per-route request counts, status codes, latency
+and SQL statements per request (route templates, never raw paths, so label
+cardinality stays bounded).
+"""
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _ShardHolder:
+    """Per-thread sentinel whose collection marks the thread's exit."""
+
+    __slots__ = ("__weakref__",)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[Dict[LabelValues, Any]] = []
+        self._retired: Dict[LabelValues, Any] = {}
+        # Reentrant: a retirement finalizer may run on a thread already holding it
+        self._shards_lock = threading.RLock()
+
+    def _shard(self) -> Dict[LabelValues, Any]:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            # Dropped with the thread's locals when the thread exits
+            holder = self._local.holder = _ShardHolder()
+            with self._shards_lock:
+                self._shards.append(shard)
+            weakref.finalize(holder, self._retire, shard).atexit = False
+        return shard
+
+    def _retire(self, shard: Dict[LabelValues, Any]) -> None:
+        with self._shards_lock:
+            self._shards = [s for s in self._shards if s is not shard]
+            for key, value in shard.items():
+                # New objects, never mutated in place, so snapshots can share them
+                self._retired[key] = self._merge(self._retired.get(key), value)
+
+    def _merge(self, total: Any, value: Any) -> Any:
+        raise NotImplementedError
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def _snapshots(self) -> List[List[Tuple[LabelValues, Any]]]:
+        with self._shards_lock:
+            shards = list(self._shards)
+            retired = list(self._retired.items())
+        return [retired] + [list(shard.items()) for shard in shards]
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        shard = self._shard()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0.0) + amount
+
+    def _merge(self, total: Optional[float], value: float) -> float:
+        return (total or 0.0) + value
+
+    def values(self) -> Dict[LabelValues, float]:
+        totals: Dict[LabelValues, float] = {}
+        for items in self._snapshots():
+            for key, value in items:
+                totals[key] = totals.get(key, 0.0) + value
+        return totals
+
+    def collect(self) -> List[str]:
+        lines = self.header()
+        for key, value in sorted(self.values().items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: Any) -> None:
+        shard = self._shard()
+        key = self._key(labels)
+        state = shard.get(key)
+        if state is None:
+            # per-bucket counts (+Inf last), then sum
+            state = shard[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        state[bisect.bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    def _merge(self, total: Optional[List[float]], state: List[float]) -> List[float]:
+        return list(state) if total is None else [a + b for a, b in zip(total, state)]
+
+    def values(self) -> Dict[LabelValues, List[float]]:
+        totals: Dict[LabelValues, List[float]] = {}
+        for items in self._snapshots():
+            for key, state in items:
+                acc = totals.setdefault(key, [0] * len(state))
+                for i, v in enumerate(list(state)):
+                    acc[i] += v
+        return totals
+
+    def collect(self) -> List[str]:
+        lines = self.header()
+        for key, state in sorted(self.values().items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), state[:-1]):
+                cumulative += count
+                le = 'le="%s"' % _format_value(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class GaugeFunc(_Metric):
+    """Gauge (or counter) whose samples come from a callback at scrape time."""
+
+    def __init__(self, name: str, documentation: str,
+                 fn: Callable[[], Iterable[Tuple[Dict[str, Any], float]]],
+                 labelnames: Sequence[str] = (), kind: str = "gauge"):
+        super().__init__(name, documentation, labelnames)
+        self.kind = kind
+        self.fn = fn
+
+    def collect(self) -> List[str]:
+        lines = self.header()
+        for labels, value in self.fn():
+            if value is None:
+                continue
+            lines.append(f"{self.name}{_format_labels(self.labelnames, self._key(labels))} {_format_value(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            try:
+                lines.extend(metric.collect())
+            except Exception as e:  # one broken collector must not break the scrape
+                lines.append(f"# collect error in {metric.name}: {_escape(str(e))}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (),
+              buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+def gauge_func(name: str, documentation: str, fn: Callable[[], Iterable[Tuple[Dict[str, Any], float]]],
+               labelnames: Sequence[str] = (), kind: str = "gauge") -> GaugeFunc:
+    return REGISTRY.register(GaugeFunc(name, documentation, fn, labelnames, kind))
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# ---- application metrics ----
+
+HTTP_REQUESTS = counter("http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+HTTP_LATENCY = histogram("http_request_duration_seconds", "HTTP request latency by route.", ("method", "route"))
+HTTP_DB_QUERIES = histogram("http_request_db_queries", "SQL statements executed per HTTP request.",
+                            ("method", "route"), buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100))
+ML_INFERENCE = histogram("ml_inference_duration_seconds", "Model inference time per call.", ("endpoint",),
+                         buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0))
+ML_ROWS = counter("ml_inference_rows_total", "Rows scored by the model.", ("endpoint",))
+CACHE_REQUESTS = counter("cache_requests_total", "Cache lookups by cache and result (hit/miss).", ("cache", "result"))
+DB_SLOW_QUERIES = counter("db_slow_queries_total", "Statements over the slow-query threshold that were reported.",
+                          ("full_scan",))
+DB_POOL_WAIT = histogram("db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection.",
+                         buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0))
+
+gauge_func("db_queries_total", "SQL statements executed by this process.",
+           lambda: [({}, instrumentation.totals()["queries"])], kind="counter")
+gauge_func("db_query_duration_seconds_total", "Time spent executing SQL statements.",
+           lambda: [({}, instrumentation.totals()["db_time_s"])], kind="counter")
+gauge_func("db_repeated_statement_warnings_total", "Requests flagged as possible N+1.",
+           lambda: [({}, instrumentation.totals()["repeat_warnings"])], kind="counter")
+
+
+def cache_lookup(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def instrument_pool(engine: Any) -> None:
+    """
+    Time connection checkouts and export pool occupancy. Wraps the pool's
+    _do_get (the blocking part of a checkout); idempotent.
+    """
+    pool = engine.pool
+    do_get = getattr(pool, "_do_get", None)
+    if do_get is not None and not getattr(do_get, "_mindtrack_timed", False):
+        def timed_do_get(*args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                return do_get(*args, **kwargs)
+            finally:
+                DB_POOL_WAIT.observe(time.perf_counter() - start)
+        timed_do_get._mindtrack_timed = True
+        pool._do_get = timed_do_get
+
+    def occupancy():
+        for state, method in (("checked_out", "checkedout"), ("idle", "checkedin"),
+                              ("size", "size"), ("overflow", "overflow")):
+            fn = getattr(pool, method, None)
+            if callable(fn):
+                yield {"state": state}, fn()
+
+    gauge_func("db_pool_connections", "Connection pool occupancy.", occupancy, ("state",))
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request by route template."""
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status_holder = {"status": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder["status"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            path = instrumentation.route_template(scope) or "<unmatched>"
+            method = scope.get("method", "")
+            HTTP_LATENCY.observe(time.perf_counter() - start, method=method, route=path)
+            HTTP_REQUESTS.inc(method=method, route=path, status=status_holder["status"])
+            sql = instrumentation.current()
+            if sql is not None:
+                HTTP_DB_QUERIES.observe(sql.queries, method=method, route=path)
@@ -0,0 +1,257 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# app/observability/profiling.py
+"""
+Opt-in sampling profiler for single requests.
+
+With REQUEST_PROFILING_ENABLED=true, main.py installs ProfilingMiddleware.
+A request carrying `X-Profile: 1` and a valid `X-Admin-Token` is then
+sampled: a background thread reads the stacks of the thread serving the
+request (and of busy threadpool workers) every PROFILE_INTERVAL_MS (default
+1ms) via sys._current_frames(). When profiling is off the middleware is not
+installed at all, so the normal path pays nothing.
+
+Profiles cover this request only. The event-loop thread is shared by every
+in-flight request, so a sample of it counts only when this request's
+middleware frame is on the stack. Threadpool workers cannot be tied to a
+request from outside, so their samples count only while this request is the
+only one in flight; the rest are skipped and reported as shared_samples.
+
+Each profile is written as JSON (metadata plus collapsed stacks) into a
+bounded on-disk ring, PROFILE_DIR (default <tmp>/mindtrack-profiles), keeping
+the newest PROFILE_RING_SIZE (default 50). The admin endpoints serve the
+collapsed "frame;frame;frame count" lines that flamegraph.pl, speedscope and
+similar tools read directly. The response carries X-Profile-Id.
+"""
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "mindtrack-profiles"))
+RING_SIZE = int(os.getenv("PROFILE_RING_SIZE", "50"))
+INTERVAL_S = float(os.getenv("PROFILE_INTERVAL_MS", "1")) / 1000.0
+
+# Threadpool workers blocked on these are idle, not working for the request
+_IDLE_FRAMES = {"wait", "get", "_wait_for_tstate_lock", "select", "poll"}
+
+
+def enabled() -> bool:
+    return os.getenv("REQUEST_PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+
+
+def _frame_label(frame: Any) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def collapse(frame: Any) -> str:
+    """Root-first, semicolon-joined stack of a frame."""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class StackSampler:
+    """
+    Sample the stacks of the given threads (plus busy pool workers) on a timer thread.
+
+    With root_frame, a sample of thread_ids counts only when root_frame is on
+    its stack; with exclusive, a pool worker sample counts only while
+    exclusive() is true (the others are tallied in shared_samples).
+    """
+
+    def __init__(self, thread_ids: Iterable[int], interval: float = INTERVAL_S,
+                 include_workers: bool = True, root_frame: Any = None,
+                 exclusive: Optional[Callable[[], bool]] = None):
+        self.thread_ids = set(thread_ids)
+        self.interval = interval
+        self.include_workers = include_workers
+        self.root_frame = root_frame
+        self.exclusive = exclusive
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self.shared_samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _targets(self) -> set:
+        targets = set(self.thread_ids)
+        if self.include_workers:
+            targets.update(t.ident for t in threading.enumerate()
+                           if t.name.startswith(("AnyIO worker thread", "ThreadPoolExecutor")))
+        return targets
+
+    def _owns(self, frame: Any) -> bool:
+        while frame is not None:
+            if frame is self.root_frame:
+                return True
+            frame = frame.f_back
+        return False
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.is_set():
+            targets = self._targets()
+            frames = sys._current_frames()
+            for ident in targets:
+                frame = frames.get(ident)
+                if frame is None or ident == own:
+                    continue
+                if ident in self.thread_ids:
+                    if self.root_frame is not None and not self._owns(frame):
+                        continue  # the shared event loop is running another request
+                elif frame.f_code.co_name in _IDLE_FRAMES:
+                    continue
+                elif self.exclusive is not None and not self.exclusive():
+                    self.shared_samples += 1
+                    continue
+                self.counts[collapse(frame)] += 1
+            del frames
+            self.samples += 1
+            self._stop.wait(self.interval)
+
+    def start(self) -> "StackSampler":
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.counts
+
+
+# ---- on-disk ring ----
+
+
+def save_profile(counts: Counter, meta: Dict[str, Any], directory: Optional[str] = None,
+                 ring_size: Optional[int] = None) -> str:
+    """Write a profile and prune the ring to ring_size files. Returns the profile id."""
+    directory = directory or PROFILE_DIR
+    ring_size = ring_size or RING_SIZE
+    os.makedirs(directory, exist_ok=True)
+    # Time-ordered ids: lexical order of the file names is the ring order
+    profile_id = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+    payload = {"id": profile_id, **meta, "stacks": dict(counts.most_common())}
+    tmp = os.path.join(directory, f".{profile_id}.tmp")
+    with open(tmp, "w") as fh:
+        json.dump(payload, fh)
+    os.replace(tmp, os.path.join(directory, f"{profile_id}.json"))
+    files = sorted(f for f in os.listdir(directory) if f.endswith(".json"))
+    for stale in files[:-ring_size]:
+        try:
+            os.remove(os.path.join(directory, stale))
+        except OSError:
+            pass
+    return profile_id
+
+
+def list_profiles(directory: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Metadata of stored profiles, newest first."""
+    directory = directory or PROFILE_DIR
+    if not os.path.isdir(directory):
+        return []
+    out = []
+    for name in sorted((f for f in os.listdir(directory) if f.endswith(".json")), reverse=True):
+        try:
+            with open(os.path.join(directory, name)) as fh:
+                data = json.load(fh)
+        except (OSError, ValueError):
+            continue
+        data.pop("stacks", None)
+        out.append(data)
+    return out
+
+
+def load_profile(profile_id: str, directory: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    if not profile_id.replace("-", "").isalnum():
+        return None
+    path = os.path.join(directory or PROFILE_DIR, f"{profile_id}.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def to_folded(profile: Dict[str, Any]) -> str:
+    """Collapsed-stack text ("a;b;c 12" per line), the flamegraph input format."""
+    return "".join(f"{stack} {count}\n" for stack, count in profile["stacks"].items())
+
+
+# ---- middleware ----
+
+
+class ProfilingMiddleware:
+    """Profile requests that ask for it with X-Profile: 1 and a valid X-Admin-Token."""
+
+    def __init__(self, app: Any, directory: Optional[str] = None):
+        self.app = app
+        self.directory = directory
+        # Requests in flight through this app, to tell whether the threadpool is ours alone
+        self.in_flight = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        self.in_flight += 1
+        try:
+            await self._handle(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+
+    async def _handle(self, scope, receive, send):
+        headers = dict(scope.get("headers") or [])
+        if headers.get(b"x-profile") not in (b"1", b"true"):
+            await self.app(scope, receive, send)
+            return
+        from app.routers.admin import token_is_valid
+
+        if not token_is_valid(headers.get(b"x-admin-token", b"").decode("latin-1")):
+            await self.app(scope, receive, send)
+            return
+
+        from app.db import instrumentation
+
+        sampler = StackSampler([threading.get_ident()], root_frame=sys._getframe(),
+                               exclusive=lambda: self.in_flight == 1).start()
+        started = time.perf_counter()
+        status_holder: Dict[str, Any] = {}
+        profile_id = f"pending-{uuid.uuid4().hex[:8]}"
+        meta: Dict[str, Any] = {}
+
+        async def send_wrapper(message):
+            nonlocal profile_id
+            if message["type"] == "http.response.start":
+                status_holder["status"] = message["status"]
+                counts = sampler.stop()
+                meta.update({
+                    "created_at": datetime.now(timezone.utc).isoformat(),
+                    "method": scope.get("method"),
+                    "path": scope.get("path"),
+                    "route": instrumentation.route_template(scope),
+                    "status": message["status"],
+                    "duration_ms": (time.perf_counter() - started) * 1000.0,
+                    "samples": sampler.samples,
+                    "shared_samples": sampler.shared_samples,
+                    "interval_ms": sampler.interval * 1000.0,
+                })
+                profile_id = save_profile(counts, meta, self.directory)
+                message = {**message, "headers": [*message.get("headers", []),
+                                                  (b"x-profile-id", profile_id.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if "status" not in status_holder:
+                sampler.stop()
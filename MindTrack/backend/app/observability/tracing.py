@@ -0,0 +1,404 @@
+import functools
+import json
+import logging
+import os
+import queue
+import random
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from app.db import instrumentation
+
+# app/observability/tracing.py
+"""
+Lightweight in-process tracing.
+
+TracingMiddleware opens a root span per HTTP request. Sampling is decided
+once, at the head: an incoming W3C `traceparent` header is honoured,
+otherwise a request is sampled with probability TRACE_SAMPLE_RATE (default
+0.01). Within a sampled request, span() / @traced open child spans
+(services, model inference) and every SQL statement becomes a "db.query"
+span via the instrumentation listener. The current trace and span live in
+contextvars, so they follow the request into threadpool workers.
+Unsampled requests pay one contextvar lookup per instrumented call.
+
+When the root span ends, the whole trace is queued (bounded; dropped and
+counted when full) for a background exporter, which writes one OTLP/JSON
+ExportTraceServiceRequest per trace to TRACE_EXPORTER:
+
+- file:<path>  append JSON lines (default <tmp>/mindtrack-traces.jsonl)
+- otlp:<url>   POST to an OTLP/HTTP collector, e.g. http://localhost:4318/v1/traces
+- log          one summary line per trace
+
+Enable with TRACING_ENABLED=true; when off, no middleware or listener is installed.
+"""
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "mindtrack-api")
+DEFAULT_EXPORT_PATH = os.path.join(tempfile.gettempdir(), "mindtrack-traces.jsonl")
+MAX_SPANS_PER_TRACE = 1000
+
+# OTLP span kinds
+INTERNAL, SERVER, CLIENT = 1, 2, 3
+
+
+def enabled() -> bool:
+    return os.getenv("TRACING_ENABLED", "false").lower() in ("1", "true", "yes")
+
+
+def _new_id(nbytes: int) -> str:
+    return "%0*x" % (nbytes * 2, random.getrandbits(nbytes * 8))
+
+
+@dataclass
+class Span:
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    name: str
+    kind: int = INTERNAL
+    start_ns: int = 0
+    end_ns: int = 0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    def set(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+
+@dataclass
+class Trace:
+    trace_id: str
+    spans: List[Span] = field(default_factory=list)
+    dropped_spans: int = 0
+
+    def add(self, span: Span) -> None:
+        if len(self.spans) < MAX_SPANS_PER_TRACE:
+            self.spans.append(span)
+        else:
+            self.dropped_spans += 1
+
+
+_trace: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+_span: ContextVar[Optional[Span]] = ContextVar("span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _span.get()
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """(trace_id, parent_span_id, sampled) from a W3C traceparent header; None if invalid."""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        flags = int(parts[3], 16)
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+
+@contextmanager
+def start_trace(name: str, traceparent: Optional[str] = None, sample_rate: Optional[float] = None,
+                kind: int = SERVER, **attributes: Any) -> Iterator[Optional[Span]]:
+    """
+    Open a root span if this trace is sampled (yields None otherwise). When it
+    closes, the trace is handed to the exporter.
+    """
+    incoming = parse_traceparent(traceparent)
+    if incoming is not None:
+        trace_id, parent_id, sampled = incoming
+    else:
+        rate = SAMPLE_RATE if sample_rate is None else sample_rate
+        trace_id, parent_id, sampled = None, None, random.random() < rate
+    if not sampled:
+        yield None
+        return
+
+    trace = Trace(trace_id or _new_id(16))
+    root = Span(trace.trace_id, _new_id(8), parent_id, name, kind, time.time_ns(), attributes=dict(attributes))
+    trace_token, span_token = _trace.set(trace), _span.set(root)
+    start = time.perf_counter_ns()
+    try:
+        yield root
+    except BaseException as e:
+        root.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        root.end_ns = root.start_ns + (time.perf_counter_ns() - start)
+        _span.reset(span_token)
+        _trace.reset(trace_token)
+        trace.add(root)
+        exporter = _exporter
+        if exporter is not None:
+            exporter.submit(trace)
+
+
+@contextmanager
+def span(name: str, kind: int = INTERNAL, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Child span of the current one; yields None (and records nothing) outside a sampled trace."""
+    trace = _trace.get()
+    parent = _span.get()
+    if trace is None or parent is None:
+        yield None
+        return
+    current = Span(trace.trace_id, _new_id(8), parent.span_id, name, kind, time.time_ns(),
+                   attributes=attributes)
+    token = _span.set(current)
+    start = time.perf_counter_ns()
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.end_ns = current.start_ns + (time.perf_counter_ns() - start)
+        _span.reset(token)
+        trace.add(current)
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Decorator: run the function inside span(name), default "<module>.<function>"."""
+    def decorate(fn: Callable) -> Callable:
+        span_name = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if _trace.get() is None:
+                return fn(*args, **kwargs)
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def record_statement(statement: str, parameters: Any, elapsed: float, conn: Any) -> None:
+    """instrumentation listener: record a finished SQL statement as a db.query span."""
+    trace = _trace.get()
+    parent = _span.get()
+    if trace is None or parent is None:
+        return
+    end = time.time_ns()
+    trace.add(Span(trace.trace_id, _new_id(8), parent.span_id, "db.query", CLIENT,
+                   end - int(elapsed * 1e9), end,
+                   {"db.system": conn.engine.dialect.name, "db.statement": " ".join(statement.split())[:500]}))
+
+
+# ---- export ----
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": k, "value": _otlp_value(v)} for k, v in attributes.items() if v is not None]
+
+
+def to_otlp(trace: Trace, service_name: str = SERVICE_NAME) -> Dict[str, Any]:
+    """One trace as an OTLP/JSON ExportTraceServiceRequest."""
+    spans = []
+    for s in sorted(trace.spans, key=lambda s: s.start_ns):
+        otlp = {
+            "traceId": s.trace_id,
+            "spanId": s.span_id,
+            "name": s.name,
+            "kind": s.kind,
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.end_ns),
+            "attributes": _otlp_attributes(s.attributes),
+            "status": {"code": 2, "message": s.error} if s.error else {"code": 0},
+        }
+        if s.parent_id:
+            otlp["parentSpanId"] = s.parent_id
+        spans.append(otlp)
+    return {"resourceSpans": [{
+        "resource": {"attributes": _otlp_attributes({"service.name": service_name, "process.pid": os.getpid()})},
+        "scopeSpans": [{"scope": {"name": "mindtrack"}, "spans": spans}],
+    }]}
+
+
+class LogSpanSink:
+    def send(self, trace: Trace) -> None:
+        root = max(trace.spans, key=lambda s: s.end_ns - s.start_ns)
+        logger.info("Trace %s %s %.1fms (%d spans)", trace.trace_id, root.name, root.duration_ms, len(trace.spans))
+
+
+class FileSpanSink:
+    """Append each trace as one OTLP/JSON line."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def send(self, trace: Trace) -> None:
+        with open(self.path, "a") as fh:
+            fh.write(json.dumps(to_otlp(trace)) + "\n")
+
+
+class OTLPHttpSink:
+    """POST each trace to an OTLP/HTTP collector (JSON encoding)."""
+
+    def __init__(self, url: str, timeout: float = 5.0):
+        import httpx
+
+        self.url = url
+        self._client = httpx.Client(timeout=timeout)
+
+    def send(self, trace: Trace) -> None:
+        response = self._client.post(self.url, json=to_otlp(trace))
+        response.raise_for_status()
+
+    def close(self) -> None:
+        self._client.close()
+
+
+def sink_from_env(spec: Optional[str] = None) -> Any:
+    spec = spec if spec is not None else os.getenv("TRACE_EXPORTER", f"file:{DEFAULT_EXPORT_PATH}")
+    kind, _, target = spec.partition(":")
+    if kind == "file" and target:
+        return FileSpanSink(target)
+    if kind == "otlp" and target:
+        return OTLPHttpSink(target)
+    if kind != "log":
+        logger.warning("Unknown TRACE_EXPORTER %r; logging traces instead", spec)
+    return LogSpanSink()
+
+
+class SpanExporter:
+    """Background thread draining finished traces into a sink. submit() never blocks."""
+
+    def __init__(self, sink: Any, queue_size: int = 1000):
+        self.sink = sink
+        self._queue: "queue.Queue[Optional[Trace]]" = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self.exported = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def submit(self, trace: Trace) -> bool:
+        try:
+            self._queue.put_nowait(trace)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _run(self) -> None:
+        while True:
+            trace = self._queue.get()
+            try:
+                if trace is None:
+                    return
+                self.sink.send(trace)
+                self.exported += 1
+            except Exception as e:
+                self.errors += 1
+                logger.warning("Trace export failed: %s", e)
+            finally:
+                self._queue.task_done()
+
+    def start(self) -> "SpanExporter":
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+            self._thread.start()
+        return self
+
+    def flush(self) -> None:
+        """Block until every submitted trace has been handed to the sink."""
+        self._queue.join()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        close = getattr(self.sink, "close", None)
+        if close is not None:
+            close()
+
+    def stats(self) -> Dict[str, int]:
+        return {"exported": self.exported, "dropped": self.dropped, "errors": self.errors,
+                "queued": self._queue.qsize()}
+
+
+_exporter: Optional[SpanExporter] = None
+
+
+def get_exporter() -> Optional[SpanExporter]:
+    return _exporter
+
+
+def start_exporter(sink: Any = None, queue_size: int = int(os.getenv("TRACE_EXPORT_QUEUE_SIZE", "1000"))) -> SpanExporter:
+    global _exporter
+    if _exporter is None:
+        _exporter = SpanExporter(sink if sink is not None else sink_from_env(), queue_size).start()
+    return _exporter
+
+
+def stop_exporter() -> None:
+    global _exporter
+    if _exporter is not None:
+        _exporter.stop()
+        _exporter = None
+
+
+class TracingMiddleware:
+    """ASGI middleware opening the root span of each HTTP request."""
+
+    def __init__(self, app: Any, sample_rate: Optional[float] = None):
+        self.app = app
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        traceparent = headers.get(b"traceparent", b"").decode("latin-1") or None
+        method = scope.get("method", "")
+        with start_trace(f"{method} {scope.get('path', '')}", traceparent, self.sample_rate,
+                         **{"http.method": method, "http.target": scope.get("path", "")}) as root:
+            if root is None:
+                await self.app(scope, receive, send)
+                return
+
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    root.set("http.status_code", message["status"])
+                    if message["status"] >= 500:
+                        root.error = f"HTTP {message['status']}"
+                    message = {**message, "headers": [*message.get("headers", []),
+                                                      (b"x-trace-id", root.trace_id.encode())]}
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = instrumentation.route_template(scope)
+                if route:
+                    root.name = f"{method} {route}"
+                    root.set("http.route", route)
@@ -0,0 +1,107 @@
+import hmac
+import os
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+
+from app.db import slow_query
+from app.observability import memory, profiling
+
+# Operator-only endpoints (request profiles, memory, slow queries). Every route
+# requires X-Admin-Token to match MINDTRACK_ADMIN_TOKEN; with no token
+# configured the admin API answers 404.
+
+router = APIRouter()
+
+
+def token_is_valid(token: Optional[str]) -> bool:
+    expected = os.getenv("MINDTRACK_ADMIN_TOKEN", "")
+    return bool(expected) and bool(token) and hmac.compare_digest(token.encode(), expected.encode())
+
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)) -> None:
+    if not os.getenv("MINDTRACK_ADMIN_TOKEN"):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not token_is_valid(x_admin_token):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid admin token")
+
+
+@router.get("/profiles")
+async def list_profiles():
+    """Stored request profiles, newest first (metadata only)."""
+    return {"enabled": profiling.enabled(), "profiles": profiling.list_profiles()}
+
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str, format: str = Query("folded", pattern="^(folded|json)$")):
+    """One profile: collapsed stacks for flamegraph.pl/speedscope, or the raw JSON."""
+    profile = profiling.load_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    if format == "json":
+        return profile
+    return PlainTextResponse(profiling.to_folded(profile))
+
+
+# ---- memory ----
+# Heap walks and snapshot comparisons are CPU-bound: plain def, so they run
+# in the threadpool instead of stalling the event loop.
+
+
+@router.get("/memory")
+def memory_components():
+    """Approximate memory per component (model, caches, pool), RSS and tracemalloc state."""
+    return memory.components()
+
+
+@router.post("/memory/tracemalloc/start")
+async def start_tracemalloc(frames: int = Query(memory.DEFAULT_FRAMES, ge=1, le=100)):
+    return memory.start(frames)
+
+
+@router.post("/memory/tracemalloc/stop")
+async def stop_tracemalloc():
+    return memory.stop()
+
+
+@router.post("/memory/snapshots", status_code=status.HTTP_201_CREATED)
+def take_snapshot():
+    try:
+        snapshot_id = memory.take_snapshot()
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return {"id": snapshot_id, **memory.status()}
+
+
+@router.get("/memory/snapshots/{snapshot_id}/top")
+def snapshot_top(snapshot_id: int, key: str = Query("lineno", pattern="^(lineno|filename|traceback)$"),
+                 limit: int = Query(25, ge=1, le=500)):
+    """Largest allocation sites of a snapshot."""
+    try:
+        return memory.top(snapshot_id, key, limit)
+    except KeyError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e.args[0]))
+
+
+@router.get("/memory/diff")
+def snapshot_diff(base: int, current: int,
+                  key: str = Query("lineno", pattern="^(lineno|filename|traceback)$"),
+                  limit: int = Query(25, ge=1, le=500)):
+    """Allocation sites that grew most between two snapshots."""
+    try:
+        return memory.diff(base, current, key, limit)
+    except KeyError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e.args[0]))
+
+
+# ---- database ----
+
+
+@router.get("/slow-queries")
+async def slow_queries(limit: int = Query(50, ge=1, le=500)):
+    """Slowest statement fingerprints seen by this worker, with their last plan."""
+    log = slow_query.get_log()
+    if log is None:
+        return {"enabled": False, "queries": []}
+    return {"enabled": True, "threshold_ms": log.threshold_s * 1000.0, "queries": log.recent(limit)}
@@ -4,14 +4,14 @@ from typing import List, Dict, Any
 from datetime import date
 
 from app.db.database import get_db
-from app.models.habit_entry import HabitEntryCreate, HabitEntryResponse
+from app.models.habit_entry import HabitEntryBulkCreate, HabitEntryCreate, HabitEntryResponse
 from app.services import habit_service
 
 router = APIRouter()
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
 async def create_habit_entry(entry: HabitEntryCreate, db: Session = Depends(get_db)):
-    """Create a new habit entry"""
+    """Create a new habit entry; badges earned by it are returned under awarded_badges"""
     try:
         entry_data = {
             "user_id": str(entry.user_id),
@@ -30,6 +30,28 @@ async def create_habit_entry(entry: HabitEntryCreate, db: Session = Depends(get_
             detail=f"Failed to create habit entry: {str(e)}"
         )
 
+@router.post("/bulk", status_code=status.HTTP_201_CREATED)
+async def create_habit_entries_bulk(payload: HabitEntryBulkCreate, db: Session = Depends(get_db)):
+    """Create or update several entries of one user in one transaction"""
+    try:
+        entries = [
+            {
+                "habit_name": item.habit_name,
+                "date": item.entry_date,
+                "target_value": item.target_value,
+                "status": item.status,
+                "notes": item.notes,
+                "mood": item.mood,
+            }
+            for item in payload.entries
+        ]
+        return habit_service.create_habit_entries_bulk(db, payload.user_id, entries)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Failed to create habit entries: {str(e)}"
+        )
+
 @router.get("/user/{user_id}", response_model=List[Dict[str, Any]])
 async def get_user_habits(
     user_id: str,
@@ -4,6 +4,7 @@ from typing import Dict, Any, List
 from datetime import date, timedelta
 
 from app.db.database import get_db
+from app.observability import tracing
 from app.services import habit_service, badge_service
 
 router = APIRouter()
@@ -26,20 +27,18 @@ async def get_user_insights(user_id: str, days: int = 30, db: Session = Depends(
         habit_insights = {}
         unique_habits = set(entry.get("habit_name") for entry in entries)
         
+        # One query for every habit's streaks rather than one per habit
+        try:
+            all_streaks = habit_service.compute_all_streaks(db, user_id, list(unique_habits))
+        except Exception:
+            all_streaks = {}
         for habit_name in unique_habits:
-            try:
-                streaks = habit_service.compute_streaks(db, user_id, habit_name)
-                habit_insights[habit_name] = {
-                    "current_streak": streaks.get("current_streak", 0),
-                    "max_streak": streaks.get("max_streak", 0),
-                    "last_done_date": streaks.get("last_done_date")
-                }
-            except Exception:
-                habit_insights[habit_name] = {
-                    "current_streak": 0,
-                    "max_streak": 0,
-                    "last_done_date": None
-                }
+            streaks = all_streaks.get(habit_name, {})
+            habit_insights[habit_name] = {
+                "current_streak": streaks.get("current_streak", 0),
+                "max_streak": streaks.get("max_streak", 0),
+                "last_done_date": streaks.get("last_done_date")
+            }
         
         # Get recent badges
         try:
@@ -50,23 +49,23 @@ async def get_user_insights(user_id: str, days: int = 30, db: Session = Depends(
         
         # Generate recommendations
         recommendations = []
-        
-        if completion.get("completion_rate", 0) < 0.7:
-            recommendations.append({
-                "title": "Improve Consistency",
-                "body": f"Your completion rate is {completion['completion_rate']*100:.1f}%. Try to complete at least {completion['total_entries'] - completion['total_done']} more entries.",
-                "confidence": "high" if completion.get("total_entries", 0) > 10 else "medium"
-            })
-        
-        # Find strongest habit
-        if habit_insights:
-            best_habit = max(habit_insights.items(), key=lambda x: x[1].get("current_streak", 0))
-            if best_habit[1]["current_streak"] >= 3:
+        with tracing.span("insights.recommendations"):
+            if completion.get("completion_rate", 0) < 0.7:
                 recommendations.append({
-                    "title": "Maintain Your Momentum",
-                    "body": f"Great work on your {best_habit[0]} streak! You've maintained it for {best_habit[1]['current_streak']} days.",
-                    "confidence": "high"
+                    "title": "Improve Consistency",
+                    "body": f"Your completion rate is {completion['completion_rate']*100:.1f}%. Try to complete at least {completion['total_entries'] - completion['total_done']} more entries.",
+                    "confidence": "high" if completion.get("total_entries", 0) > 10 else "medium"
                 })
+
+            # Find strongest habit
+            if habit_insights:
+                best_habit = max(habit_insights.items(), key=lambda x: x[1].get("current_streak", 0))
+                if best_habit[1]["current_streak"] >= 3:
+                    recommendations.append({
+                        "title": "Maintain Your Momentum",
+                        "body": f"Great work on your {best_habit[0]} streak! You've maintained it for {best_habit[1]['current_streak']} days.",
+                        "confidence": "high"
+                    })
         
         return {
             "user_id": user_id,
@@ -1,15 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
 import os
+import time
 import joblib
 import pandas as pd
 import numpy as np
 
+from app.observability import metrics, tracing
+from app.services import drift_service, forest_service
+
 router = APIRouter()
 
-# Load ML pipeline at startup
-PIPELINE_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "data", "pipeline.pkl")
+# Load ML pipeline at startup. PIPELINE_PATH can point at a pruned artifact
+# produced by model/prune_forest.py (e.g. data/pipeline_pruned.pkl).
+DEFAULT_PIPELINE_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "data", "pipeline.pkl")
+PIPELINE_PATH = os.getenv("PIPELINE_PATH", DEFAULT_PIPELINE_PATH)
 ml_pipeline = None
 
 def load_pipeline():
@@ -55,83 +61,187 @@ class SleepPredictionRequest(BaseModel):
             }
         }
 
+class SleepBatchPredictionRequest(BaseModel):
+    items: List[SleepPredictionRequest] = Field(..., min_length=1, max_length=1000,
+                                                description="Activity records to score in one call")
+
+
+def _build_input_features(request: SleepPredictionRequest) -> Dict[str, Any]:
+    """Map the API request onto the feature columns the pipeline was trained on."""
+    return {
+        "TotalSteps": request.total_steps,
+        "VeryActiveMinutes": request.very_active_minutes,
+        "FairlyActiveMinutes": request.fairly_active_minutes,
+        "LightlyActiveMinutes": request.lightly_active_minutes,
+        "SedentaryMinutes": request.sedentary_minutes,
+        "Calories": request.calories,
+        "total_active_minutes": (request.very_active_minutes + 
+                               request.fairly_active_minutes + 
+                               request.lightly_active_minutes),
+        "avg_steps_7d": request.avg_steps_7d or request.total_steps,
+        "prev_day_sleep": request.prev_day_sleep or 480.0,  # default to 8 hours
+        "is_weekend": request.is_weekend
+    }
+
+
+def _get_feature_importance(pipeline) -> Dict[str, float]:
+    """Return feature importances sorted descending, or {} if the model has none."""
+    feature_importance = {}
+    try:
+        model = pipeline.named_steps['model']
+        if hasattr(model, 'feature_importances_'):
+            # Get feature names from the preprocessor
+            preprocessor = pipeline.named_steps['preprocessor']
+            if hasattr(preprocessor, 'get_feature_names_out'):
+                feature_names = preprocessor.get_feature_names_out()
+            else:
+                # Fallback for older sklearn versions
+                feature_names = [f"feature_{i}" for i in range(len(model.feature_importances_))]
+            
+            importances = model.feature_importances_
+            feature_importance = dict(zip(feature_names, importances))
+            # Sort by importance
+            feature_importance = dict(sorted(feature_importance.items(), 
+                                            key=lambda x: x[1], 
+                                            reverse=True))
+    except Exception as e:
+        print(f"Could not get feature importances: {e}")
+    return feature_importance
+
+
+def _predict_frame(pipeline, df: pd.DataFrame, interval: Optional[float]):
+    """
+    Return (point predictions, interval dicts or None) for every row of df.
+
+    With an interval level, all per-tree outputs are built as one matrix and the
+    point estimate is its row mean, so the forest is traversed only once.
+    """
+    endpoint = "batch" if len(df) > 1 else "single"
+    start = time.perf_counter()
+    try:
+        with tracing.span("ml.predict", rows=len(df), interval=interval):
+            if interval is None:
+                return pipeline.predict(df), None
+            try:
+                matrix = forest_service.per_tree_predictions(pipeline, df)
+            except ValueError as e:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+            return matrix.mean(axis=1), forest_service.prediction_intervals(matrix, interval)
+    finally:
+        metrics.ML_INFERENCE.observe(time.perf_counter() - start, endpoint=endpoint)
+        metrics.ML_ROWS.inc(len(df), endpoint=endpoint)
+
+
+def _format_prediction(prediction: float, input_data: Dict[str, Any],
+                       interval: Optional[Dict[str, float]]) -> Dict[str, Any]:
+    # Round prediction to nearest minute
+    prediction_minutes = round(prediction)
+    
+    # Convert to hours and minutes for readability
+    hours = prediction_minutes // 60
+    minutes = prediction_minutes % 60
+    
+    result = {
+        "predicted_sleep_minutes": prediction_minutes,
+        "predicted_sleep_formatted": f"{hours}h {minutes}m",
+        "input_features": input_data
+    }
+    if interval is not None:
+        result["prediction_interval"] = interval
+    return result
+
+
+def _record_drift(rows: List[Dict[str, Any]]) -> None:
+    """Feed inference inputs into the drift sketches when a reference is available."""
+    monitor = drift_service.get_monitor(PIPELINE_PATH)
+    if monitor is not None:
+        monitor.record_many(rows)
+
+
+def _require_pipeline():
+    # Load pipeline if not already loaded
+    pipeline = load_pipeline()
+    if pipeline is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="ML pipeline not available. Please ensure pipeline.pkl exists in the data directory."
+        )
+    return pipeline
+
+
+INTERVAL_QUERY = Query(
+    None, gt=0, lt=1,
+    description="Central coverage of the optional prediction interval over per-tree outputs, e.g. 0.8"
+)
+
+
 @router.post("/sleep", response_model=Dict[str, Any])
-async def predict_sleep(request: SleepPredictionRequest):
+async def predict_sleep(request: SleepPredictionRequest, interval: Optional[float] = INTERVAL_QUERY):
     """Predict sleep duration based on activity data"""
     try:
-        # Load pipeline if not already loaded
-        pipeline = load_pipeline()
-        
-        if pipeline is None:
-            raise HTTPException(
-                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                detail="ML pipeline not available. Please ensure pipeline.pkl exists in the data directory."
-            )
+        pipeline = _require_pipeline()
         
         # Convert request to DataFrame
-        input_data = {
-            "TotalSteps": request.total_steps,
-            "VeryActiveMinutes": request.very_active_minutes,
-            "FairlyActiveMinutes": request.fairly_active_minutes,
-            "LightlyActiveMinutes": request.lightly_active_minutes,
-            "SedentaryMinutes": request.sedentary_minutes,
-            "Calories": request.calories,
-            "total_active_minutes": (request.very_active_minutes + 
-                                   request.fairly_active_minutes + 
-                                   request.lightly_active_minutes),
-            "avg_steps_7d": request.avg_steps_7d or request.total_steps,
-            "prev_day_sleep": request.prev_day_sleep or 480.0,  # default to 8 hours
-            "is_weekend": request.is_weekend
-        }
-        
+        input_data = _build_input_features(request)
+        _record_drift([input_data])
         df = pd.DataFrame([input_data])
         
         # Make prediction
-        prediction = pipeline.predict(df)[0]
+        predictions, intervals = _predict_frame(pipeline, df, interval)
         
-        # Get feature importances if available
-        feature_importance = {}
-        try:
-            model = pipeline.named_steps['model']
-            if hasattr(model, 'feature_importances_'):
-                # Get feature names from the preprocessor
-                preprocessor = pipeline.named_steps['preprocessor']
-                if hasattr(preprocessor, 'get_feature_names_out'):
-                    feature_names = preprocessor.get_feature_names_out()
-                else:
-                    # Fallback for older sklearn versions
-                    feature_names = [f"feature_{i}" for i in range(len(model.feature_importances_))]
-                
-                importances = model.feature_importances_
-                feature_importance = dict(zip(feature_names, importances))
-                # Sort by importance
-                feature_importance = dict(sorted(feature_importance.items(), 
-                                                key=lambda x: x[1], 
-                                                reverse=True))
-        except Exception as e:
-            print(f"Could not get feature importances: {e}")
-            pass  # Feature importances not available
+        result = _format_prediction(predictions[0], input_data, intervals[0] if intervals else None)
+        result["feature_importance"] = _get_feature_importance(pipeline)
+        return result
         
-        # Round prediction to nearest minute
-        prediction_minutes = round(prediction)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Prediction failed: {str(e)}"
+        )
+
+@router.post("/sleep/batch", response_model=Dict[str, Any])
+async def predict_sleep_batch(request: SleepBatchPredictionRequest, interval: Optional[float] = INTERVAL_QUERY):
+    """Predict sleep duration for several activity records in one pass"""
+    try:
+        pipeline = _require_pipeline()
+        
+        rows = [_build_input_features(item) for item in request.items]
+        _record_drift(rows)
+        df = pd.DataFrame(rows)
         
-        # Convert to hours and minutes for readability
-        hours = prediction_minutes // 60
-        minutes = prediction_minutes % 60
+        predictions, intervals = _predict_frame(pipeline, df, interval)
         
         return {
-            "predicted_sleep_minutes": prediction_minutes,
-            "predicted_sleep_formatted": f"{hours}h {minutes}m",
-            "feature_importance": feature_importance,
-            "input_features": input_data
+            "count": len(rows),
+            "predictions": [
+                _format_prediction(predictions[i], rows[i], intervals[i] if intervals else None)
+                for i in range(len(rows))
+            ],
+            "feature_importance": _get_feature_importance(pipeline)
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Prediction failed: {str(e)}"
+            detail=f"Batch prediction failed: {str(e)}"
         )
 
+@router.get("/drift", response_model=Dict[str, Any])
+async def drift_report(min_samples: int = Query(drift_service.MIN_SAMPLES, ge=1)):
+    """Compare live inference inputs with the training-time reference sketches"""
+    monitor = drift_service.get_monitor(PIPELINE_PATH)
+    if monitor is None:
+        return {
+            "status": "unavailable",
+            "message": "Drift reference not found. Run model/build_reference_sketches.py.",
+            "path": drift_service.reference_path_for(PIPELINE_PATH)
+        }
+    return monitor.report(min_samples=min_samples)
+
 @router.get("/health")
 async def ml_health_check():
     """Check if ML pipeline is available"""
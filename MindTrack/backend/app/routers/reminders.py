@@ -0,0 +1,89 @@
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy.orm import Session
+from typing import Any, Dict, List
+
+from app.db.database import get_db
+from app.models.reminder import (
+    ReminderBulkUpsert,
+    ReminderCreate,
+    ReminderResponse,
+    ReminderUpdate,
+)
+from app.services import reminder_service
+from app.services.reminder_service import ReminderNotFoundError, ReminderValidationError
+
+router = APIRouter()
+
+@router.post("/", response_model=ReminderResponse, status_code=status.HTTP_201_CREATED)
+async def create_reminder(reminder: ReminderCreate, db: Session = Depends(get_db)):
+    """Create a reminder"""
+    try:
+        return reminder_service.create_reminder(db, reminder.model_dump())
+    except ReminderValidationError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Failed to create reminder: {str(e)}"
+        )
+
+@router.get("/user/{user_id}", response_model=List[ReminderResponse])
+async def get_user_reminders(user_id: str, db: Session = Depends(get_db)):
+    """List a user's reminders (cached per user until the next write)"""
+    try:
+        return reminder_service.list_user_reminders_cached(db, user_id)
+    except ReminderNotFoundError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid user id: {user_id}")
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Failed to get reminders: {str(e)}"
+        )
+
+@router.put("/user/{user_id}/bulk", response_model=Dict[str, Any])
+async def bulk_upsert_reminders(user_id: str, payload: ReminderBulkUpsert, db: Session = Depends(get_db)):
+    """Create/update (and with replace=true, prune) a user's reminders in one call"""
+    try:
+        items = [item.model_dump(exclude_none=True) for item in payload.items]
+        return reminder_service.upsert_reminders(db, user_id, items, replace=payload.replace)
+    except ReminderNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except ReminderValidationError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Failed to upsert reminders: {str(e)}"
+        )
+
+@router.get("/{reminder_id}", response_model=ReminderResponse)
+async def get_reminder(reminder_id: str, db: Session = Depends(get_db)):
+    """Get a reminder by ID"""
+    try:
+        return reminder_service.get_reminder(db, reminder_id)
+    except ReminderNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+@router.put("/{reminder_id}", response_model=ReminderResponse)
+async def update_reminder(reminder_id: str, update: ReminderUpdate, db: Session = Depends(get_db)):
+    """Update time, repeat, habit or enabled flag of a reminder"""
+    try:
+        return reminder_service.update_reminder(db, reminder_id, update.model_dump(exclude_none=True))
+    except ReminderNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except ReminderValidationError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Failed to update reminder: {str(e)}"
+        )
+
+@router.delete("/{reminder_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_reminder(reminder_id: str, db: Session = Depends(get_db)):
+    """Delete a reminder"""
+    try:
+        reminder_service.delete_reminder(db, reminder_id)
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+    except ReminderNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
@@ -0,0 +1,191 @@
+import json
+import logging
+import os
+from dataclasses import asdict, dataclass
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.services import badge_service, rollup_service
+from app.services.rollup_service import RollupMatrix
+
+# badge_rules.py
+"""
+Declarative badge rules evaluated over user_daily_rollups.
+
+A rule is data (see DEFAULT_RULES, or a JSON list in BADGE_RULES_PATH):
+
+- rolling_count:      sum of `metric` over any `days`-day window >= `count`
+                      e.g. 20 habits done within 7 days
+- monthly_completion: entries_done / entries_total >= `threshold` in some
+                      calendar month with at least `min_entries` entries;
+                      only months wholly inside the window and ended by
+                      as_of count, never the month in progress
+- metric_streak:      `metric` >= `threshold` on `days` consecutive days
+                      e.g. 10,000 steps for 7 days
+
+Rules are compiled once into NumPy functions over a RollupMatrix (users x
+days per metric), so each rule is one vectorized pass over a whole batch of
+users. evaluate_rules() walks users in keyset batches: one rollup query, one
+query for badges already held and one multi-row INSERT per batch.
+"""
+
+logger = logging.getLogger(__name__)
+
+RULE_KINDS = ("rolling_count", "monthly_completion", "metric_streak")
+
+
+@dataclass(frozen=True)
+class BadgeRule:
+    name: str
+    description: str
+    kind: str
+    metric: str = "entries_done"
+    days: int = 7
+    count: float = 0
+    threshold: float = 0
+    min_entries: int = 0
+
+    @property
+    def lookback_days(self) -> int:
+        """History needed to evaluate the rule as of one day."""
+        if self.kind == "monthly_completion":
+            return 62  # always covers the whole previous calendar month
+        return self.days
+
+
+DEFAULT_RULES = (
+    BadgeRule("Busy Week", "Completed 20 habits within 7 days.", "rolling_count", days=7, count=20),
+    BadgeRule("Consistent Month", "Completed at least 80% of logged habits in a month.",
+              "monthly_completion", threshold=0.8, min_entries=20),
+    BadgeRule("10K Steps Week", "Walked 10,000+ steps every day for 7 days.",
+              "metric_streak", metric="total_steps", threshold=10000, days=7),
+    BadgeRule("Well Rested", "Slept 7+ hours for 5 nights in a row.",
+              "metric_streak", metric="minutes_asleep", threshold=420, days=5),
+)
+
+
+def load_rules(path: Optional[str] = None) -> List[BadgeRule]:
+    """Rules from a JSON list of BadgeRule fields, or DEFAULT_RULES."""
+    path = path or os.getenv("BADGE_RULES_PATH")
+    if not path:
+        return list(DEFAULT_RULES)
+    with open(path) as fh:
+        rules = [BadgeRule(**spec) for spec in json.load(fh)]
+    compile_rules(rules)  # validate early
+    return rules
+
+
+# ---- vectorized evaluators: RollupMatrix -> bool per user ----
+
+
+def _window_sums(values: np.ndarray, window: int) -> np.ndarray:
+    """Sums of every `window`-wide run of columns, via one cumulative sum."""
+    cs = np.concatenate([np.zeros((values.shape[0], 1)), np.cumsum(values, axis=1)], axis=1)
+    return cs[:, window:] - cs[:, :-window]
+
+
+def _rolling_count(rule: BadgeRule) -> Callable[[RollupMatrix], np.ndarray]:
+    def evaluate(m: RollupMatrix) -> np.ndarray:
+        values = np.nan_to_num(m.metrics[rule.metric], nan=0.0)
+        window = min(rule.days, m.days)
+        return _window_sums(values, window).max(axis=1, initial=0) >= rule.count
+    return evaluate
+
+
+def _metric_streak(rule: BadgeRule) -> Callable[[RollupMatrix], np.ndarray]:
+    def evaluate(m: RollupMatrix) -> np.ndarray:
+        if rule.days > m.days:
+            return np.zeros(len(m.user_ids), dtype=bool)
+        with np.errstate(invalid="ignore"):
+            hit = (m.metrics[rule.metric] >= rule.threshold).astype(float)  # NaN (no data) -> miss
+        return (_window_sums(hit, rule.days) >= rule.days).any(axis=1)
+    return evaluate
+
+
+def _monthly_completion(rule: BadgeRule) -> Callable[[RollupMatrix], np.ndarray]:
+    def evaluate(m: RollupMatrix) -> np.ndarray:
+        dates = m.dates
+        months = np.array([d.year * 12 + d.month for d in dates])
+        starts = np.flatnonzero(np.r_[True, months[1:] != months[:-1]])
+        total = np.add.reduceat(m.metrics["entries_total"], starts, axis=1)
+        done = np.add.reduceat(m.metrics["entries_done"], starts, axis=1)
+        # Months cut by the window: the first unless it starts on the 1st, the
+        # last unless the window ends on its last day (month still running)
+        whole = np.ones(len(starts), dtype=bool)
+        whole[0] &= dates[0].day == 1
+        whole[-1] &= (dates[-1] + timedelta(days=1)).day == 1
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rate = np.where(total > 0, done / total, 0.0)
+        earned = (total >= max(rule.min_entries, 1)) & (rate >= rule.threshold) & whole
+        return earned.any(axis=1)
+    return evaluate
+
+
+_COMPILERS = {
+    "rolling_count": _rolling_count,
+    "monthly_completion": _monthly_completion,
+    "metric_streak": _metric_streak,
+}
+
+
+def compile_rules(rules: Sequence[BadgeRule]) -> List[Callable[[RollupMatrix], np.ndarray]]:
+    compiled = []
+    for rule in rules:
+        if rule.kind not in _COMPILERS:
+            raise ValueError(f"Unknown badge rule kind {rule.kind!r} for {rule.name!r}; expected one of {RULE_KINDS}")
+        if rule.metric not in rollup_service.METRICS:
+            raise ValueError(f"Unknown metric {rule.metric!r} for {rule.name!r}")
+        compiled.append(_COMPILERS[rule.kind](rule))
+    return compiled
+
+
+def evaluate_matrix(rules: Sequence[BadgeRule], matrix: RollupMatrix) -> Dict[str, np.ndarray]:
+    """Rule name -> boolean array over matrix.user_ids."""
+    return {rule.name: fn(matrix) for rule, fn in zip(rules, compile_rules(rules))}
+
+
+def evaluate_rules(
+    db: Any,
+    rules: Optional[Sequence[BadgeRule]] = None,
+    as_of: Optional[date] = None,
+    user_ids: Optional[Sequence[Any]] = None,
+    batch_size: int = 2000,
+) -> Dict[str, Any]:
+    """
+    Evaluate every rule for every user (or user_ids) on the rollups ending at
+    as_of (default: yesterday) and award the badges earned. Returns counts.
+    """
+    rules = list(rules if rules is not None else load_rules())
+    compiled = compile_rules(rules)
+    as_of = as_of or date.today() - timedelta(days=1)
+    start = as_of - timedelta(days=max(r.lookback_days for r in rules) - 1)
+
+    if user_ids is not None:
+        ids = list(user_ids)
+        batches = (ids[i:i + batch_size] for i in range(0, len(ids), batch_size))
+    else:
+        batches = rollup_service.iter_user_batches(db, batch_size)
+
+    stats = {"users": 0, "awarded": 0, "by_rule": {r.name: 0 for r in rules}}
+    for batch in batches:
+        matrix = rollup_service.load_rollup_matrix(db, batch, start, as_of)
+        earned = []
+        for rule, fn in zip(rules, compiled):
+            for i in np.flatnonzero(fn(matrix)):
+                earned.append({"user_id": matrix.user_ids[i], "name": rule.name, "description": rule.description})
+        stats["users"] += len(batch)
+        if not earned:
+            continue
+        held = badge_service.get_badge_pairs(db, matrix.user_ids, [r.name for r in rules])
+        new = [row for row in earned if (row["user_id"], row["name"]) not in held]
+        for badge in badge_service.award_badges_bulk(db, new):
+            stats["awarded"] += 1
+            stats["by_rule"][badge["name"]] += 1
+    logger.info("Badge rules as of %s: %d users, %d badges awarded", as_of, stats["users"], stats["awarded"])
+    return stats
+
+
+def rules_as_dicts(rules: Sequence[BadgeRule]) -> List[Dict[str, Any]]:
+    return [asdict(r) for r in rules]
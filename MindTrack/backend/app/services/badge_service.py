@@ -1,8 +1,11 @@
 import logging
 import uuid
-from datetime import datetime
-from typing import Any, Dict, List
-from sqlalchemy import text
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from app.models import Badge
+from app.observability.tracing import traced
 from app.services import habit_service
 
 # badge_service.py
@@ -14,105 +17,162 @@ Responsibilities implemented:
 - get_user_badges(db, user_id)
 - award_custom_badge(db, user_id, name, description)
 - badge_exists(db, user_id, name)
-
-Assumptions:
-- There is a database table named "badges" with at least the columns:
-    id (UUID/text), user_id, name, description, awarded_at (timestamp)
-- `db` is a SQLAlchemy Session, Connection, or Engine-like object that supports
-  .execute(...) and .begin() context manager.
-- habit_service.compute_streaks(db, user_id) exists and returns either:
-    - an integer (current streak length),
-    - a dict containing 'current_streak' key,
-    - or an iterable of streak values (we will take the max).
+- get_badge_names(db, user_id)
+
+Notes:
+- `db` is a SQLAlchemy Session.
+- badges has a unique (user_id, name) index. Awards go in as one multi-row
+  INSERT ... ON CONFLICT DO NOTHING (SQLite/PostgreSQL), so a badge that
+  already exists, or is awarded concurrently, is skipped by the database
+  rather than by a per-badge existence query.
 """
 
-
-
-# Import habit_service (must be available in your project)
-
 logger = logging.getLogger(__name__)
 
 # Milestone days for streak badges
 STREAK_MILESTONES = (3, 7, 14, 30)
 
+_BADGE_COLUMNS = (Badge.badge_id, Badge.user_id, Badge.name, Badge.description, Badge.awarded_at)
 
-def _now_iso() -> str:
-    # Use ISO 8601 UTC timestamp string for awarded_at
-    return datetime.utcnow().isoformat(timespec="seconds") + "Z"
 
+def _as_uuid(user_id: Any) -> uuid.UUID:
+    return user_id if isinstance(user_id, uuid.UUID) else uuid.UUID(str(user_id))
 
-def _row_to_dict(row: Any) -> Dict[str, Any]:
-    # Convert SQLAlchemy Row / mapping to a plain dict
-    try:
-        return dict(row._mapping)
-    except Exception:
-        try:
-            return dict(row)
-        except Exception:
-            return {}
+
+def _badge_to_dict(row: Any) -> Dict[str, Any]:
+    badge = dict(row._mapping)
+    badge["badge_id"] = str(badge["badge_id"])
+    badge["user_id"] = str(badge["user_id"])
+    return badge
+
+
+def milestone_badge(milestone: int) -> Dict[str, str]:
+    return {
+        "name": f"{milestone}-Day Streak",
+        "description": f"Awarded for maintaining a {milestone}-day streak.",
+    }
 
 
 def badge_exists(db: Any, user_id: str, name: str) -> bool:
     """
     Return True if a badge with this name already exists for the user.
     """
-    sql = text(
-        "SELECT 1 FROM badges WHERE user_id = :user_id AND name = :name LIMIT 1"
-    )
-    result = db.execute(sql, {"user_id": user_id, "name": name})
-    row = result.first()
-    exists = row is not None
+    stmt = select(Badge.badge_id).where(Badge.user_id == _as_uuid(user_id), Badge.name == name).limit(1)
+    exists = db.execute(stmt).first() is not None
     logger.debug("badge_exists user=%s name=%s => %s", user_id, name, exists)
     return exists
 
 
+def get_badge_names(db: Any, user_id: str) -> Set[str]:
+    """
+    Names of every badge the user already holds, from one query.
+    """
+    return set(db.execute(select(Badge.name).where(Badge.user_id == _as_uuid(user_id))).scalars())
+
+
+@traced()
 def get_user_badges(db: Any, user_id: str) -> List[Dict[str, Any]]:
     """
     Return all badges for a user as a list of dicts.
     """
-    sql = text("SELECT * FROM badges WHERE user_id = :user_id ORDER BY awarded_at DESC")
-    result = db.execute(sql, {"user_id": user_id})
-    rows = result.fetchall()
-    return [_row_to_dict(r) for r in rows]
+    stmt = select(*_BADGE_COLUMNS).where(Badge.user_id == _as_uuid(user_id)).order_by(Badge.awarded_at.desc())
+    return [_badge_to_dict(r) for r in db.execute(stmt)]
 
 
-def award_custom_badge(db: Any, user_id: str, name: str, description: str) -> Dict[str, Any]:
+def _insert_badge_rows(db: Any, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
-    Insert a new badge record for the user. Prevents duplicates by name.
-    Returns the created badge dict on success.
-    Raises ValueError if the badge already exists.
+    Insert badge rows (user_id, name, description) with a single multi-row
+    INSERT, skipping (user_id, name) pairs that already exist. Commits and
+    returns the badges actually inserted.
     """
-    if badge_exists(db, user_id, name):
-        raise ValueError(f"Badge '{name}' already exists for user {user_id}")
+    awarded_at = datetime.now(timezone.utc)
+    rows = [
+        {"badge_id": uuid.uuid4(), "user_id": _as_uuid(r["user_id"]), "name": r["name"],
+         "description": r.get("description"), "awarded_at": awarded_at}
+        for r in rows
+    ]
+    if not rows:
+        return []
+
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = (
+            dialect_insert(Badge)
+            .values(rows)
+            .on_conflict_do_nothing(index_elements=["user_id", "name"])
+            .returning(*_BADGE_COLUMNS)
+        )
+        try:
+            inserted = [_badge_to_dict(r) for r in db.execute(stmt)]
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return inserted
+
+    # Other databases: plain multi-row insert, the unique index rejects races
+    try:
+        db.execute(insert(Badge).values(rows))
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        logger.warning("Concurrent badge award; skipped %d badges", len(rows))
+        return []
+    return [{**r, "badge_id": str(r["badge_id"]), "user_id": str(r["user_id"])} for r in rows]
+
+
+def _insert_badges(db: Any, user_id: Any, badges: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return _insert_badge_rows(db, [{**b, "user_id": user_id} for b in badges])
 
-    badge_id = str(uuid.uuid4())
-    awarded_at = _now_iso()
 
-    insert_sql = text(
-        "INSERT INTO badges (id, user_id, name, description, awarded_at) "
-        "VALUES (:id, :user_id, :name, :description, :awarded_at)"
+def award_badges_bulk(db: Any, rows: List[Dict[str, Any]], chunk_size: int = 1000) -> List[Dict[str, Any]]:
+    """
+    Award badges to many users: rows of {"user_id", "name", "description"}.
+    One INSERT per chunk_size rows (bounded statement size).
+    """
+    awarded: List[Dict[str, Any]] = []
+    for i in range(0, len(rows), chunk_size):
+        awarded.extend(_insert_badge_rows(db, rows[i:i + chunk_size]))
+    return awarded
+
+
+def get_badge_pairs(db: Any, user_ids: List[Any], names: Iterable[str]) -> Set[tuple]:
+    """(user_id, name) pairs already held among user_ids for the given badge names, from one query."""
+    stmt = select(Badge.user_id, Badge.name).where(
+        Badge.user_id.in_([_as_uuid(u) for u in user_ids]), Badge.name.in_(list(names))
     )
-    params = {
-        "id": badge_id,
-        "user_id": user_id,
-        "name": name,
-        "description": description,
-        "awarded_at": awarded_at,
-    }
+    return {(user_id, name) for user_id, name in db.execute(stmt)}
 
-    # Atomic insert with transaction
-    with db.begin():
-        db.execute(insert_sql, params)
 
-    badge = {
-        "id": badge_id,
-        "user_id": user_id,
-        "name": name,
-        "description": description,
-        "awarded_at": awarded_at,
-    }
+def award_badges(db: Any, user_id: str, badges: List[Dict[str, Any]],
+                 existing: Optional[Set[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Award several badges at once. `existing` (names already held) lets the
+    caller skip the insert entirely when nothing is new.
+    """
+    if existing is not None:
+        badges = [b for b in badges if b["name"] not in existing]
+    awarded = _insert_badges(db, user_id, badges)
+    for b in awarded:
+        logger.info("Awarded badge user=%s name=%s", user_id, b["name"])
+    return awarded
+
+
+def award_custom_badge(db: Any, user_id: str, name: str, description: str) -> Dict[str, Any]:
+    """
+    Insert a new badge record for the user. Prevents duplicates by name.
+    Returns the created badge dict on success.
+    Raises ValueError if the badge already exists.
+    """
+    inserted = _insert_badges(db, user_id, [{"name": name, "description": description}])
+    if not inserted:
+        raise ValueError(f"Badge '{name}' already exists for user {user_id}")
     logger.info("Awarded custom badge to user=%s name=%s", user_id, name)
-    return badge
+    return inserted[0]
 
 
 def _normalize_streak_value(streaks: Any) -> int:
@@ -148,68 +208,49 @@ def _normalize_streak_value(streaks: Any) -> int:
         return 0
 
 
+def milestones_reached(streak: int) -> List[int]:
+    return [m for m in STREAK_MILESTONES if streak >= m]
+
+
+def award_streak_badges_bulk(db: Any, best_streaks: Dict[Any, int]) -> List[Dict[str, Any]]:
+    """
+    Milestone badges for many users at once, from {user_id: best current
+    streak} (see habit_service.compute_best_streaks). One query for the
+    badges already held, then award_badges_bulk.
+    """
+    rows = [
+        {"user_id": _as_uuid(user_id), **milestone_badge(m)}
+        for user_id, streak in best_streaks.items()
+        for m in milestones_reached(streak)
+    ]
+    if not rows:
+        return []
+    held = get_badge_pairs(db, list(best_streaks), {r["name"] for r in rows})
+    return award_badges_bulk(db, [r for r in rows if (r["user_id"], r["name"]) not in held])
+
+
+@traced()
 def check_and_award_streak_badges(db: Any, user_id: str) -> List[Dict[str, Any]]:
     """
-    Check user's streaks using habit_service.compute_streaks and award badges
-    for milestones (3, 7, 14, 30 days). Avoid duplicates. Returns a list of
+    Evaluate streak milestones (3, 7, 14, 30 days) across all of the user's
+    habits and award the missing ones. Uses one query for the streaks, one
+    for the names already held and at most one INSERT. Returns a list of
     awarded badge dicts (may be empty).
     """
-    # Fetch streak information from habit_service
     try:
-        raw_streaks = habit_service.compute_streaks(db, user_id)
+        streaks = habit_service.compute_all_streaks(db, _as_uuid(user_id))
     except Exception as e:
         logger.exception("Failed to compute streaks for user=%s: %s", user_id, e)
         return []
 
-    current_streak = _normalize_streak_value(raw_streaks)
-    logger.debug("User %s current_streak=%s (raw=%s)", user_id, current_streak, raw_streaks)
-
-    awards: List[Dict[str, Any]] = []
-
-    # Determine which milestones are reached and not already awarded
-    for milestone in STREAK_MILESTONES:
-        if current_streak >= milestone:
-            name = f"{milestone}-Day Streak"
-            description = f"Awarded for maintaining a {milestone}-day streak."
-            try:
-                if not badge_exists(db, user_id, name):
-                    badge_id = str(uuid.uuid4())
-                    awarded_at = _now_iso()
-                    insert_sql = text(
-                        "INSERT INTO badges (id, user_id, name, description, awarded_at) "
-                        "VALUES (:id, :user_id, :name, :description, :awarded_at)"
-                    )
-                    params = {
-                        "id": badge_id,
-                        "user_id": user_id,
-                        "name": name,
-                        "description": description,
-                        "awarded_at": awarded_at,
-                    }
-                    # Use atomic transaction per award batch to ensure all-or-nothing:
-                    # we will group all inserts into a single transaction below.
-                    awards.append({"id": badge_id, "user_id": user_id, "name": name, "description": description, "awarded_at": awarded_at})
-                else:
-                    logger.debug("Badge already exists: user=%s name=%s", user_id, name)
-            except Exception:
-                logger.exception("Error checking/creating badge existence for user=%s name=%s", user_id, name)
-
-    if not awards:
+    best = max((_normalize_streak_value(s) for s in streaks.values()), default=0)
+    logger.debug("User %s best current_streak=%s over %d habits", user_id, best, len(streaks))
+    reached = milestones_reached(best)
+    if not reached:
         return []
 
-    # Perform insertion of all new awards within a single atomic transaction
     try:
-        with db.begin():
-            for badge in awards:
-                insert_sql = text(
-                    "INSERT INTO badges (id, user_id, name, description, awarded_at) "
-                    "VALUES (:id, :user_id, :name, :description, :awarded_at)"
-                )
-                db.execute(insert_sql, badge)
-        for b in awards:
-            logger.info("Awarded badge user=%s name=%s", user_id, b["name"])
+        return award_badges(db, user_id, [milestone_badge(m) for m in reached], existing=get_badge_names(db, user_id))
     except Exception as e:
         logger.exception("Failed to commit awarded badges for user=%s: %s", user_id, e)
         return []
-
-    return awards
\ No newline at end of file
@@ -0,0 +1,249 @@
+import json
+import logging
+import math
+import os
+import threading
+from bisect import bisect_right
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+# drift_service.py
+"""
+Input drift monitoring for the sleep prediction endpoint.
+
+Responsibilities implemented:
+- build_reference(frame, features): training-time histogram sketches (offline)
+- DriftMonitor.record(features): constant-memory update per inference input
+- DriftMonitor.report(): compare live sketches with the reference (PSI, mean shift)
+- get_monitor(pipeline_path): process-wide monitor for the served artifact
+
+Each feature keeps a fixed-bin histogram whose edges are the training deciles
+saved next to the model artifact (pipeline.reference.json), plus running
+count/mean/M2/min/max. Recording one request is a bisect per feature under a
+single uncontended lock, i.e. a few microseconds, and memory never grows with
+traffic.
+"""
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BINS = 10
+# Usual PSI reading: < 0.1 stable, 0.1-0.25 moderate shift, > 0.25 significant
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.25
+MIN_SAMPLES = int(os.getenv("DRIFT_MIN_SAMPLES", "100"))
+# Floor for empty bins so PSI stays finite
+_EPSILON = 1e-4
+
+
+def reference_path_for(pipeline_path: str) -> str:
+    """Reference sketches live next to the artifact: pipeline.pkl -> pipeline.reference.json."""
+    return os.path.splitext(pipeline_path)[0] + ".reference.json"
+
+
+class FeatureSketch:
+    """Fixed-bin histogram plus running moments for one feature."""
+
+    __slots__ = ("edges", "counts", "n", "mean", "m2", "min", "max")
+
+    def __init__(self, edges: List[float]):
+        self.edges = list(edges)
+        self.counts = [0] * (len(self.edges) + 1)
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, value: float) -> None:
+        self.counts[bisect_right(self.edges, value)] += 1
+        # Welford running mean / variance
+        self.n += 1
+        delta = value - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else 0.0
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Approximate quantile by linear interpolation inside histogram bins."""
+        if self.n == 0:
+            return None
+        target = q * self.n
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            if count and cumulative + count >= target:
+                lo = self.edges[i - 1] if i > 0 else self.min
+                hi = self.edges[i] if i < len(self.edges) else self.max
+                return lo + (hi - lo) * ((target - cumulative) / count)
+            cumulative += count
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "edges": self.edges,
+            "counts": list(self.counts),
+            "n": self.n,
+            "mean": self.mean,
+            "std": self.std,
+            "min": self.min if self.n else None,
+            "max": self.max if self.n else None,
+        }
+
+
+def build_reference(frame: Any, features: Iterable[str], bins: int = DEFAULT_BINS,
+                    source: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Build reference sketches from a training DataFrame.
+
+    Bin edges are the interior quantiles of each feature, so every reference
+    bin holds roughly the same share of training rows.
+    """
+    import numpy as np
+
+    reference: Dict[str, Any] = {
+        "created_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "source": source,
+        "rows": int(len(frame)),
+        "features": {},
+    }
+    for name in features:
+        values = frame[name].dropna().to_numpy(dtype=float)
+        qs = np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1]) if len(values) else []
+        sketch = FeatureSketch(sorted(set(float(q) for q in qs)))
+        for v in values:
+            sketch.update(float(v))
+        reference["features"][name] = sketch.to_dict()
+    return reference
+
+
+def _psi(expected: List[int], actual: List[int]) -> float:
+    """Population stability index between two histograms over the same bins."""
+    e_total = sum(expected) or 1
+    a_total = sum(actual) or 1
+    psi = 0.0
+    for e, a in zip(expected, actual):
+        e_pct = max(e / e_total, _EPSILON)
+        a_pct = max(a / a_total, _EPSILON)
+        psi += (a_pct - e_pct) * math.log(a_pct / e_pct)
+    return psi
+
+
+def _psi_status(psi: float) -> str:
+    if psi >= PSI_SIGNIFICANT:
+        return "significant"
+    if psi >= PSI_MODERATE:
+        return "moderate"
+    return "stable"
+
+
+class DriftMonitor:
+    """Live sketches for every reference feature of one model artifact."""
+
+    def __init__(self, reference: Dict[str, Any], reference_path: Optional[str] = None):
+        self.reference = reference
+        self.reference_path = reference_path
+        self.started_at = datetime.utcnow()
+        self._lock = threading.Lock()
+        self._sketches = {
+            name: FeatureSketch(ref["edges"]) for name, ref in reference.get("features", {}).items()
+        }
+
+    def record(self, features: Dict[str, Any]) -> None:
+        """Fold one inference input into the live sketches."""
+        with self._lock:
+            for name, sketch in self._sketches.items():
+                value = features.get(name)
+                if value is not None:
+                    sketch.update(float(value))
+
+    def record_many(self, rows: Iterable[Dict[str, Any]]) -> None:
+        for row in rows:
+            self.record(row)
+
+    def reset(self) -> None:
+        with self._lock:
+            for name, sketch in list(self._sketches.items()):
+                self._sketches[name] = FeatureSketch(sketch.edges)
+            self.started_at = datetime.utcnow()
+
+    def report(self, min_samples: int = MIN_SAMPLES) -> Dict[str, Any]:
+        """Compare live traffic with the training reference, feature by feature."""
+        with self._lock:
+            live = {name: sketch.to_dict() for name, sketch in self._sketches.items()}
+            p50 = {name: sketch.quantile(0.5) for name, sketch in self._sketches.items()}
+
+        samples = max((s["n"] for s in live.values()), default=0)
+        features: Dict[str, Any] = {}
+        worst = 0.0
+        for name, ref in self.reference.get("features", {}).items():
+            cur = live[name]
+            psi = _psi(ref["counts"], cur["counts"]) if cur["n"] else None
+            mean_shift = None
+            if cur["n"] and ref.get("std"):
+                mean_shift = (cur["mean"] - ref["mean"]) / ref["std"]
+            features[name] = {
+                "psi": psi,
+                "status": "insufficient_data" if cur["n"] < min_samples else _psi_status(psi),
+                "samples": cur["n"],
+                "live_mean": cur["mean"] if cur["n"] else None,
+                "reference_mean": ref.get("mean"),
+                "mean_shift_std": mean_shift,
+                "live_p50": p50[name],
+                "live_min": cur["min"],
+                "live_max": cur["max"],
+            }
+            if psi is not None and cur["n"] >= min_samples:
+                worst = max(worst, psi)
+
+        return {
+            "status": "insufficient_data" if samples < min_samples else _psi_status(worst),
+            "max_psi": worst if samples >= min_samples else None,
+            "samples": samples,
+            "min_samples": min_samples,
+            "since": self.started_at.isoformat(timespec="seconds") + "Z",
+            "reference": {
+                "path": self.reference_path,
+                "created_at": self.reference.get("created_at"),
+                "source": self.reference.get("source"),
+                "rows": self.reference.get("rows"),
+            },
+            "features": features,
+        }
+
+
+_monitor: Optional[DriftMonitor] = None
+# Reference path the cached _monitor (possibly None, i.e. missing) was resolved for
+_monitor_path: Optional[str] = None
+_monitor_lock = threading.Lock()
+
+
+def get_monitor(pipeline_path: str) -> Optional[DriftMonitor]:
+    """
+    Return the process-wide monitor for the served artifact, loading its
+    reference sketches on first use. Returns None when no reference exists;
+    the miss is cached so requests do not re-stat the file.
+    """
+    global _monitor, _monitor_path
+    path = reference_path_for(pipeline_path)
+    if _monitor_path == path:
+        return _monitor
+    with _monitor_lock:
+        if _monitor_path == path:
+            return _monitor
+        monitor = None
+        if not os.path.exists(path):
+            logger.warning("Drift reference not found at %s; drift monitoring disabled", path)
+        else:
+            try:
+                with open(path) as fh:
+                    monitor = DriftMonitor(json.load(fh), reference_path=path)
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning("Could not load drift reference %s: %s", path, e)
+        _monitor, _monitor_path = monitor, path
+        return monitor
@@ -0,0 +1,145 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.observability import metrics
+
+# forest_service.py
+"""
+Vectorized per-tree predictions for the sleep RandomForest pipeline.
+
+Responsibilities implemented:
+- flatten_forest(model): pack every fitted tree into shared node arrays
+- per_tree_predictions(pipeline, frame): (n_rows, n_trees) prediction matrix
+- prediction_intervals(matrix, level): quantile bands over the per-tree outputs
+
+The forest is walked for all rows and all trees at once, one NumPy step per
+tree level, instead of calling each estimator's predict() in a Python loop.
+The resulting matrix gives the point estimate (row mean, identical to
+RandomForestRegressor.predict) and the spread of the ensemble in a single pass.
+"""
+
+# sklearn marks leaves with a negative feature index (TREE_UNDEFINED = -2)
+_LEAF_FEATURE = -2
+
+# Single-slot cache: (model, flattened arrays). Only one pipeline is served at a time.
+_flat_cache: Optional[Tuple[Any, Dict[str, Any]]] = None
+
+
+def flatten_forest(model: Any) -> Dict[str, Any]:
+    """
+    Concatenate the node arrays of every tree in model.estimators_.
+
+    Child indices are rebased to global offsets so that one index matrix can
+    address nodes of all trees. Result is cached for the model instance.
+    """
+    global _flat_cache
+    hit = _flat_cache is not None and _flat_cache[0] is model
+    metrics.cache_lookup("forest_flat", hit)
+    if hit:
+        return _flat_cache[1]
+
+    estimators = getattr(model, "estimators_", None)
+    if not estimators:
+        raise ValueError("Prediction intervals require a fitted tree ensemble model")
+
+    features, thresholds, lefts, rights, values, missing_left = [], [], [], [], [], []
+    roots = np.empty(len(estimators), dtype=np.intp)
+    offset = 0
+    max_depth = 0
+    for i, est in enumerate(estimators):
+        tree = est.tree_
+        roots[i] = offset
+        left = tree.children_left.astype(np.intp)
+        right = tree.children_right.astype(np.intp)
+        is_leaf = left < 0
+        # Leaves point at themselves so the walk can keep stepping without branches
+        self_index = np.arange(tree.node_count, dtype=np.intp) + offset
+        lefts.append(np.where(is_leaf, self_index, left + offset))
+        rights.append(np.where(is_leaf, self_index, right + offset))
+        features.append(np.where(is_leaf, _LEAF_FEATURE, tree.feature).astype(np.intp))
+        thresholds.append(tree.threshold)
+        values.append(tree.value[:, 0, 0])
+        missing = getattr(tree, "missing_go_to_left", None)
+        missing_left.append(np.zeros(tree.node_count, dtype=bool) if missing is None else missing.astype(bool))
+        offset += tree.node_count
+        max_depth = max(max_depth, tree.max_depth)
+
+    flat = {
+        "feature": np.concatenate(features),
+        "threshold": np.concatenate(thresholds),
+        "left": np.concatenate(lefts),
+        "right": np.concatenate(rights),
+        "value": np.concatenate(values),
+        "missing_go_to_left": np.concatenate(missing_left),
+        "roots": roots,
+        "max_depth": max_depth,
+    }
+    _flat_cache = (model, flat)
+    return flat
+
+
+def cache_stats() -> Dict[str, Any]:
+    """Size of the flattened-forest cache (for memory accounting)."""
+    cached = _flat_cache
+    if cached is None:
+        return {"entries": 0, "bytes": 0}
+    return {"entries": 1, "bytes": sum(v.nbytes for v in cached[1].values() if isinstance(v, np.ndarray))}
+
+
+def per_tree_predictions(pipeline: Any, frame: Any) -> np.ndarray:
+    """
+    Return an (n_rows, n_trees) matrix of each tree's prediction for each row.
+
+    The frame is preprocessed once with every pipeline step except the final
+    model, then all trees are traversed together, one level per iteration.
+    """
+    model = pipeline.steps[-1][1]
+    flat = flatten_forest(model)
+    X = pipeline[:-1].transform(frame) if len(pipeline.steps) > 1 else frame
+    # sklearn compares float32 features against float64 thresholds; do the same
+    X = np.asarray(X, dtype=np.float32).astype(np.float64)
+
+    feature, threshold = flat["feature"], flat["threshold"]
+    left, right = flat["left"], flat["right"]
+    has_missing = bool(np.isnan(X).any())
+
+    n_rows = X.shape[0]
+    rows = np.arange(n_rows)[:, None]
+    node = np.broadcast_to(flat["roots"], (n_rows, len(flat["roots"]))).copy()
+    for _ in range(flat["max_depth"]):
+        feat = feature[node]
+        internal = feat >= 0
+        if not internal.any():
+            break
+        x = X[rows, np.where(internal, feat, 0)]
+        go_left = x <= threshold[node]
+        if has_missing:
+            nan = np.isnan(x)
+            go_left = np.where(nan, flat["missing_go_to_left"][node], go_left)
+        node = np.where(go_left, left[node], right[node])
+    return flat["value"][node]
+
+
+def prediction_intervals(matrix: np.ndarray, level: float) -> List[Dict[str, float]]:
+    """
+    Summarize each row of a per-tree prediction matrix as a central interval.
+
+    `level` is the central coverage (e.g. 0.8 -> 10th..90th percentile of the
+    tree outputs). This is the spread of the ensemble, not a calibrated
+    predictive interval on the observed target.
+    """
+    lower_q = (1.0 - level) / 2.0
+    upper_q = 1.0 - lower_q
+    lower, median, upper = np.quantile(matrix, [lower_q, 0.5, upper_q], axis=1)
+    std = matrix.std(axis=1)
+    return [
+        {
+            "level": level,
+            "lower": float(lower[i]),
+            "median": float(median[i]),
+            "upper": float(upper[i]),
+            "std": float(std[i]),
+        }
+        for i in range(matrix.shape[0])
+    ]
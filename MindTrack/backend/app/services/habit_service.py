@@ -1,12 +1,19 @@
+import logging
+import uuid
 from datetime import datetime, date, timedelta
-from typing import Dict, Any, List, Optional, Iterator, Tuple
+from typing import Dict, Any, Iterable, List, Optional, Iterator, Set, Tuple
+
+from app.observability.tracing import traced
 
 # /c:/Users/Sweta.Singh/Downloads/project/tts/new/backend/app/services/habit_service.py
 
 # Adjust import to match your project's model location
 try:
     from app.models import DailyHabitEntry
+    from app.models.habit_entry import HabitStatus
 except Exception:
+    HabitStatus = None
+
     # Fallback stub model for type hints / dev-time safety
     class DailyHabitEntry:
         id: int
@@ -85,33 +92,169 @@ def _calculate_streak(dates_list: List[date]) -> Tuple[int, int]:
     return current_streak, max_streak
 
 
+logger = logging.getLogger(__name__)
+
+
+def _as_uuid(user_id: Any) -> Any:
+    """UUID columns bind uuid.UUID values; leave anything unparseable as-is."""
+    if isinstance(user_id, uuid.UUID):
+        return user_id
+    try:
+        return uuid.UUID(str(user_id))
+    except ValueError:
+        return user_id
+
+
+def _coerce_status(status: Any) -> Any:
+    """Accept "done" / "Done" / HabitStatus.DONE; the column stores enum names."""
+    if HabitStatus is None or isinstance(status, HabitStatus):
+        return status
+    try:
+        return HabitStatus(str(status).lower())
+    except ValueError:
+        raise ValueError(f"Invalid status {status!r}; expected one of {[s.value for s in HabitStatus]}")
+
+
+def _status_value(status: Any) -> str:
+    """Lower-case status for HabitStatus members and legacy string values alike."""
+    return str(getattr(status, "value", status) or "").lower()
+
+
+def _is_done(status: Any) -> bool:
+    return str(getattr(status, "value", status)).lower() == "done"
+
+
+def _done_dates_by_habit(db, user_id: Any, habit_names: Optional[List[str]] = None) -> Dict[str, Set[date]]:
+    """One query: the user's 'done' dates grouped by habit (optionally only habit_names)."""
+    from sqlalchemy import func
+
+    q = db.query(DailyHabitEntry.habit_name, DailyHabitEntry.date).filter(
+        DailyHabitEntry.user_id == _as_uuid(user_id),
+        # Older rows store the enum value ("done"), newer ones its name
+        func.lower(DailyHabitEntry.status) == "done",
+    )
+    if habit_names is not None:
+        q = q.filter(DailyHabitEntry.habit_name.in_(list(habit_names)))
+    dates_by_habit: Dict[str, Set[date]] = {}
+    for habit_name, entry_date in q:
+        dates_by_habit.setdefault(habit_name, set()).add(entry_date)
+    return dates_by_habit
+
+
+def compute_best_streaks(db, user_ids: List[Any]) -> Dict[Any, int]:
+    """
+    Best current streak across habits for many users from one query over
+    their 'done' dates (batch jobs). Users without done entries map to 0.
+    """
+    from sqlalchemy import func
+
+    owners = [_as_uuid(u) for u in user_ids]
+    dates: Dict[Tuple[Any, str], Set[date]] = {}
+    rows = db.query(DailyHabitEntry.user_id, DailyHabitEntry.habit_name, DailyHabitEntry.date).filter(
+        DailyHabitEntry.user_id.in_(owners),
+        func.lower(DailyHabitEntry.status) == "done",
+    )
+    for owner, habit_name, entry_date in rows:
+        dates.setdefault((owner, habit_name), set()).add(entry_date)
+    best = dict.fromkeys(owners, 0)
+    for (owner, _), done in dates.items():
+        best[owner] = max(best[owner], _calculate_streak(sorted(done))[0])
+    return best
+
+
+def _award_for_streak_changes(
+    db, user_id: Any, before: Dict[str, Set[date]], after: Dict[str, Set[date]]
+) -> List[Dict[str, Any]]:
+    """
+    Award milestone badges crossed by the old -> new current streak of each
+    changed habit. Runs after the entry commit; a failure here is logged and
+    never fails the write.
+    """
+    # Imported lazily: badge_service imports this module
+    from app.services import badge_service
+
+    crossed: Set[int] = set()
+    for habit_name, new_dates in after.items():
+        old_streak = _calculate_streak(sorted(before.get(habit_name, ())))[0]
+        new_streak = _calculate_streak(sorted(new_dates))[0]
+        if new_streak > old_streak:
+            crossed.update(m for m in badge_service.STREAK_MILESTONES if old_streak < m <= new_streak)
+    if not crossed:
+        return []
+    try:
+        return badge_service.award_badges(
+            db, user_id, [badge_service.milestone_badge(m) for m in sorted(crossed)]
+        )
+    except Exception:
+        logger.exception("Failed to award streak badges for user=%s", user_id)
+        return []
+
+
+def _enqueue_follow_up(db, user_id: Any, dates: Iterable[date]) -> None:
+    """
+    Queue the post-write job (rollup refresh; see app.jobs.handlers) in the
+    caller's transaction, so it is committed together with the entries.
+    """
+    # Imported lazily: the handlers import badge_service, which imports this module
+    from app.jobs.handlers import HABIT_ENTRIES_WRITTEN
+    from app.services import job_queue
+
+    job_queue.enqueue(db, HABIT_ENTRIES_WRITTEN, {
+        "user_id": str(user_id),
+        "dates": sorted({d.isoformat() for d in dates}),
+    })
+
+
+def _commit_update(db, entry) -> None:
+    """Commit an updated entry with its queued job; on failure roll back and re-raise."""
+    try:
+        db.add(entry)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    try:
+        db.refresh(entry)
+    except Exception:
+        pass
+
+
 # Core service functions
 
+@traced()
 def create_habit_entry(db, entry_data: Dict[str, Any]) -> Dict[str, Any]:
     """
     Validates and inserts new DailyHabitEntry.
     Prevent duplicate (user_id, date, habit_name) via upsert logic:
       - If an entry exists for (user_id, date, habit_name) update it with provided fields.
       - Otherwise create a new record.
-    Returns the saved entry as a dict.
+    Streak milestones crossed by this write are awarded immediately; the
+    rollup refresh is queued as a job in the same transaction.
+    Returns the saved entry as a dict, with the new badges under "awarded_badges".
     """
     required = ("user_id", "habit_name", "date")
     for k in required:
         if k not in entry_data:
             raise ValueError(f"Missing required field: {k}")
 
-    user_id = entry_data["user_id"]
+    user_id = _as_uuid(entry_data["user_id"])
     habit_name = entry_data["habit_name"]
     entry_date = entry_data["date"]
     if isinstance(entry_date, str):
         entry_date = datetime.fromisoformat(entry_date).date()
 
-    status = entry_data.get("status", "done")
+    status = _coerce_status(entry_data.get("status", "done"))
     notes = entry_data.get("notes")
     timestamp = entry_data.get("timestamp", datetime.utcnow())
     if isinstance(timestamp, str):
         timestamp = datetime.fromisoformat(timestamp)
 
+    # Done dates before the write, to detect streak milestones it crosses
+    try:
+        done_before = _done_dates_by_habit(db, user_id, [habit_name])
+    except Exception:
+        done_before = None
+
     # Upsert: find existing
     existing = None
     try:
@@ -137,14 +280,10 @@ def create_habit_entry(db, entry_data: Dict[str, Any]) -> Dict[str, Any]:
             existing.updated_at = datetime.utcnow()
         except Exception:
             pass
-        try:
-            db.add(existing)
-            db.commit()
-            db.refresh(existing)
-        except Exception:
-            # If commit fails or session methods differ, assume persistent update
-            pass
-        return _entry_to_dict(existing)
+        _enqueue_follow_up(db, user_id, [entry_date])
+        # The queued job is inserted by this commit: a failure must fail the write
+        _commit_update(db, existing)
+        return _with_awards(db, user_id, habit_name, entry_date, status, done_before, existing)
 
     # Create new
     # Create new SQLAlchemy model instance. DailyHabitEntry defines a `timestamp` column
@@ -157,6 +296,7 @@ def create_habit_entry(db, entry_data: Dict[str, Any]) -> Dict[str, Any]:
         notes=notes,
         timestamp=timestamp,
     )
+    _enqueue_follow_up(db, user_id, [entry_date])
     try:
         db.add(new_entry)
         db.commit()
@@ -167,7 +307,102 @@ def create_habit_entry(db, entry_data: Dict[str, Any]) -> Dict[str, Any]:
             db.append(new_entry)
         except Exception:
             raise
-    return _entry_to_dict(new_entry)
+    return _with_awards(db, user_id, habit_name, entry_date, status, done_before, new_entry)
+
+
+def _with_awards(db, user_id, habit_name, entry_date, status, done_before, entry) -> Dict[str, Any]:
+    result = _entry_to_dict(entry)
+    result["awarded_badges"] = []
+    if done_before is None:
+        return result
+    old_dates = done_before.get(habit_name, set())
+    new_dates = (old_dates | {entry_date}) if _is_done(status) else (old_dates - {entry_date})
+    result["awarded_badges"] = _award_for_streak_changes(
+        db, user_id, {habit_name: old_dates}, {habit_name: new_dates}
+    )
+    return result
+
+
+@traced()
+def create_habit_entries_bulk(db, user_id: Any, entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Upsert several entries of one user in a single transaction.
+
+    Each entry needs habit_name, date and status (notes/target_value/mood
+    optional). Existing rows for the affected (habit, date) pairs are loaded
+    with one query, and streak milestones are evaluated once for the affected
+    habits only; one rollup job is queued for the whole batch.
+    Returns {"entries", "count", "awarded_badges"}.
+    """
+    from sqlalchemy.orm.attributes import flag_modified
+
+    owner = _as_uuid(user_id)
+    items = []
+    for data in entries:
+        for k in ("habit_name", "date"):
+            if k not in data:
+                raise ValueError(f"Missing required field: {k}")
+        entry_date = data["date"]
+        if isinstance(entry_date, str):
+            entry_date = datetime.fromisoformat(entry_date).date()
+        items.append({**data, "date": entry_date, "status": _coerce_status(data.get("status", "done"))})
+    if not items:
+        return {"entries": [], "count": 0, "awarded_badges": []}
+
+    habit_names = sorted({i["habit_name"] for i in items})
+    done_before = _done_dates_by_habit(db, owner, habit_names)
+    existing = {
+        (e.habit_name, e.date): e
+        for e in db.query(DailyHabitEntry).filter(
+            DailyHabitEntry.user_id == owner,
+            DailyHabitEntry.habit_name.in_(habit_names),
+            DailyHabitEntry.date.in_(sorted({i["date"] for i in items})),
+        )
+    }
+
+    now = datetime.utcnow()
+    saved = []
+    done_after = {name: set(done_before.get(name, ())) for name in habit_names}
+    for item in items:
+        key = (item["habit_name"], item["date"])
+        entry = existing.get(key)
+        is_new = entry is None
+        if is_new:
+            entry = existing[key] = DailyHabitEntry(user_id=owner, habit_name=key[0], date=key[1])
+            db.add(entry)
+        entry.status = item["status"]
+        entry.timestamp = now
+        assigned = ["status", "timestamp"]
+        for field in ("notes", "target_value", "mood"):
+            if field in item:
+                setattr(entry, field, item[field])
+                assigned.append(field)
+        if _is_done(item["status"]):
+            done_after[key[0]].add(key[1])
+        else:
+            done_after[key[0]].discard(key[1])
+        if not is_new:
+            # Same SET columns on every row, so the flush sends one executemany UPDATE
+            # instead of one statement per run of rows with differing changes
+            for field in assigned:
+                flag_modified(entry, field)
+        saved.append(entry)
+
+    try:
+        _enqueue_follow_up(db, owner, [i["date"] for i in items])
+        db.flush()
+        # Serialize before commit: afterwards every row would be expired and reloaded one by one
+        saved_dicts = [_entry_to_dict(e) for e in dict.fromkeys(saved)]
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return {
+        "entries": saved_dicts,
+        "count": len(saved_dicts),
+        "awarded_badges": _award_for_streak_changes(db, owner, done_before, done_after),
+    }
 
 
 def get_habit_entry(db, entry_id: int) -> Dict[str, Any]:
@@ -209,18 +444,16 @@ def update_habit_entry(db, entry_id: int, update_data: Dict[str, Any]) -> Dict[s
         v = update_data[k]
         if k == "timestamp" and isinstance(v, str):
             v = datetime.fromisoformat(v)
+        if k == "status":
+            v = _coerce_status(v)
         setattr(entry, k, v)
     try:
         entry.updated_at = datetime.utcnow()
     except Exception:
         pass
 
-    try:
-        db.add(entry)
-        db.commit()
-        db.refresh(entry)
-    except Exception:
-        pass
+    _enqueue_follow_up(db, entry.user_id, [entry.date])
+    _commit_update(db, entry)
 
     return _entry_to_dict(entry)
 
@@ -239,6 +472,7 @@ def delete_habit_entry(db, entry_id: int) -> None:
     if not entry:
         raise ValueError(f"Habit entry not found: id={entry_id}")
 
+    _enqueue_follow_up(db, entry.user_id, [entry.date])
     try:
         db.delete(entry)
         db.commit()
@@ -250,6 +484,7 @@ def delete_habit_entry(db, entry_id: int) -> None:
             raise
 
 
+@traced()
 def get_user_habits(
     db, user_id: int, start_date: Optional[date] = None, end_date: Optional[date] = None
 ) -> List[Dict[str, Any]]:
@@ -259,7 +494,7 @@ def get_user_habits(
     """
     q = None
     try:
-        q = db.query(DailyHabitEntry).filter(DailyHabitEntry.user_id == user_id)
+        q = db.query(DailyHabitEntry).filter(DailyHabitEntry.user_id == _as_uuid(user_id))
         if start_date:
             if isinstance(start_date, str):
                 start_date = datetime.fromisoformat(start_date).date()
@@ -290,6 +525,7 @@ def get_user_habits(
     return [_entry_to_dict(e) for e in entries]
 
 
+@traced()
 def compute_streaks(db, user_id: int, habit_name: str) -> Dict[str, Any]:
     """
     Calculates current_streak and max_streak for a given user and habit_name.
@@ -308,7 +544,7 @@ def compute_streaks(db, user_id: int, habit_name: str) -> Dict[str, Any]:
         rows = (
             db.query(DailyHabitEntry)
             .filter(
-                DailyHabitEntry.user_id == user_id,
+                DailyHabitEntry.user_id == _as_uuid(user_id),
                 DailyHabitEntry.habit_name == habit_name,
             )
             .all()
@@ -324,7 +560,7 @@ def compute_streaks(db, user_id: int, habit_name: str) -> Dict[str, Any]:
             rows = []
 
     done_dates = sorted(
-        {getattr(r, "date") for r in rows if getattr(r, "status", "").lower() == "done"},
+        {getattr(r, "date") for r in rows if _status_value(getattr(r, "status", None)) == "done"},
     )
 
     current_streak, max_streak = _calculate_streak(done_dates)
@@ -340,6 +576,28 @@ def compute_streaks(db, user_id: int, habit_name: str) -> Dict[str, Any]:
     }
 
 
+@traced()
+def compute_all_streaks(
+    db, user_id: Any, habit_names: Optional[List[str]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Streaks for every habit of a user (or only habit_names) from one query
+    over the user's 'done' dates. Returns {habit_name: {"current_streak",
+    "max_streak", "last_done_date"}}; habits without done entries are absent.
+    """
+    streaks = {}
+    for habit_name, dates in _done_dates_by_habit(db, user_id, habit_names).items():
+        done_dates = sorted(dates)
+        current_streak, max_streak = _calculate_streak(done_dates)
+        streaks[habit_name] = {
+            "current_streak": current_streak,
+            "max_streak": max_streak,
+            "last_done_date": done_dates[-1],
+        }
+    return streaks
+
+
+@traced()
 def compute_completion_rate(
     db, user_id: int, start_date: date, end_date: date
 ) -> Dict[str, Any]:
@@ -362,7 +620,7 @@ def compute_completion_rate(
     try:
         q = (
             db.query(DailyHabitEntry)
-            .filter(DailyHabitEntry.user_id == user_id)
+            .filter(DailyHabitEntry.user_id == _as_uuid(user_id))
             .filter(DailyHabitEntry.date >= start_date)
             .filter(DailyHabitEntry.date <= end_date)
         )
@@ -384,7 +642,7 @@ def compute_completion_rate(
             all_entries = []
 
     total_entries = len(all_entries)
-    total_done = sum(1 for e in all_entries if getattr(e, "status", "").lower() == "done")
+    total_done = sum(1 for e in all_entries if _status_value(getattr(e, "status", None)) == "done")
     completion_rate = (total_done / total_entries) if total_entries > 0 else 0.0
 
     return {
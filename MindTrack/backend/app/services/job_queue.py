@@ -0,0 +1,259 @@
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import and_, delete, func, or_, select, update
+
+from app.models import Job
+
+# job_queue.py
+"""
+Durable job queue stored in the jobs table.
+
+Producers call enqueue() inside their own transaction, so a job exists if
+and only if the write that caused it was committed (no lost or phantom
+follow-up work). Workers (app.jobs.worker, or an in-process thread) claim
+jobs in id order:
+
+- claim: one conditional UPDATE marks up to `limit` due jobs running under a
+  fresh token with a visibility timeout (locked_until); a concurrent worker's
+  UPDATE no longer matches those rows, so each claim is exclusive
+- success: status done
+- failure: requeued with exponential backoff until max_attempts, then failed
+- crash: the lock expires and the job is claimed again
+
+Delivery is therefore at-least-once; handlers must be idempotent (recompute
+and upsert rather than increment). Register handlers with @handler("kind").
+"""
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+DEFAULT_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+DEFAULT_BACKOFF_SECONDS = 2.0
+MAX_BACKOFF_SECONDS = 3600.0
+
+_HANDLERS: Dict[str, Callable[[Any, Dict[str, Any]], Any]] = {}
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def handler(kind: str) -> Callable:
+    """Register fn(db, payload) as the handler of `kind` jobs."""
+    def register(fn: Callable[[Any, Dict[str, Any]], Any]) -> Callable:
+        _HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+def get_handler(kind: str) -> Optional[Callable[[Any, Dict[str, Any]], Any]]:
+    return _HANDLERS.get(kind)
+
+
+def enqueue(
+    db: Any,
+    kind: str,
+    payload: Dict[str, Any],
+    delay: float = 0.0,
+    max_attempts: int = 5,
+) -> Job:
+    """
+    Add a job to the session. It is not committed here: commit it together
+    with the write it follows up on.
+    """
+    now = _utcnow()
+    job = Job(kind=kind, payload=payload, status=QUEUED, attempts=0, max_attempts=max_attempts,
+              run_after=now + timedelta(seconds=delay), created_at=now)
+    db.add(job)
+    return job
+
+
+def claim(db: Any, limit: int = 10, lease_seconds: float = DEFAULT_LEASE_SECONDS,
+          now: Optional[datetime] = None) -> List[Job]:
+    """Claim up to `limit` due jobs (queued, or running with an expired lock). Commits."""
+    now = now or _utcnow()
+    claimable = or_(
+        and_(Job.status == QUEUED, Job.run_after <= now),
+        and_(Job.status == RUNNING, Job.locked_until < now),
+    )
+    ids = list(db.execute(select(Job.id).where(claimable).order_by(Job.id).limit(limit)).scalars())
+    if not ids:
+        return []
+    token = uuid.uuid4().hex
+    try:
+        db.execute(
+            update(Job)
+            .where(Job.id.in_(ids), claimable)
+            .values(status=RUNNING, locked_by=token, locked_until=now + timedelta(seconds=lease_seconds),
+                    attempts=Job.attempts + 1)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return list(db.execute(select(Job).where(Job.locked_by == token).order_by(Job.id)).scalars())
+
+
+def complete(db: Any, job: Job) -> None:
+    _finish(db, job, status=DONE, finished_at=_utcnow(), last_error=None)
+
+
+def fail(db: Any, job: Job, error: str, backoff: float = DEFAULT_BACKOFF_SECONDS) -> None:
+    """Requeue with exponential backoff, or mark failed once attempts are used up."""
+    if job.attempts >= job.max_attempts:
+        logger.error("Job %s (%s) failed permanently after %d attempts: %s", job.id, job.kind, job.attempts, error)
+        _finish(db, job, status=FAILED, finished_at=_utcnow(), last_error=error)
+        return
+    wait = min(MAX_BACKOFF_SECONDS, backoff * (2 ** (job.attempts - 1)))
+    logger.warning("Job %s (%s) attempt %d failed, retrying in %.0fs: %s", job.id, job.kind, job.attempts, wait, error)
+    _finish(db, job, status=QUEUED, run_after=_utcnow() + timedelta(seconds=wait), last_error=error)
+
+
+def _finish(db: Any, job: Job, **values: Any) -> None:
+    # Only the current claim may settle the job; a redelivered copy owns it now
+    db.execute(
+        update(Job)
+        .where(Job.id == job.id, Job.locked_by == job.locked_by)
+        .values(locked_by=None, locked_until=None, **values)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+def run_job(db: Any, job: Job, backoff: float = DEFAULT_BACKOFF_SECONDS) -> bool:
+    """Run one claimed job through its handler. Returns True on success."""
+    fn = get_handler(job.kind)
+    if fn is None:
+        fail(db, job, f"No handler registered for {job.kind!r}", backoff)
+        return False
+    try:
+        fn(db, dict(job.payload or {}))
+    except Exception as e:
+        db.rollback()
+        logger.debug("Job %s traceback:\n%s", job.id, traceback.format_exc())
+        fail(db, job, f"{type(e).__name__}: {e}", backoff)
+        return False
+    complete(db, job)
+    return True
+
+
+def purge_finished(db: Any, older_than: timedelta) -> int:
+    """Delete done jobs finished before now - older_than (failed jobs are kept for inspection)."""
+    result = db.execute(delete(Job).where(Job.status == DONE, Job.finished_at < _utcnow() - older_than))
+    db.commit()
+    return result.rowcount or 0
+
+
+def stats(db: Any) -> Dict[str, int]:
+    """Job counts per status, from one GROUP BY."""
+    counts = dict.fromkeys((QUEUED, RUNNING, DONE, FAILED), 0)
+    counts.update({s: n for s, n in db.execute(select(Job.status, func.count()).group_by(Job.status))})
+    return counts
+
+
+class JobWorker:
+    """Poll, claim and run jobs until stopped."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Any],
+        batch_size: int = 10,
+        poll_interval: float = 1.0,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+        backoff: float = DEFAULT_BACKOFF_SECONDS,
+        retention: timedelta = timedelta(hours=float(os.getenv("JOB_RETENTION_HOURS", "24"))),
+        name: Optional[str] = None,
+    ):
+        self._session_factory = session_factory
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.backoff = backoff
+        self.retention = retention
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_purge = 0.0
+        self.processed = 0
+        self.failed = 0
+
+    def run_once(self) -> int:
+        """Claim and run one batch. Returns the number of jobs handled."""
+        db = self._session_factory()
+        try:
+            jobs = claim(db, self.batch_size, self.lease_seconds)
+            for job in jobs:
+                if run_job(db, job, self.backoff):
+                    self.processed += 1
+                else:
+                    self.failed += 1
+            if time.monotonic() - self._last_purge > 3600:
+                self._last_purge = time.monotonic()
+                purge_finished(db, self.retention)
+            return len(jobs)
+        finally:
+            db.close()
+
+    def run_forever(self) -> None:
+        logger.info("Job worker %s started", self.name)
+        while not self._stop.is_set():
+            try:
+                handled = self.run_once()
+            except Exception:
+                logger.exception("Job worker %s poll failed", self.name)
+                handled = 0
+            if not handled:
+                self._stop.wait(self.poll_interval)
+        logger.info("Job worker %s stopped (processed=%d failed=%d)", self.name, self.processed, self.failed)
+
+    def start(self) -> None:
+        """Run in a daemon thread (in-process mode)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run_forever, name="job-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+
+# ---- in-process worker used by app.main (JOB_WORKER_IN_PROCESS, on by default) ----
+
+_worker: Optional[JobWorker] = None
+
+
+def in_process_enabled() -> bool:
+    return os.getenv("JOB_WORKER_IN_PROCESS", "true").lower() in ("1", "true", "yes")
+
+
+def start_in_process_worker(**kwargs: Any) -> JobWorker:
+    global _worker
+    if _worker is None:
+        from app.db.database import SessionLocal
+        from app.jobs import handlers  # noqa: F401  (register handlers)
+
+        kwargs.setdefault("session_factory", SessionLocal)
+        _worker = JobWorker(**kwargs)
+    _worker.start()
+    return _worker
+
+
+def stop_in_process_worker() -> None:
+    global _worker
+    if _worker is not None:
+        _worker.stop()
+        _worker = None
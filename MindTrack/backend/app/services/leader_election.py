@@ -0,0 +1,300 @@
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Optional
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from app.db.database import DATABASE_URL, SessionLocal
+from app.models import SchedulerLease
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+    import msvcrt
+
+# leader_election.py
+"""
+Leader election so only one backend worker runs periodic jobs.
+
+With several uvicorn workers every process executes the startup hook, so the
+reminder scheduler (and any other periodic job) would run once per worker.
+Each worker runs a LeaderElector thread that tries to take a named lease;
+the winner calls on_elected (start the jobs), everyone else keeps serving
+requests and retries every renew interval.
+
+Backends:
+- DatabaseLeaseBackend: a row in scheduler_leases with holder/expires_at.
+  Acquire and renew are one conditional UPDATE (holder is me, or the lease
+  has expired), falling back to INSERT for the first run. Works across hosts.
+  If the leader dies, a follower takes over once the lease expires (ttl).
+- FileLockBackend: an exclusive flock on a local file. The kernel drops the
+  lock the moment the holder exits, so failover is one poll interval. Only
+  valid when every worker runs on one host.
+
+Configure with SCHEDULER_LEADER_BACKEND ("auto", "db", "file" or "none";
+auto picks file for SQLite and db otherwise), SCHEDULER_LEASE_TTL (seconds)
+and SCHEDULER_LOCK_PATH.
+"""
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEASE_NAME = "scheduler"
+DEFAULT_TTL_SECONDS = float(os.getenv("SCHEDULER_LEASE_TTL", "15"))
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class DatabaseLeaseBackend:
+    """Lease row in scheduler_leases, shared by every worker on every host."""
+
+    def __init__(
+        self,
+        name: str = DEFAULT_LEASE_NAME,
+        holder: Optional[str] = None,
+        ttl: float = DEFAULT_TTL_SECONDS,
+        session_factory: Callable[[], Any] = SessionLocal,
+        clock: Callable[[], datetime] = _utcnow,
+    ):
+        self.name = name
+        self.holder = holder or worker_id()
+        self.ttl = ttl
+        self._session_factory = session_factory
+        self._clock = clock
+
+    def try_acquire(self) -> bool:
+        """Take or renew the lease. Returns True if this worker holds it."""
+        now = self._clock()
+        expires = now + timedelta(seconds=self.ttl)
+        db = self._session_factory()
+        try:
+            renewed = db.execute(
+                update(SchedulerLease)
+                .where(
+                    SchedulerLease.name == self.name,
+                    or_(SchedulerLease.holder == self.holder, SchedulerLease.expires_at < now),
+                )
+                .values(holder=self.holder, expires_at=expires)
+                .execution_options(synchronize_session=False)
+            )
+            if renewed.rowcount:
+                db.commit()
+                return True
+            db.rollback()
+            # No row yet: the first worker to insert wins, the rest hit the PK
+            db.add(SchedulerLease(name=self.name, holder=self.holder, acquired_at=now, expires_at=expires))
+            try:
+                db.commit()
+                return True
+            except IntegrityError:
+                db.rollback()
+                return False
+        finally:
+            db.close()
+
+    def release(self) -> None:
+        """Expire the lease now so a follower can take over without waiting for the ttl."""
+        db = self._session_factory()
+        try:
+            db.execute(
+                update(SchedulerLease)
+                .where(SchedulerLease.name == self.name, SchedulerLease.holder == self.holder)
+                .values(expires_at=self._clock() - timedelta(seconds=1))
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+        except SQLAlchemyError:
+            db.rollback()
+            logger.exception("Failed to release lease %s", self.name)
+        finally:
+            db.close()
+
+
+class FileLockBackend:
+    """Exclusive non-blocking lock on a local file; released by the OS on exit."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv(
+            "SCHEDULER_LOCK_PATH", os.path.join(tempfile.gettempdir(), "mindtrack-scheduler.lock")
+        )
+        self._fh = None
+
+    def try_acquire(self) -> bool:
+        if self._fh is not None:
+            return True
+        fh = open(self.path, "a+")
+        try:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:  # pragma: no cover - Windows
+                msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            fh.close()
+            return False
+        fh.seek(0)
+        fh.truncate()
+        fh.write(f"{os.getpid()}\n")
+        fh.flush()
+        self._fh = fh
+        return True
+
+    def release(self) -> None:
+        if self._fh is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fh.fileno(), fcntl.LOCK_UN)
+            else:  # pragma: no cover - Windows
+                msvcrt.locking(self._fh.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._fh.close()
+            self._fh = None
+
+
+class AlwaysLeaderBackend:
+    """Single-process deployments: no election."""
+
+    def try_acquire(self) -> bool:
+        return True
+
+    def release(self) -> None:
+        pass
+
+
+class LeaderElector:
+    """
+    Background thread that keeps trying the backend every renew_interval and
+    calls on_elected / on_demoted on leadership changes.
+    """
+
+    def __init__(
+        self,
+        backend: Any,
+        on_elected: Callable[[], None],
+        on_demoted: Callable[[], None],
+        renew_interval: float = DEFAULT_TTL_SECONDS / 3,
+        ttl: float = DEFAULT_TTL_SECONDS,
+        monotonic: Callable[[], float] = time.monotonic,
+    ):
+        self.backend = backend
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.renew_interval = renew_interval
+        self.ttl = ttl
+        self._monotonic = monotonic
+        self._is_leader = False
+        self._held_until = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._is_leader
+
+    def step(self) -> bool:
+        """One acquire/renew attempt. Returns whether this worker now leads."""
+        try:
+            acquired = self.backend.try_acquire()
+        except Exception:
+            logger.exception("Leader lease check failed")
+            # Keep leading only while the last successful renewal is still valid
+            acquired = self._is_leader and self._monotonic() < self._held_until
+        else:
+            if acquired:
+                self._held_until = self._monotonic() + self.ttl
+
+        if acquired and not self._is_leader:
+            self._is_leader = True
+            logger.info("This worker is now the scheduler leader")
+            self._safe_call(self.on_elected)
+        elif not acquired and self._is_leader:
+            self._is_leader = False
+            logger.warning("Lost scheduler leadership")
+            self._safe_call(self.on_demoted)
+        return self._is_leader
+
+    @staticmethod
+    def _safe_call(callback: Callable[[], None]) -> None:
+        try:
+            callback()
+        except Exception:
+            logger.exception("Leader election callback failed")
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.step()
+            self._stop.wait(self.renew_interval)
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="leader-elector", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop electing; if leading, run on_demoted and release the lease for fast failover."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        if self._is_leader:
+            self._is_leader = False
+            self._safe_call(self.on_demoted)
+        try:
+            self.backend.release()
+        except Exception:
+            logger.exception("Failed to release leader lease")
+
+
+# ---- process-wide instance used by app.main ----
+
+_elector: Optional[LeaderElector] = None
+
+
+def backend_from_env(kind: Optional[str] = None) -> Any:
+    kind = (kind or os.getenv("SCHEDULER_LEADER_BACKEND", "auto")).lower()
+    if kind == "auto":
+        kind = "file" if DATABASE_URL.startswith("sqlite") else "db"
+    if kind == "db":
+        return DatabaseLeaseBackend()
+    if kind == "file":
+        return FileLockBackend()
+    if kind != "none":
+        logger.warning("Unknown SCHEDULER_LEADER_BACKEND %r; running without election", kind)
+    return AlwaysLeaderBackend()
+
+
+def is_leader() -> bool:
+    return _elector is not None and _elector.is_leader
+
+
+def start_election(on_elected: Callable[[], None], on_demoted: Callable[[], None], **kwargs: Any) -> LeaderElector:
+    global _elector
+    if _elector is None:
+        backend = kwargs.pop("backend", None) or backend_from_env()
+        # A file lock is free the instant its holder exits, so poll it quickly
+        kwargs.setdefault("renew_interval", 1.0 if isinstance(backend, FileLockBackend) else DEFAULT_TTL_SECONDS / 3)
+        _elector = LeaderElector(backend, on_elected, on_demoted, **kwargs)
+    _elector.start()
+    return _elector
+
+
+def stop_election() -> None:
+    global _elector
+    if _elector is not None:
+        _elector.stop()
+        _elector = None
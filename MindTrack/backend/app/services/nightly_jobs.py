@@ -0,0 +1,109 @@
+import logging
+import os
+import threading
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Optional
+
+from app.db.database import SessionLocal
+from app.services import badge_rules, rollup_service
+
+# nightly_jobs.py
+"""
+Nightly aggregation run, started on the scheduler leader only (enabled by
+NIGHTLY_JOBS_ENABLED, default on, independently of the reminder scheduler).
+
+Once a day at NIGHTLY_JOB_HOUR (UTC, default 3) it rebuilds the
+user_daily_rollups of the last NIGHTLY_ROLLUP_DAYS days (default 2, so late
+entries for yesterday are picked up) and then evaluates the badge rules for
+every user as of yesterday.
+"""
+
+logger = logging.getLogger(__name__)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def is_enabled() -> bool:
+    return os.getenv("NIGHTLY_JOBS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+
+def run_nightly(db: Any, today: Optional[date] = None, rollup_days: Optional[int] = None) -> Dict[str, Any]:
+    """One nightly pass: refresh recent rollups, then award rule badges."""
+    today = today or _utcnow().date()
+    rollup_days = rollup_days or int(os.getenv("NIGHTLY_ROLLUP_DAYS", "2"))
+    yesterday = today - timedelta(days=1)
+    rows = rollup_service.refresh_rollups(db, today - timedelta(days=rollup_days), yesterday)
+    stats = badge_rules.evaluate_rules(db, as_of=yesterday)
+    return {"rollup_rows": rows, **stats}
+
+
+def seconds_until(hour: int, now: datetime) -> float:
+    target = now.replace(hour=hour, minute=0, second=0, microsecond=0)
+    if target <= now:
+        target += timedelta(days=1)
+    return (target - now).total_seconds()
+
+
+class NightlyJobRunner:
+    def __init__(
+        self,
+        hour: Optional[int] = None,
+        session_factory: Callable[[], Any] = SessionLocal,
+        clock: Callable[[], datetime] = _utcnow,
+    ):
+        self.hour = hour if hour is not None else int(os.getenv("NIGHTLY_JOB_HOUR", "3"))
+        self._session_factory = session_factory
+        self._clock = clock
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_run: Optional[Dict[str, Any]] = None
+
+    def run_once(self) -> Dict[str, Any]:
+        db = self._session_factory()
+        try:
+            self.last_run = run_nightly(db, today=self._clock().date())
+            return self.last_run
+        finally:
+            db.close()
+
+    def _run(self) -> None:
+        while not self._stop.wait(seconds_until(self.hour, self._clock())):
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Nightly job failed")
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="nightly-jobs", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+
+# ---- process-wide instance used by app.main ----
+
+_runner: Optional[NightlyJobRunner] = None
+
+
+def start_nightly_jobs(**kwargs: Any) -> NightlyJobRunner:
+    global _runner
+    if _runner is None:
+        _runner = NightlyJobRunner(**kwargs)
+    _runner.start()
+    return _runner
+
+
+def stop_nightly_jobs() -> None:
+    global _runner
+    if _runner is not None:
+        _runner.stop()
+        _runner = None
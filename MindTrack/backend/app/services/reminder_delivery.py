@@ -0,0 +1,298 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+# reminder_delivery.py
+"""
+Delivery stage for due reminders.
+
+The scheduler hands every batch of due reminders to DeliveryPipeline.submit().
+Reminders of one user that fall in the same minute are grouped into a single
+digest Notification, so a morning spike becomes one message per user rather
+than one per habit. Digests go through a bounded queue to a small pool of
+worker threads, each calling the configured sink:
+
+- LogSink:     logs one line per digest (default)
+- FileSink:    appends JSON lines to a file (local stand-in / tests)
+- WebhookSink: POSTs the digest as JSON to a URL
+
+Backpressure: when the queue is full, submit() blocks the scheduler thread
+for at most put_timeout seconds per call (not per digest), then drops what
+did not fit, counts it and returns the dropped reminder ids so the scheduler
+can keep them due and retry. A sink
+error is retried with exponential backoff up to max_attempts. stats() reports
+throughput, delivery lag (delivered_at - due_at) and queue depth.
+
+Configure with REMINDER_SINK ("log", "file:<path>" or "webhook:<url>"),
+REMINDER_DELIVERY_WORKERS and REMINDER_DELIVERY_QUEUE_SIZE.
+"""
+
+logger = logging.getLogger(__name__)
+
+# Lag samples kept for percentiles; older samples roll off
+LAG_WINDOW = 2048
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+@dataclass
+class Notification:
+    """One digest: every reminder of a user due in the same minute."""
+
+    user_id: str
+    due_at: datetime
+    items: List[Dict[str, Any]] = field(default_factory=list)
+    attempts: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        payload = asdict(self)
+        payload["due_at"] = self.due_at.isoformat()
+        payload.pop("attempts")
+        return payload
+
+
+def group_digests(due: List[Any]) -> List[Notification]:
+    """
+    Group scheduler entries (anything with user_id, reminder_id, habit_name,
+    time_of_day and next_fire_at) by (user, minute of the fire time).
+    """
+    digests: Dict[Tuple[str, datetime], Notification] = {}
+    for entry in due:
+        minute = entry.next_fire_at.replace(second=0, microsecond=0)
+        key = (str(entry.user_id), minute)
+        digest = digests.get(key)
+        if digest is None:
+            digest = digests[key] = Notification(user_id=key[0], due_at=minute)
+        digest.items.append({
+            "reminder_id": str(entry.reminder_id),
+            "habit_name": entry.habit_name,
+            "time_of_day": entry.time_of_day,
+        })
+    return list(digests.values())
+
+
+# ---- sinks ----
+
+
+class LogSink:
+    def send(self, notification: Notification) -> None:
+        habits = ", ".join(item["habit_name"] for item in notification.items)
+        logger.info("Reminder for user=%s at %s: %s", notification.user_id, notification.due_at, habits)
+
+
+class FileSink:
+    """Append each digest as one JSON line."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    def send(self, notification: Notification) -> None:
+        line = json.dumps(notification.to_dict(), default=str)
+        with self._lock, open(self.path, "a") as fh:
+            fh.write(line + "\n")
+
+
+class WebhookSink:
+    """POST each digest as JSON; any non-2xx response raises and is retried."""
+
+    def __init__(self, url: str, timeout: float = 5.0):
+        import httpx
+
+        self.url = url
+        self._client = httpx.Client(timeout=timeout)
+
+    def send(self, notification: Notification) -> None:
+        response = self._client.post(self.url, json=notification.to_dict())
+        response.raise_for_status()
+
+    def close(self) -> None:
+        self._client.close()
+
+
+def sink_from_env(spec: Optional[str] = None) -> Any:
+    spec = spec if spec is not None else os.getenv("REMINDER_SINK", "log")
+    kind, _, target = spec.partition(":")
+    if kind == "file" and target:
+        return FileSink(target)
+    if kind == "webhook" and target:
+        return WebhookSink(target)
+    if kind != "log":
+        logger.warning("Unknown REMINDER_SINK %r; logging reminders instead", spec)
+    return LogSink()
+
+
+# ---- pipeline ----
+
+
+class DeliveryPipeline:
+    """Bounded queue of digests drained by a fixed pool of worker threads."""
+
+    def __init__(
+        self,
+        sink: Any = None,
+        workers: int = 4,
+        max_queue: int = 1000,
+        put_timeout: float = 5.0,
+        max_attempts: int = 3,
+        retry_backoff: float = 0.5,
+        clock: Callable[[], datetime] = _utcnow,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.sink = sink or LogSink()
+        self.workers = max(1, workers)
+        self.put_timeout = put_timeout
+        self.max_attempts = max(1, max_attempts)
+        self.retry_backoff = retry_backoff
+        self._clock = clock
+        self._sleep = sleep
+        self._queue: "queue.Queue[Optional[Notification]]" = queue.Queue(maxsize=max_queue)
+        self._threads: List[threading.Thread] = []
+        self._stats_lock = threading.Lock()
+        self._lags: Deque[float] = deque(maxlen=LAG_WINDOW)
+        self._counters = dict.fromkeys(
+            ("submitted", "enqueued", "delivered", "reminders_delivered", "retried", "failed", "dropped"), 0
+        )
+        self._started_at: Optional[float] = None
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._stats_lock:
+            self._counters[name] += n
+
+    def submit(self, due: List[Any]) -> List[str]:
+        """
+        Group due reminders into digests and enqueue them. Returns the ids of
+        the reminders whose digest was dropped (empty when all were enqueued).
+        """
+        if not due:
+            return []
+        self._count("submitted", len(due))
+        enqueued = 0
+        dropped: List[str] = []
+        deadline = time.monotonic() + self.put_timeout
+        for digest in group_digests(due):
+            try:
+                self._queue.put(digest, timeout=max(0.0, deadline - time.monotonic()))
+                enqueued += 1
+            except queue.Full:
+                self._count("dropped")
+                dropped.extend(item["reminder_id"] for item in digest.items)
+                logger.warning("Reminder delivery queue full; dropped digest for user=%s", digest.user_id)
+        self._count("enqueued", enqueued)
+        return dropped
+
+    def _deliver(self, digest: Notification) -> None:
+        while True:
+            digest.attempts += 1
+            try:
+                self.sink.send(digest)
+            except Exception as e:
+                if digest.attempts >= self.max_attempts:
+                    self._count("failed")
+                    logger.error("Giving up on reminder digest for user=%s after %d attempts: %s",
+                                 digest.user_id, digest.attempts, e)
+                    return
+                self._count("retried")
+                self._sleep(self.retry_backoff * (2 ** (digest.attempts - 1)))
+                continue
+            lag = (self._clock() - digest.due_at).total_seconds()
+            with self._stats_lock:
+                self._counters["delivered"] += 1
+                self._counters["reminders_delivered"] += len(digest.items)
+                self._lags.append(lag)
+            return
+
+    def _work(self) -> None:
+        while True:
+            digest = self._queue.get()
+            try:
+                if digest is None:
+                    return
+                self._deliver(digest)
+            except Exception:
+                logger.exception("Reminder delivery worker error")
+            finally:
+                self._queue.task_done()
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        self._started_at = time.monotonic()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"reminder-delivery-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def drain(self) -> None:
+        """Block until every enqueued digest has been handled."""
+        self._queue.join()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Deliver what is queued, then stop the workers."""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+        close = getattr(self.sink, "close", None)
+        if close is not None:
+            close()
+        logger.info("Reminder delivery stopped: %s", self.stats())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            counters = dict(self._counters)
+            lags = sorted(self._lags)
+        uptime = time.monotonic() - self._started_at if self._started_at is not None else 0.0
+
+        def pct(p: float) -> Optional[float]:
+            return lags[min(len(lags) - 1, int(p * len(lags)))] if lags else None
+
+        return {
+            **counters,
+            "queue_depth": self._queue.qsize(),
+            "queue_capacity": self._queue.maxsize,
+            "workers": len(self._threads),
+            "uptime_s": uptime,
+            "digests_per_s": counters["delivered"] / uptime if uptime else 0.0,
+            "reminders_per_s": counters["reminders_delivered"] / uptime if uptime else 0.0,
+            "lag_s": {"p50": pct(0.5), "p95": pct(0.95), "max": lags[-1] if lags else None},
+        }
+
+
+# ---- process-wide instance used by app.main ----
+
+_pipeline: Optional[DeliveryPipeline] = None
+
+
+def get_pipeline() -> Optional[DeliveryPipeline]:
+    return _pipeline
+
+
+def start_pipeline(**kwargs: Any) -> DeliveryPipeline:
+    global _pipeline
+    if _pipeline is None:
+        kwargs.setdefault("sink", sink_from_env())
+        kwargs.setdefault("workers", int(os.getenv("REMINDER_DELIVERY_WORKERS", "4")))
+        kwargs.setdefault("max_queue", int(os.getenv("REMINDER_DELIVERY_QUEUE_SIZE", "1000")))
+        _pipeline = DeliveryPipeline(**kwargs)
+    _pipeline.start()
+    return _pipeline
+
+
+def stop_pipeline() -> None:
+    global _pipeline
+    if _pipeline is not None:
+        _pipeline.stop()
+        _pipeline = None
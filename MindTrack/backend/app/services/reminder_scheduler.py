@@ -0,0 +1,435 @@
+import heapq
+import itertools
+import logging
+import os
+import threading
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.db.database import SessionLocal
+from app.models import Reminder, User
+from app.services import reminder_service
+from app.services.reminder_service import as_utc, compute_next_fire
+
+# reminder_scheduler.py
+"""
+In-process reminder scheduler.
+
+Enabled reminders are kept in a min-heap keyed by their next fire instant
+(UTC), computed from time_of_day, repeat and the owner's User.timezone. The
+scheduler thread sleeps until the head of the heap is due, pops only the
+due entries, hands them to the dispatch callback, records last_triggered for
+all of them with one bulk UPDATE (which also persists the advanced
+next_fire_at column) and pushes each back with its following fire time.
+Work per wake-up is O(due * log n), independent of how many reminders
+exist. On load, a persisted next_fire_at in the past fires immediately, so
+windows missed while the process was down are caught up once. Reminders the
+dispatch callback hands back (delivery queue full) are not advanced and are
+retried after RETRY_SECONDS.
+
+reminder_service notifies the running scheduler on create/update/delete
+(notify_changed / notify_removed) so CRUD never forces a full reload. Stale
+heap entries are skipped lazily using a per-reminder version number.
+
+With several workers only the elected leader runs the scheduler (see
+leader_election), so writes handled by other workers are not pushed to it.
+Each wake-up therefore range-scans the next_fire_at index for reminders due
+within the next MAX_SLEEP_SECONDS and merges them in, and due entries are
+re-checked against the database before dispatch so edits and deletes from
+other workers are honoured.
+
+Enable with REMINDER_SCHEDULER_ENABLED=1; app.main starts it on startup.
+"""
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on one sleep so wall-clock jumps (NTP, suspend) are noticed
+MAX_SLEEP_SECONDS = 60.0
+# Delay before re-dispatching reminders the dispatch callback could not take
+RETRY_SECONDS = 30.0
+
+
+@dataclass
+class ScheduledReminder:
+    reminder_id: str
+    user_id: Any
+    habit_name: str
+    time_of_day: str
+    repeat: Any
+    timezone: Optional[str]
+    created_at: Optional[datetime]
+    next_fire_at: datetime
+    version: int = 0
+    # Set while a dispatch the callback rejected waits to be retried
+    retry_at: Optional[datetime] = None
+
+    @property
+    def due_at(self) -> datetime:
+        return self.retry_at or self.next_fire_at
+
+
+def _key(reminder_id: Any) -> str:
+    """Normalize UUID / hex / hyphenated ids to one dictionary key."""
+    try:
+        return str(uuid.UUID(str(reminder_id)))
+    except ValueError:
+        return str(reminder_id)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _log_dispatch(due: List[ScheduledReminder]) -> None:
+    for item in due:
+        logger.info("Reminder due user=%s habit=%s at=%s", item.user_id, item.habit_name, item.next_fire_at)
+
+
+class ReminderScheduler:
+    """Min-heap of enabled reminders ordered by next fire time."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Any] = SessionLocal,
+        dispatch: Optional[Callable[[List[ScheduledReminder]], Optional[Iterable[str]]]] = None,
+        clock: Callable[[], datetime] = _utcnow,
+    ):
+        self._session_factory = session_factory
+        self._dispatch = dispatch or _log_dispatch
+        self._clock = clock
+        self._heap: List[Tuple[datetime, int, str, int]] = []
+        self._entries: Dict[str, ScheduledReminder] = {}
+        self._seq = itertools.count()
+        # Never reused, so a tuple left from before an unschedule cannot match a later entry
+        self._versions = itertools.count()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---- heap maintenance ----
+
+    def _push(self, entry: ScheduledReminder) -> None:
+        heapq.heappush(self._heap, (entry.due_at, next(self._seq), entry.reminder_id, entry.version))
+
+    def _compact_if_needed(self) -> None:
+        # Lazy deletion leaves stale tuples behind; rebuild when they dominate
+        if len(self._heap) > 64 and len(self._heap) > 2 * len(self._entries):
+            self._heap = [
+                (e.due_at, next(self._seq), e.reminder_id, e.version) for e in self._entries.values()
+            ]
+            heapq.heapify(self._heap)
+
+    def schedule(
+        self,
+        reminder_id: Any,
+        user_id: Any,
+        habit_name: str,
+        time_of_day: str,
+        repeat: Any,
+        tz_name: Optional[str],
+        created_at: Optional[datetime] = None,
+        enabled: bool = True,
+        next_fire_at: Optional[datetime] = None,
+    ) -> Optional[datetime]:
+        """
+        Insert or replace one reminder. next_fire_at defaults to the next
+        occurrence after now. Returns the scheduled time (None if disabled).
+        """
+        key = _key(reminder_id)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if not enabled:
+                self._compact_if_needed()
+                return None
+            entry = ScheduledReminder(
+                reminder_id=key,
+                user_id=user_id,
+                habit_name=habit_name,
+                time_of_day=time_of_day,
+                repeat=repeat,
+                timezone=tz_name,
+                created_at=created_at,
+                next_fire_at=(as_utc(next_fire_at)
+                              or compute_next_fire(time_of_day, repeat, tz_name, self._clock(), created_at)),
+                version=next(self._versions),
+            )
+            if previous is not None and previous.next_fire_at == entry.next_fire_at:
+                # An edit that kept the occurrence (e.g. a rename) keeps its pending retry
+                entry.retry_at = previous.retry_at
+            self._entries[key] = entry
+            self._push(entry)
+            is_new_head = self._heap[0][2] == key
+            self._compact_if_needed()
+        if is_new_head:
+            # The thread may be sleeping towards a later instant
+            self._wake.set()
+        return entry.next_fire_at
+
+    def unschedule(self, reminder_id: Any) -> None:
+        with self._lock:
+            self._entries.pop(_key(reminder_id), None)
+            self._compact_if_needed()
+
+    def load(self) -> int:
+        """(Re)build the heap from all enabled reminders. Returns the number scheduled."""
+        db = self._session_factory()
+        try:
+            reminder_service.backfill_next_fire_at(db, self._clock())
+            rows = (
+                db.query(Reminder, User.timezone)
+                .outerjoin(User, User.user_id == Reminder.user_id)
+                .filter(Reminder.enabled == True)  # noqa: E712
+                .all()
+            )
+        finally:
+            db.close()
+        now = self._clock()
+        with self._lock:
+            self._entries.clear()
+            for reminder, tz_name in rows:
+                key = _key(reminder.reminder_id)
+                self._entries[key] = ScheduledReminder(
+                    reminder_id=key,
+                    user_id=reminder.user_id,
+                    habit_name=reminder.habit_name,
+                    time_of_day=reminder.time_of_day,
+                    repeat=reminder.repeat,
+                    timezone=tz_name,
+                    created_at=reminder.created_at,
+                    next_fire_at=(as_utc(reminder.next_fire_at)
+                                  or compute_next_fire(reminder.time_of_day, reminder.repeat, tz_name, now,
+                                                       reminder.created_at)),
+                    version=next(self._versions),
+                )
+            self._heap = [(e.next_fire_at, next(self._seq), e.reminder_id, e.version)
+                          for e in self._entries.values()]
+            heapq.heapify(self._heap)
+        self._wake.set()
+        logger.info("Reminder scheduler loaded %d enabled reminders", len(rows))
+        return len(rows)
+
+    def sync_upcoming(self, now: Optional[datetime] = None) -> int:
+        """
+        Merge reminders due within the next MAX_SLEEP_SECONDS from the
+        database (index range scan). Returns how many entries changed.
+        """
+        now = now or self._clock()
+        db = self._session_factory()
+        try:
+            rows = (
+                db.query(Reminder, User.timezone)
+                .outerjoin(User, User.user_id == Reminder.user_id)
+                .filter(
+                    Reminder.enabled == True,  # noqa: E712
+                    Reminder.next_fire_at <= now + timedelta(seconds=MAX_SLEEP_SECONDS),
+                )
+                .all()
+            )
+        finally:
+            db.close()
+        changed = 0
+        for reminder, tz_name in rows:
+            fire_at = as_utc(reminder.next_fire_at)
+            with self._lock:
+                current = self._entries.get(_key(reminder.reminder_id))
+            if current is not None and current.next_fire_at == fire_at:
+                continue
+            self.schedule(reminder.reminder_id, reminder.user_id, reminder.habit_name, reminder.time_of_day,
+                          reminder.repeat, tz_name, created_at=reminder.created_at, next_fire_at=fire_at)
+            changed += 1
+        return changed
+
+    def _still_due(self, due: List[ScheduledReminder], now: datetime) -> List[ScheduledReminder]:
+        """Drop entries another worker disabled, deleted or moved since they were scheduled."""
+        db = self._session_factory()
+        try:
+            ids = [uuid.UUID(e.reminder_id) for e in due]
+            rows = (
+                db.query(Reminder.reminder_id)
+                .filter(
+                    Reminder.reminder_id.in_(ids),
+                    Reminder.enabled == True,  # noqa: E712
+                    Reminder.next_fire_at <= now,
+                )
+                .all()
+            )
+        except Exception:
+            logger.exception("Could not re-check %d due reminders; dispatching as scheduled", len(due))
+            return due
+        finally:
+            db.close()
+        valid = {_key(rid) for (rid,) in rows}
+        stale = [e for e in due if e.reminder_id not in valid]
+        for entry in stale:
+            # sync_upcoming re-adds it if it is still enabled with a new time
+            self.unschedule(entry.reminder_id)
+        return [e for e in due if e.reminder_id in valid]
+
+    # ---- firing ----
+
+    def next_fire_at(self) -> Optional[datetime]:
+        with self._lock:
+            while self._heap:
+                fire_at, _, key, version = self._heap[0]
+                entry = self._entries.get(key)
+                if entry is not None and entry.version == version:
+                    return fire_at
+                heapq.heappop(self._heap)
+        return None
+
+    def _pop_due(self, now: datetime) -> List[ScheduledReminder]:
+        due: List[ScheduledReminder] = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                _, _, key, version = heapq.heappop(self._heap)
+                entry = self._entries.get(key)
+                if entry is None or entry.version != version:
+                    continue
+                due.append(entry)
+        return due
+
+    def run_pending(self, now: Optional[datetime] = None) -> List[ScheduledReminder]:
+        """
+        Fire every reminder whose next_fire_at <= now. Returns what was fired.
+
+        dispatch may return the ids it could not accept (e.g. a full delivery
+        queue); those keep their next_fire_at, in memory and in the database,
+        and are dispatched again RETRY_SECONDS later.
+        """
+        now = now or self._clock()
+        due = self._pop_due(now)
+        if due:
+            due = self._still_due(due, now)
+        if not due:
+            return []
+
+        fired = [ScheduledReminder(**vars(e)) for e in due]
+        rejected = set()
+        try:
+            rejected = {_key(rid) for rid in self._dispatch(fired) or ()}
+        except Exception:
+            logger.exception("Reminder dispatch failed for %d reminders", len(fired))
+        if rejected:
+            logger.warning("%d reminders not accepted for delivery; retrying in %ds", len(rejected), RETRY_SECONDS)
+
+        following = {
+            e.reminder_id: compute_next_fire(e.time_of_day, e.repeat, e.timezone,
+                                             max(now, e.next_fire_at), e.created_at)
+            for e in due if e.reminder_id not in rejected
+        }
+        if following:
+            self._mark_triggered(following, now)
+
+        with self._lock:
+            for entry in due:
+                current = self._entries.get(entry.reminder_id)
+                if current is None or current.version != entry.version:
+                    continue  # changed or removed while dispatching
+                if entry.reminder_id in rejected:
+                    entry.retry_at = now + timedelta(seconds=RETRY_SECONDS)
+                else:
+                    entry.next_fire_at = following[entry.reminder_id]
+                    entry.retry_at = None
+                self._push(entry)
+        return [e for e in fired if e.reminder_id not in rejected]
+
+    def _mark_triggered(self, following: Dict[str, datetime], now: datetime) -> None:
+        """Record last_triggered and the advanced next_fire_at with one UPDATE."""
+        db = self._session_factory()
+        try:
+            reminder_service.mark_fired(db, following, now)
+        except Exception:
+            logger.exception("Failed to record %d fired reminders", len(following))
+        finally:
+            db.close()
+
+    # ---- thread ----
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            head = self.next_fire_at()
+            delay = MAX_SLEEP_SECONDS
+            if head is not None:
+                delay = min(MAX_SLEEP_SECONDS, max(0.0, (head - self._clock()).total_seconds()))
+            self._wake.wait(timeout=delay)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.sync_upcoming()
+                self.run_pending()
+            except Exception:
+                logger.exception("Reminder scheduler iteration failed")
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self.load()
+        self._thread = threading.Thread(target=self._run, name="reminder-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# ---- process-wide instance used by app.main and reminder_service ----
+
+_scheduler: Optional[ReminderScheduler] = None
+
+
+def is_enabled() -> bool:
+    return os.getenv("REMINDER_SCHEDULER_ENABLED", "false").lower() in ("1", "true", "yes")
+
+
+def get_scheduler() -> Optional[ReminderScheduler]:
+    return _scheduler
+
+
+def start_scheduler(**kwargs: Any) -> ReminderScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = ReminderScheduler(**kwargs)
+    _scheduler.start()
+    return _scheduler
+
+
+def stop_scheduler() -> None:
+    global _scheduler
+    if _scheduler is not None:
+        _scheduler.stop()
+        _scheduler = None
+
+
+def notify_changed(reminder: Reminder) -> None:
+    """Called by reminder_service after a reminder is created or updated."""
+    if _scheduler is None:
+        return
+    tz_name = reminder.user.timezone if getattr(reminder, "user", None) is not None else None
+    _scheduler.schedule(
+        reminder.reminder_id,
+        reminder.user_id,
+        reminder.habit_name,
+        reminder.time_of_day,
+        reminder.repeat,
+        tz_name,
+        created_at=reminder.created_at,
+        enabled=bool(reminder.enabled),
+        next_fire_at=reminder.next_fire_at,
+    )
+
+
+def notify_removed(reminder_id: Any) -> None:
+    """Called by reminder_service after a reminder is deleted."""
+    if _scheduler is not None:
+        _scheduler.unschedule(reminder_id)
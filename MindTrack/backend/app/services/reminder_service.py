@@ -1,13 +1,28 @@
-from typing import Any, Dict, List, Optional
-from datetime import datetime
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime, timedelta, timezone
 import logging
-from sqlalchemy.orm import Session
+import os
+import threading
+import time
+import uuid
+from sqlalchemy import case, update
+from sqlalchemy.orm import Session, joinedload
 from sqlalchemy.exc import SQLAlchemyError
 
 # /c:/Users/Sweta.Singh/Downloads/project/tts/new/backend/app/services/reminder_service.py
 
 
-from app.models import Reminder  # adjust import path if your project structure differs
+from app.models import Reminder, User  # adjust import path if your project structure differs
+from app.models.reminder import ReminderResponse, RepeatEnum
+from app.observability import memory, metrics
+from app.observability.tracing import traced
+
+try:
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+except ImportError:  # pragma: no cover - Python < 3.9
+    ZoneInfo = None
+    ZoneInfoNotFoundError = KeyError
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +35,48 @@ class ReminderValidationError(ValueError):
     pass
 
 
+# Per-user listing cache: user_id -> (stored at, serialized reminders). Every
+# write path in this module invalidates the owner's entry after commit. The
+# generation counter stops a listing computed before an invalidation from
+# being stored. Writes handled by other workers are not seen here, so entries
+# also expire after LISTING_CACHE_TTL_SECONDS; both maps keep at most
+# LISTING_CACHE_MAX_USERS users, least recently used first out.
+LISTING_CACHE_TTL_SECONDS = float(os.getenv("REMINDER_LISTING_CACHE_TTL", "30"))
+LISTING_CACHE_MAX_USERS = int(os.getenv("REMINDER_LISTING_CACHE_SIZE", "10000"))
+_listing_cache: "OrderedDict[str, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+_listing_generation: "OrderedDict[str, int]" = OrderedDict()
+_listing_lock = threading.Lock()
+
+
+def _bounded_set(cache: "OrderedDict[str, Any]", key: str, value: Any) -> None:
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > LISTING_CACHE_MAX_USERS:
+        cache.popitem(last=False)
+
+
+def _as_uuid(value: Any) -> uuid.UUID:
+    if isinstance(value, uuid.UUID):
+        return value
+    try:
+        return uuid.UUID(str(value))
+    except (ValueError, TypeError, AttributeError):
+        raise ReminderNotFoundError(f"Reminder not found: {value}")
+
+
+def _coerce_repeat(value: Any) -> RepeatEnum:
+    if value is None:
+        return RepeatEnum.DAILY
+    if isinstance(value, RepeatEnum):
+        return value
+    try:
+        return RepeatEnum(str(value).lower())
+    except ValueError:
+        raise ReminderValidationError(
+            f"repeat must be one of {[r.value for r in RepeatEnum]}, got: {value!r}"
+        )
+
+
 def _validate_time_of_day(time_str: str) -> None:
     """
     Validate that time_str is in HH:MM 24-hour format.
@@ -31,12 +88,103 @@ def _validate_time_of_day(time_str: str) -> None:
         raise ReminderValidationError(f"time_of_day must be 'HH:MM' 24-hour format, got: {time_str!r}")
 
 
+def _resolve_timezone(tz_name: Optional[str]):
+    """
+    Return a tzinfo for an IANA name (User.timezone). Missing or unknown names
+    fall back to UTC, matching the data schema's default for server operations.
+    """
+    if tz_name and ZoneInfo is not None:
+        try:
+            return ZoneInfo(tz_name)
+        except (ZoneInfoNotFoundError, ValueError):
+            logger.warning("Unknown timezone %r, falling back to UTC", tz_name)
+    return timezone.utc
+
+
+def compute_next_fire(
+    time_of_day: str,
+    repeat: Any,
+    tz_name: Optional[str],
+    after: datetime,
+    anchor: Optional[datetime] = None,
+) -> datetime:
+    """
+    Return the first UTC instant strictly after `after` at which a reminder fires.
+
+    - time_of_day is HH:MM wall-clock time in the user's timezone.
+    - daily (and custom, which has no schedule fields yet) fire every day.
+    - weekly fires on the weekday of `anchor` (the reminder's created_at) in the
+      user's timezone, or the weekday of `after` when there is no anchor.
+    Naive datetimes are treated as UTC.
+    """
+    tz = _resolve_timezone(tz_name)
+    if after.tzinfo is None:
+        after = after.replace(tzinfo=timezone.utc)
+    hour, minute = (int(part) for part in time_of_day.split(":"))
+    repeat_value = repeat.value if isinstance(repeat, RepeatEnum) else (repeat or RepeatEnum.DAILY.value)
+
+    local_after = after.astimezone(tz)
+    candidate_day = local_after.date()
+    if repeat_value == RepeatEnum.WEEKLY.value:
+        if anchor is not None and anchor.tzinfo is None:
+            anchor = anchor.replace(tzinfo=timezone.utc)
+        weekday = (anchor.astimezone(tz) if anchor is not None else local_after).weekday()
+        candidate_day += timedelta(days=(weekday - candidate_day.weekday()) % 7)
+        step = timedelta(days=7)
+    else:
+        step = timedelta(days=1)
+
+    while True:
+        local_fire = datetime(candidate_day.year, candidate_day.month, candidate_day.day, hour, minute, tzinfo=tz)
+        fire_at = local_fire.astimezone(timezone.utc)
+        if fire_at > after:
+            return fire_at
+        candidate_day += step
+
+
+def as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """SQLite returns naive datetimes; every stored reminder instant is UTC."""
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _user_timezone(db: Session, user_id: Any) -> Optional[str]:
+    return db.query(User.timezone).filter(User.user_id == user_id).scalar()
+
+
+def _refresh_next_fire_at(db: Session, reminder: Reminder, now: Optional[datetime] = None) -> None:
+    """Recompute reminder.next_fire_at from its schedule fields (not committed)."""
+    if not reminder.enabled:
+        reminder.next_fire_at = None
+        return
+    now = now or datetime.now(timezone.utc)
+    tz_name = reminder.user.timezone if reminder.user is not None else _user_timezone(db, reminder.user_id)
+    reminder.next_fire_at = compute_next_fire(
+        reminder.time_of_day, reminder.repeat, tz_name, now, as_utc(reminder.created_at) or now
+    )
+
+
+def _notify_scheduler(reminder: Optional[Reminder] = None, deleted_id: Any = None) -> None:
+    """Push a CRUD change into the in-process scheduler, if one is running."""
+    # Imported lazily: the scheduler imports this module for compute_next_fire
+    from app.services import reminder_scheduler
+
+    try:
+        if deleted_id is not None:
+            reminder_scheduler.notify_removed(deleted_id)
+        elif reminder is not None:
+            reminder_scheduler.notify_changed(reminder)
+    except Exception:
+        logger.exception("Failed to notify reminder scheduler")
+
+
 def _ensure_reminder_schema(data: Dict[str, Any]) -> None:
     """
     Ensure incoming data has only allowed keys for the Reminder object.
     This is intentionally permissive for optional fields but prevents arbitrary keys.
     """
-    allowed_keys = {"user_id", "message", "time_of_day", "repeat", "enabled"}
+    allowed_keys = {"user_id", "habit_name", "time_of_day", "repeat", "enabled"}
     extra = set(data.keys()) - allowed_keys
     if extra:
         raise ReminderValidationError(f"Unexpected fields in reminder data: {sorted(extra)}")
@@ -46,7 +194,7 @@ def create_reminder(db: Session, reminder_data: Dict[str, Any]) -> Reminder:
     """
     Insert a new reminder into the DB after validating the payload.
 
-    Required keys: user_id, message, time_of_day
+    Required keys: user_id, habit_name, time_of_day
     Optional: repeat, enabled
 
     Returns the created Reminder object.
@@ -55,7 +203,7 @@ def create_reminder(db: Session, reminder_data: Dict[str, Any]) -> Reminder:
     _ensure_reminder_schema(reminder_data)
 
     # required fields validation
-    for required in ("user_id", "message", "time_of_day"):
+    for required in ("user_id", "habit_name", "time_of_day"):
         if required not in reminder_data:
             logger.error("Missing required field %s in reminder_data", required)
             raise ReminderValidationError(f"Missing required field: {required}")
@@ -64,19 +212,22 @@ def create_reminder(db: Session, reminder_data: Dict[str, Any]) -> Reminder:
 
     # set defaults
     reminder_payload = {
-        "user_id": reminder_data["user_id"],
-        "message": reminder_data["message"],
+        "user_id": _as_uuid(reminder_data["user_id"]),
+        "habit_name": reminder_data["habit_name"],
         "time_of_day": reminder_data["time_of_day"],
-        "repeat": reminder_data.get("repeat"),
+        "repeat": _coerce_repeat(reminder_data.get("repeat")),
         "enabled": bool(reminder_data.get("enabled", True)),
     }
 
     try:
         reminder = Reminder(**reminder_payload)
+        _refresh_next_fire_at(db, reminder)
         db.add(reminder)
         db.commit()
         db.refresh(reminder)
-        logger.info("Created reminder id=%s for user=%s", getattr(reminder, "id", None), reminder.user_id)
+        logger.info("Created reminder id=%s for user=%s", reminder.reminder_id, reminder.user_id)
+        invalidate_user_reminders(reminder.user_id)
+        _notify_scheduler(reminder)
         return reminder
     except SQLAlchemyError as e:
         db.rollback()
@@ -89,7 +240,7 @@ def get_reminder(db: Session, reminder_id: int) -> Reminder:
     Return a Reminder by ID or raise ReminderNotFoundError.
     """
     logger.debug("get_reminder called for id=%s", reminder_id)
-    reminder = db.query(Reminder).get(reminder_id)  # type: ignore[attr-defined]
+    reminder = db.get(Reminder, _as_uuid(reminder_id))
     if reminder is None:
         logger.warning("Reminder not found id=%s", reminder_id)
         raise ReminderNotFoundError(f"Reminder not found: {reminder_id}")
@@ -101,19 +252,69 @@ def list_reminders_for_user(db: Session, user_id: int) -> List[Reminder]:
     Return all reminders for a given user_id.
     """
     logger.debug("list_reminders_for_user called for user_id=%s", user_id)
-    reminders = db.query(Reminder).filter(Reminder.user_id == user_id).all()
+    reminders = (
+        db.query(Reminder)
+        .filter(Reminder.user_id == _as_uuid(user_id))
+        .order_by(Reminder.time_of_day, Reminder.habit_name)
+        .all()
+    )
     logger.info("Found %d reminders for user_id=%s", len(reminders), user_id)
     return reminders
 
 
+def _serialize(reminder: Reminder) -> Dict[str, Any]:
+    return ReminderResponse.model_validate(reminder).model_dump(mode="json")
+
+
+@traced()
+def list_user_reminders_cached(db: Session, user_id: Any) -> List[Dict[str, Any]]:
+    """
+    Serialized reminders for a user, served from the per-user cache when the
+    user has not written through this process since the last listing and the
+    entry is younger than LISTING_CACHE_TTL_SECONDS.
+    """
+    key = str(_as_uuid(user_id))
+    now = time.monotonic()
+    with _listing_lock:
+        cached = _listing_cache.get(key)
+        if cached is not None and now - cached[0] > LISTING_CACHE_TTL_SECONDS:
+            del _listing_cache[key]
+            cached = None
+        elif cached is not None:
+            _listing_cache.move_to_end(key)
+        generation = _listing_generation.get(key, 0)
+    metrics.cache_lookup("reminder_listing", cached is not None)
+    if cached is not None:
+        return cached[1]
+    listing = [_serialize(r) for r in list_reminders_for_user(db, key)]
+    with _listing_lock:
+        if _listing_generation.get(key, 0) == generation:
+            _bounded_set(_listing_cache, key, (now, listing))
+    return listing
+
+
+def listing_cache_stats() -> Dict[str, Any]:
+    """Entries and approximate size of the listing cache (for memory accounting)."""
+    with _listing_lock:
+        entries = {k: listing for k, (_, listing) in _listing_cache.items()}
+    return {"entries": len(entries), "bytes": memory.deep_sizeof(entries)}
+
+
+def invalidate_user_reminders(user_id: Any) -> None:
+    key = str(_as_uuid(user_id))
+    with _listing_lock:
+        _listing_cache.pop(key, None)
+        _bounded_set(_listing_generation, key, _listing_generation.get(key, 0) + 1)
+
+
 def update_reminder(db: Session, reminder_id: int, update_data: Dict[str, Any]) -> Reminder:
     """
-    Update allowed fields for a reminder: time_of_day, repeat, enabled.
+    Update allowed fields for a reminder: habit_name, time_of_day, repeat, enabled.
     Validate time_of_day format if present.
     Returns the updated Reminder.
     """
     logger.debug("update_reminder id=%s data=%s", reminder_id, update_data)
-    allowed_update_fields = {"time_of_day", "repeat", "enabled"}
+    allowed_update_fields = {"habit_name", "time_of_day", "repeat", "enabled"}
     extra = set(update_data.keys()) - allowed_update_fields
     if extra:
         logger.error("Attempt to update disallowed fields: %s", extra)
@@ -125,18 +326,26 @@ def update_reminder(db: Session, reminder_id: int, update_data: Dict[str, Any])
     reminder = get_reminder(db, reminder_id)
 
     # apply updates
+    schedule_before = (reminder.time_of_day, reminder.repeat, reminder.enabled)
+    if "habit_name" in update_data:
+        reminder.habit_name = update_data["habit_name"]
     if "time_of_day" in update_data:
         reminder.time_of_day = update_data["time_of_day"]
     if "repeat" in update_data:
-        reminder.repeat = update_data["repeat"]
+        reminder.repeat = _coerce_repeat(update_data["repeat"])
     if "enabled" in update_data:
         reminder.enabled = bool(update_data["enabled"])
+    # A rename must not move an occurrence that is due but not yet fired
+    if (reminder.time_of_day, reminder.repeat, reminder.enabled) != schedule_before:
+        _refresh_next_fire_at(db, reminder)
 
     try:
         db.add(reminder)
         db.commit()
         db.refresh(reminder)
         logger.info("Updated reminder id=%s", reminder_id)
+        invalidate_user_reminders(reminder.user_id)
+        _notify_scheduler(reminder)
         return reminder
     except SQLAlchemyError as e:
         db.rollback()
@@ -150,29 +359,184 @@ def delete_reminder(db: Session, reminder_id: int) -> None:
     """
     logger.debug("delete_reminder called for id=%s", reminder_id)
     reminder = get_reminder(db, reminder_id)
+    user_id = reminder.user_id
     try:
         db.delete(reminder)
         db.commit()
         logger.info("Deleted reminder id=%s", reminder_id)
+        invalidate_user_reminders(user_id)
+        _notify_scheduler(deleted_id=reminder_id)
     except SQLAlchemyError as e:
         db.rollback()
         logger.exception("Database error deleting reminder id=%s: %s", reminder_id, e)
         raise
 
 
+def upsert_reminders(
+    db: Session, user_id: Any, items: List[Dict[str, Any]], replace: bool = False
+) -> Dict[str, Any]:
+    """
+    Create or update many reminders of one user in a single transaction.
+
+    Each item is matched by reminder_id when given, otherwise by
+    (habit_name, time_of_day) among the user's reminders; unmatched items are
+    created. With replace=True, reminders not matched by any item are
+    deleted, so the caller can sync its full list in one call. Only rows that
+    actually changed are pushed to the scheduler.
+
+    Returns counts and the user's resulting reminders (serialized).
+    """
+    owner = _as_uuid(user_id)
+    existing = db.query(Reminder).options(joinedload(Reminder.user)).filter(Reminder.user_id == owner).all()
+    # Loaded once so new rows resolve the timezone without a query each
+    user = existing[0].user if existing else db.get(User, owner)
+    if user is None:
+        raise ReminderValidationError(f"Unknown user: {user_id}")
+    by_id = {r.reminder_id: r for r in existing}
+    by_slot = {(r.habit_name, r.time_of_day): r for r in existing}
+
+    seen = set()
+    changed: List[Reminder] = []
+    created = updated = 0
+    now = datetime.now(timezone.utc)
+    for item in items:
+        _validate_time_of_day(item.get("time_of_day"))
+        fields = {
+            "habit_name": item["habit_name"],
+            "time_of_day": item["time_of_day"],
+            "repeat": _coerce_repeat(item.get("repeat")),
+            "enabled": bool(item.get("enabled", True)),
+        }
+        rid = item.get("reminder_id")
+        reminder = by_id.get(_as_uuid(rid)) if rid else by_slot.get((fields["habit_name"], fields["time_of_day"]))
+        if rid and reminder is None:
+            raise ReminderNotFoundError(f"Reminder not found for user {user_id}: {rid}")
+        if reminder is None:
+            reminder = Reminder(user_id=owner, user=user, **fields)
+            _refresh_next_fire_at(db, reminder, now)
+            db.add(reminder)
+            created += 1
+            changed.append(reminder)
+        else:
+            seen.add(reminder.reminder_id)
+            if any(getattr(reminder, k) != v for k, v in fields.items()):
+                reschedule = any(getattr(reminder, k) != fields[k] for k in ("time_of_day", "repeat", "enabled"))
+                for k, v in fields.items():
+                    setattr(reminder, k, v)
+                if reschedule:
+                    _refresh_next_fire_at(db, reminder, now)
+                updated += 1
+                changed.append(reminder)
+
+    removed = [r for r in existing if r.reminder_id not in seen] if replace else []
+    for reminder in removed:
+        db.delete(reminder)
+
+    try:
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.exception("Database error upserting %d reminders for user=%s: %s", len(items), user_id, e)
+        raise
+
+    invalidate_user_reminders(owner)
+    for reminder in changed:
+        _notify_scheduler(reminder)
+    for reminder in removed:
+        _notify_scheduler(deleted_id=reminder.reminder_id)
+    logger.info("Upserted reminders for user=%s: created=%d updated=%d deleted=%d",
+                user_id, created, updated, len(removed))
+    return {
+        "created": created,
+        "updated": updated,
+        "deleted": len(removed),
+        "unchanged": len(items) - created - updated,
+        "reminders": list_user_reminders_cached(db, owner),
+    }
+
+
 def get_due_reminders(db: Session, current_time: datetime) -> List[Reminder]:
     """
-    Return reminders that should trigger at the provided current_time.
+    Return enabled reminders whose next_fire_at is at or before current_time.
 
-    The logic:
-    - Matches reminders with enabled == True and time_of_day == HH:MM of current_time.
-    - Returns all such reminders. If your model stores next_run or one-off flags,
-      additional logic should be added to handle one-time reminders (e.g., disable them after firing).
+    This is a range scan on the partial (enabled) next_fire_at index, so a
+    poll that runs late still returns everything missed since the last one.
+    Owners are loaded in the same query for their timezone. Call
+    advance_due_reminders() after delivering them.
 
-    Returns a list of Reminder objects.
+    Returns a list of Reminder objects ordered by next_fire_at.
     """
-    time_str = current_time.strftime("%H:%M")
-    logger.debug("get_due_reminders called for time=%s", time_str)
-    reminders = db.query(Reminder).filter(Reminder.enabled == True, Reminder.time_of_day == time_str).all()
-    logger.info("Found %d due reminders for time=%s", len(reminders), time_str)
-    return reminders
\ No newline at end of file
+    current_time = as_utc(current_time)
+    reminders = (
+        db.query(Reminder)
+        .options(joinedload(Reminder.user))
+        .filter(Reminder.enabled == True, Reminder.next_fire_at <= current_time)  # noqa: E712
+        .order_by(Reminder.next_fire_at)
+        .all()
+    )
+    logger.info("Found %d due reminders at %s", len(reminders), current_time.isoformat())
+    return reminders
+
+
+def mark_fired(db: Session, next_fire_by_id: Dict[Any, datetime], fired_at: datetime) -> int:
+    """
+    Set last_triggered=fired_at and each reminder's new next_fire_at with a
+    single UPDATE ... SET next_fire_at = CASE reminder_id ... END statement.
+    Commits and returns the number of rows updated.
+    """
+    if not next_fire_by_id:
+        return 0
+    whens = {uuid.UUID(str(rid)): fire_at for rid, fire_at in next_fire_by_id.items()}
+    stmt = (
+        update(Reminder)
+        .where(Reminder.reminder_id.in_(list(whens)))
+        .values(
+            last_triggered=fired_at,
+            next_fire_at=case(whens, value=Reminder.reminder_id, else_=Reminder.next_fire_at),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    try:
+        result = db.execute(stmt)
+        db.commit()
+        return result.rowcount
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.exception("Database error advancing %d reminders: %s", len(whens), e)
+        raise
+
+
+def advance_due_reminders(db: Session, reminders: List[Reminder], current_time: datetime) -> int:
+    """
+    Move each fired reminder to its first fire time after current_time.
+    Missed windows collapse into the single delivery that just happened.
+    """
+    current_time = as_utc(current_time)
+    next_fire_by_id = {}
+    for r in reminders:
+        tz_name = r.user.timezone if r.user is not None else None
+        after = max(current_time, as_utc(r.next_fire_at) or current_time)
+        next_fire_by_id[r.reminder_id] = compute_next_fire(
+            r.time_of_day, r.repeat, tz_name, after, as_utc(r.created_at)
+        )
+    return mark_fired(db, next_fire_by_id, current_time)
+
+
+def backfill_next_fire_at(db: Session, current_time: Optional[datetime] = None) -> int:
+    """
+    Compute next_fire_at for enabled reminders that predate the column.
+    Returns the number of reminders updated.
+    """
+    current_time = as_utc(current_time) or datetime.now(timezone.utc)
+    missing = (
+        db.query(Reminder)
+        .options(joinedload(Reminder.user))
+        .filter(Reminder.enabled == True, Reminder.next_fire_at.is_(None))  # noqa: E712
+        .all()
+    )
+    for reminder in missing:
+        _refresh_next_fire_at(db, reminder, current_time)
+    if missing:
+        db.commit()
+        logger.info("Backfilled next_fire_at for %d reminders", len(missing))
+    return len(missing)
@@ -0,0 +1,180 @@
+import logging
+import uuid
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import String, case, delete, func, insert, select, type_coerce
+
+from app.models import DailyHabitEntry, SensorSummary, User, UserDailyRollup
+
+# rollup_service.py
+"""
+Daily per-user rollups (user_daily_rollups).
+
+Responsibilities implemented:
+- refresh_rollups(db, start, end, user_ids=None): rebuild rollups for a date
+  range from two GROUP BY queries (habit entries, sensor summaries) and one
+  bulk INSERT
+- shard_bounds(db, shard_size): user id boundaries for parallel jobs
+- iter_user_batches(db, batch_size, after, until): keyset pagination over user ids
+- load_rollup_matrix(db, user_ids, start, end): dense users x days NumPy
+  arrays per metric, the input of the badge rule engine
+"""
+
+logger = logging.getLogger(__name__)
+
+METRICS = ("entries_total", "entries_done", "total_steps", "active_minutes", "minutes_asleep")
+# Habit counts are zero on days without entries; sensor metrics are unknown (NaN)
+_ZERO_FILLED = ("entries_total", "entries_done")
+
+
+def _as_uuid(value: Any) -> Optional[uuid.UUID]:
+    if isinstance(value, uuid.UUID):
+        return value
+    try:
+        return uuid.UUID(str(value))
+    except (ValueError, TypeError):
+        return None
+
+
+def refresh_rollups(db: Any, start: date, end: date, user_ids: Optional[Sequence[Any]] = None) -> int:
+    """
+    Recompute rollups for start..end (inclusive), optionally only for
+    user_ids. Replaces existing rows in the range in one transaction and
+    returns the number of rollup rows written.
+    """
+    owners = [_as_uuid(u) for u in user_ids] if user_ids is not None else None
+
+    done = case((func.lower(DailyHabitEntry.status) == "done", 1), else_=0)
+    habit_q = (
+        select(DailyHabitEntry.user_id, DailyHabitEntry.date,
+               func.count().label("entries_total"), func.sum(done).label("entries_done"))
+        .where(DailyHabitEntry.date >= start, DailyHabitEntry.date <= end)
+        .group_by(DailyHabitEntry.user_id, DailyHabitEntry.date)
+    )
+    if owners is not None:
+        habit_q = habit_q.where(DailyHabitEntry.user_id.in_(owners))
+
+    rows: Dict[Tuple[uuid.UUID, date], Dict[str, Any]] = {}
+    for user_id, day, total, n_done in db.execute(habit_q):
+        rows[(user_id, day)] = {"user_id": user_id, "date": day, "entries_total": int(total),
+                                "entries_done": int(n_done or 0), "total_steps": None,
+                                "active_minutes": None, "minutes_asleep": None}
+
+    sensor_q = (
+        select(
+            SensorSummary.user_id, SensorSummary.date,
+            func.sum(SensorSummary.total_steps),
+            func.sum(SensorSummary.very_active_minutes + SensorSummary.fairly_active_minutes
+                     + SensorSummary.lightly_active_minutes),
+            func.sum(SensorSummary.minutes_asleep),
+        )
+        .where(SensorSummary.date >= start, SensorSummary.date <= end)
+        .group_by(SensorSummary.user_id, SensorSummary.date)
+    )
+    if owners is not None:
+        # sensor_summaries.user_id is declared Integer but holds the user id as text (hex or dashed);
+        # compare as text, without a CAST, so the user_id index still applies
+        spellings = [form for u in owners if u is not None for form in (u.hex, str(u))]
+        sensor_q = sensor_q.where(type_coerce(SensorSummary.user_id, String).in_(spellings))
+    for raw_user, day, steps, active, asleep in db.execute(sensor_q):
+        user_id = _as_uuid(raw_user)
+        if user_id is None:
+            continue
+        row = rows.setdefault((user_id, day), {"user_id": user_id, "date": day,
+                                               "entries_total": 0, "entries_done": 0})
+        row.update(total_steps=steps, active_minutes=active, minutes_asleep=asleep)
+
+    clear = delete(UserDailyRollup).where(UserDailyRollup.date >= start, UserDailyRollup.date <= end)
+    if owners is not None:
+        clear = clear.where(UserDailyRollup.user_id.in_(owners))
+    try:
+        db.execute(clear)
+        if rows:
+            db.execute(insert(UserDailyRollup), list(rows.values()))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    logger.info("Refreshed %d rollup rows for %s..%s", len(rows), start, end)
+    return len(rows)
+
+
+def shard_bounds(db: Any, shard_size: int) -> List[Optional[uuid.UUID]]:
+    """
+    Last user id of every shard_size-th user, in order: shard i covers
+    (bounds[i-1], bounds[i]]. Reads one id per shard (an OFFSET seek on the
+    primary key), not every id.
+    """
+    bounds: List[Optional[uuid.UUID]] = []
+    last = None
+    while True:
+        q = select(User.user_id).order_by(User.user_id).offset(shard_size - 1).limit(1)
+        if last is not None:
+            q = q.where(User.user_id > last)
+        last = db.execute(q).scalar()
+        if last is None:
+            return bounds
+        bounds.append(last)
+
+
+def iter_user_batches(
+    db: Any, batch_size: int = 1000, after: Optional[Any] = None, until: Optional[Any] = None
+) -> Iterator[List[uuid.UUID]]:
+    """
+    Yield user ids in ascending order, batch_size at a time (keyset
+    pagination), optionally only those in the range (after, until].
+    """
+    last = _as_uuid(after) if after is not None else None
+    upper = _as_uuid(until) if until is not None else None
+    while True:
+        q = select(User.user_id).order_by(User.user_id).limit(batch_size)
+        if last is not None:
+            q = q.where(User.user_id > last)
+        if upper is not None:
+            q = q.where(User.user_id <= upper)
+        batch = list(db.execute(q).scalars())
+        if not batch:
+            return
+        yield batch
+        last = batch[-1]
+
+
+@dataclass
+class RollupMatrix:
+    """Dense users x days view of the rollups; row i is user_ids[i], column j is start + j days."""
+
+    user_ids: List[uuid.UUID]
+    start: date
+    days: int
+    metrics: Dict[str, np.ndarray]
+
+    @property
+    def dates(self) -> List[date]:
+        return [self.start + timedelta(days=j) for j in range(self.days)]
+
+
+def load_rollup_matrix(db: Any, user_ids: Sequence[Any], start: date, end: date) -> RollupMatrix:
+    """Load the rollups of user_ids for start..end into one array per metric (one query)."""
+    owners = [_as_uuid(u) for u in user_ids]
+    days = (end - start).days + 1
+    index = {u: i for i, u in enumerate(owners)}
+    metrics = {
+        m: np.zeros((len(owners), days)) if m in _ZERO_FILLED else np.full((len(owners), days), np.nan)
+        for m in METRICS
+    }
+    q = select(UserDailyRollup.user_id, UserDailyRollup.date, *(getattr(UserDailyRollup, m) for m in METRICS)).where(
+        UserDailyRollup.user_id.in_(owners), UserDailyRollup.date >= start, UserDailyRollup.date <= end
+    )
+    rows = db.execute(q).all()
+    if rows:
+        r = np.fromiter((index[row[0]] for row in rows), dtype=np.int64, count=len(rows))
+        c = np.fromiter(((row[1] - start).days for row in rows), dtype=np.int64, count=len(rows))
+        values = np.array([row[2:] for row in rows], dtype=float)  # None -> nan
+        for k, m in enumerate(METRICS):
+            metrics[m][r, c] = values[:, k]
+        for m in _ZERO_FILLED:
+            np.nan_to_num(metrics[m], copy=False, nan=0.0)
+    return RollupMatrix(user_ids=owners, start=start, days=days, metrics=metrics)
@@ -18,12 +18,19 @@ class NotFoundError(Exception):
 
 def _normalize_uuid_for_column(user_id: Union[str, uuid.UUID]) -> Union[str, uuid.UUID]:
     """
-    Normalize a uuid.UUID to string when the User.user_id column is a string type.
+    Normalize a uuid.UUID to string when the User.user_id column is a string type,
+    and a string to uuid.UUID when it is a UUID type.
     This helps comparisons to work regardless of whether the DB column stores UUID natively.
     """
     col_type = User.__table__.c.user_id.type
-    if isinstance(col_type, SAString) and isinstance(user_id, uuid.UUID):
-        return str(user_id)
+    if isinstance(col_type, SAString):
+        return str(user_id) if isinstance(user_id, uuid.UUID) else user_id
+    # UUID columns (as_uuid=True) only bind uuid.UUID values
+    if isinstance(user_id, str):
+        try:
+            return uuid.UUID(user_id)
+        except ValueError:
+            raise NotFoundError(f"User with id={user_id} not found")
     return user_id
 
 
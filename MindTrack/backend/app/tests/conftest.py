@@ -0,0 +1,65 @@
+import os
+
+# Keep the app's startup init_db() away from the checked-in ./mindtrack.db
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+# Tests run job workers explicitly against the per-test database
+os.environ.setdefault("JOB_WORKER_IN_PROCESS", "false")
+# No leader election or nightly runner thread in the test app
+os.environ.setdefault("NIGHTLY_JOBS_ENABLED", "false")
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.db.database import Base
+import app.models  # noqa: F401  (register every model on Base.metadata)
+
+
+@pytest.fixture
+def db_engine():
+    """In-memory SQLite engine shared by every session of one test."""
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session_factory(db_engine):
+    return sessionmaker(bind=db_engine, autocommit=False, autoflush=False)
+
+
+@pytest.fixture
+def db_session(session_factory):
+    db = session_factory()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def api_client(session_factory):
+    """TestClient whose get_db dependency uses the per-test in-memory database."""
+    from fastapi.testclient import TestClient
+
+    from app.db.database import get_db
+    from app.main import create_app
+
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = create_app()
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        with TestClient(app) as client:
+            yield client
+    finally:
+        app.dependency_overrides.pop(get_db, None)
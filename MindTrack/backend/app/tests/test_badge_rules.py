@@ -0,0 +1,132 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy import insert
+
+from app.db import instrumentation
+from app.models import DailyHabitEntry, SensorSummary, User
+from app.models.habit_entry import HabitStatus
+from app.services import badge_rules, badge_service, rollup_service
+from app.services.badge_rules import BadgeRule
+
+AS_OF = date(2025, 3, 31)
+
+
+@pytest.fixture
+def users(db_session):
+    users = [User(name=name, timezone="UTC", preferences={}) for name in ("Ana", "Ben", "Cy")]
+    db_session.add_all(users)
+    db_session.commit()
+    return users
+
+
+def _entries(db, user, days, per_day, done_per_day):
+    for offset in range(days):
+        day = AS_OF - timedelta(days=offset)
+        for k in range(per_day):
+            status = HabitStatus.DONE if k < done_per_day else HabitStatus.MISSED
+            db.add(DailyHabitEntry(user_id=user.user_id, habit_name=f"H{k}", date=day, status=status))
+    db.commit()
+
+
+def _steps(db, user, days, steps):
+    # sensor_summaries.user_id is loosely typed; rows carry the user's uuid string
+    db.execute(insert(SensorSummary), [
+        {"user_id": str(user.user_id), "date": AS_OF - timedelta(days=offset), "total_steps": steps,
+         "minutes_asleep": 480}
+        for offset in range(days)
+    ])
+    db.commit()
+
+
+def test_rules_award_from_rollups_once(db_session, users):
+    ana, ben, cy = users
+    _entries(db_session, ana, days=31, per_day=3, done_per_day=3)  # busy week + consistent month
+    _entries(db_session, ben, days=31, per_day=2, done_per_day=1)  # 50% completion, 14 per week
+    _steps(db_session, ben, days=7, steps=12000)
+    _steps(db_session, cy, days=6, steps=15000)  # one day short of the steps streak
+
+    rows = rollup_service.refresh_rollups(db_session, AS_OF - timedelta(days=61), AS_OF)
+    assert rows == 31 + 31 + 6
+
+    stats = badge_rules.evaluate_rules(db_session, as_of=AS_OF, batch_size=2)
+    assert stats["users"] == 3
+    assert stats["by_rule"] == {"Busy Week": 1, "Consistent Month": 1, "10K Steps Week": 1, "Well Rested": 2}
+
+    names = lambda u: sorted(b["name"] for b in badge_service.get_user_badges(db_session, u.user_id))  # noqa: E731
+    assert names(ana) == ["Busy Week", "Consistent Month"]
+    assert names(ben) == ["10K Steps Week", "Well Rested"]
+    assert names(cy) == ["Well Rested"]
+
+    # Nightly re-runs are idempotent
+    assert badge_rules.evaluate_rules(db_session, as_of=AS_OF)["awarded"] == 0
+
+
+def test_refresh_rollups_replaces_range(db_session, users):
+    ana = users[0]
+    _entries(db_session, ana, days=2, per_day=2, done_per_day=1)
+    rollup_service.refresh_rollups(db_session, AS_OF - timedelta(days=1), AS_OF)
+    _entries(db_session, ana, days=1, per_day=1, done_per_day=1)  # a third entry today (H0 again)
+    rollup_service.refresh_rollups(db_session, AS_OF, AS_OF, user_ids=[ana.user_id])
+
+    matrix = rollup_service.load_rollup_matrix(db_session, [ana.user_id], AS_OF - timedelta(days=1), AS_OF)
+    assert matrix.metrics["entries_total"].tolist() == [[2, 3]]
+    assert matrix.metrics["entries_done"].tolist() == [[1, 2]]
+    assert np.isnan(matrix.metrics["total_steps"]).all()
+
+
+def test_refresh_rollups_filters_sensor_rows_in_sql(db_engine, db_session, users):
+    ana, ben, cy = users
+    _steps(db_session, ana, days=2, steps=9000)
+    _steps(db_session, ben, days=2, steps=12000)
+    db_session.execute(insert(SensorSummary), [{"user_id": cy.user_id.hex, "date": AS_OF, "total_steps": 7000}])
+    db_session.commit()
+
+    statements = []
+    listener = lambda statement, parameters, elapsed, conn: statements.append((statement, parameters))  # noqa: E731
+    instrumentation.install(db_engine)
+    instrumentation.add_listener(listener)
+    try:
+        rollup_service.refresh_rollups(db_session, AS_OF - timedelta(days=1), AS_OF, user_ids=[ana.user_id, cy.user_id])
+    finally:
+        instrumentation.remove_listener(listener)
+
+    sensor_sql = [(s, p) for s, p in statements if "FROM sensor_summaries" in s]
+    assert len(sensor_sql) == 1
+    statement, parameters = sensor_sql[0]
+    assert "sensor_summaries.user_id IN" in statement and "CAST" not in statement
+    assert str(ben.user_id) not in parameters and ben.user_id.hex not in parameters
+    # Both stored spellings of an id match
+    matrix = rollup_service.load_rollup_matrix(db_session, [ana.user_id, cy.user_id], AS_OF - timedelta(days=1), AS_OF)
+    assert np.nan_to_num(matrix.metrics["total_steps"]).tolist() == [[9000, 9000], [0, 7000]]
+
+
+def test_monthly_completion_counts_only_whole_ended_months(db_session, users):
+    ana, ben, _ = users
+    consistent = [r for r in badge_rules.DEFAULT_RULES if r.name == "Consistent Month"]
+    mid_march = date(2025, 3, 15)
+
+    def log(user, first, last):
+        for offset in range((last - first).days + 1):
+            for k in range(3):
+                db_session.add(DailyHabitEntry(user_id=user.user_id, habit_name=f"H{k}",
+                                               date=first + timedelta(days=offset), status=HabitStatus.DONE))
+        db_session.commit()
+
+    log(ana, date(2025, 3, 1), mid_march)  # 45 done entries, but March is still running
+    log(ben, date(2025, 1, 13), date(2025, 1, 31))  # January, cut by the window start
+    rollup_service.refresh_rollups(db_session, date(2025, 1, 1), AS_OF)
+
+    assert badge_rules.evaluate_rules(db_session, consistent, as_of=mid_march)["awarded"] == 0
+    # Once March has ended, the same entries earn it
+    stats = badge_rules.evaluate_rules(db_session, consistent, as_of=AS_OF)
+    assert stats["awarded"] == 1
+    assert [b["name"] for b in badge_service.get_user_badges(db_session, ana.user_id)] == ["Consistent Month"]
+
+
+def test_unknown_rule_kind_is_rejected():
+    with pytest.raises(ValueError):
+        badge_rules.compile_rules([BadgeRule("Odd", "", "weekly_magic")])
+    with pytest.raises(ValueError):
+        badge_rules.compile_rules([BadgeRule("Odd", "", "metric_streak", metric="heart_rate")])
@@ -0,0 +1,128 @@
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app.models import DailyHabitEntry, Job, User
+from app.models.habit_entry import HabitStatus
+from app.services import badge_service, habit_service, job_queue
+
+
+@pytest.fixture
+def user(db_session):
+    user = User(name="Erin", timezone="UTC", preferences={})
+    db_session.add(user)
+    db_session.commit()
+    return user
+
+
+def _log_days(db, user, habit_name, days, end=date(2025, 1, 20), status=HabitStatus.DONE):
+    for offset in range(days):
+        db.add(DailyHabitEntry(user_id=user.user_id, habit_name=habit_name,
+                               date=end - timedelta(days=offset), status=status))
+    db.commit()
+
+
+def test_streak_badges_use_constant_queries(db_session, db_engine, user):
+    _log_days(db_session, user, "Water", 8)
+    _log_days(db_session, user, "Read", 3)
+    _log_days(db_session, user, "Walk", 20, status=HabitStatus.MISSED)
+
+    user_id = str(user.user_id)
+    statements = []
+    listener = lambda conn, cur, stmt, *a: statements.append(stmt.split()[0].upper())  # noqa: E731
+    event.listen(db_engine, "before_cursor_execute", listener)
+    try:
+        awarded = badge_service.check_and_award_streak_badges(db_session, user_id)
+    finally:
+        event.remove(db_engine, "before_cursor_execute", listener)
+
+    assert sorted(b["name"] for b in awarded) == ["3-Day Streak", "7-Day Streak"]
+    assert statements == ["SELECT", "SELECT", "INSERT"]
+
+    # Already held: nothing new, no insert
+    assert badge_service.check_and_award_streak_badges(db_session, str(user.user_id)) == []
+    assert len(badge_service.get_user_badges(db_session, user.user_id)) == 2
+
+
+def test_unique_index_rejects_duplicate_names(db_session, user):
+    badge_service.award_custom_badge(db_session, str(user.user_id), "Early Bird", "Up before 6")
+    with pytest.raises(ValueError):
+        badge_service.award_custom_badge(db_session, str(user.user_id), "Early Bird", "again")
+
+    # A caller that skipped the existence check still cannot duplicate
+    awarded = badge_service.award_badges(db_session, user.user_id, [{"name": "Early Bird"}, {"name": "Night Owl"}])
+    assert [b["name"] for b in awarded] == ["Night Owl"]
+    assert sorted(b["name"] for b in badge_service.get_user_badges(db_session, user.user_id)) == ["Early Bird", "Night Owl"]
+
+
+def _held(db, user):
+    return sorted(b["name"] for b in badge_service.get_user_badges(db, user.user_id))
+
+
+def test_habit_write_awards_crossed_milestones(api_client, user):
+    user_id = str(user.user_id)
+    names = []
+    for day in ("2025-01-01", "2025-01-02", "2025-01-03", "2025-01-03"):
+        resp = api_client.post("/habits/", json={"user_id": user_id, "habit_name": "Water",
+                                                 "entry_date": day, "status": "done"})
+        assert resp.status_code == 201, resp.text
+        names.append([b["name"] for b in resp.json()["awarded_badges"]])
+    # Third day crosses 3; re-saving the same day changes nothing
+    assert names == [[], [], ["3-Day Streak"], []]
+
+
+def test_bulk_write_awards_once_and_queues_one_rollup_job(api_client, session_factory, db_session, user):
+    from app.jobs import handlers  # noqa: F401  (register handlers)
+    from app.services import rollup_service
+
+    entries = [{"habit_name": "Read", "entry_date": f"2025-02-{d:02d}", "status": "done"} for d in range(1, 8)]
+    entries.append({"habit_name": "Walk", "entry_date": "2025-02-07", "status": "missed"})
+    resp = api_client.post("/habits/bulk", json={"user_id": str(user.user_id), "entries": entries})
+    assert resp.status_code == 201, resp.text
+    body = resp.json()
+    assert body["count"] == 8
+    assert sorted(b["name"] for b in body["awarded_badges"]) == ["3-Day Streak", "7-Day Streak"]
+
+    worker = job_queue.JobWorker(session_factory)
+    assert worker.run_once() == 1
+    matrix = rollup_service.load_rollup_matrix(db_session, [user.user_id], date(2025, 2, 1), date(2025, 2, 7))
+    assert matrix.metrics["entries_done"].tolist() == [[1, 1, 1, 1, 1, 1, 1]]
+    assert matrix.metrics["entries_total"][0, -1] == 2
+
+    # Breaking the streak and re-marking the day does not re-award
+    flip = [{"habit_name": "Read", "entry_date": "2025-02-07", "status": "missed"}]
+    assert api_client.post("/habits/bulk", json={"user_id": str(user.user_id), "entries": flip}).json()["awarded_badges"] == []
+    flip[0]["status"] = "done"
+    assert api_client.post("/habits/bulk", json={"user_id": str(user.user_id), "entries": flip}).json()["awarded_badges"] == []
+    assert worker.run_once() == 2 and worker.failed == 0
+    assert _held(db_session, user) == ["3-Day Streak", "7-Day Streak"]
+
+
+def test_habit_write_fails_when_follow_up_cannot_be_queued(api_client, db_session, user, monkeypatch):
+    def broken(*args, **kwargs):
+        raise RuntimeError("jobs table unavailable")
+
+    monkeypatch.setattr(job_queue, "enqueue", broken)
+    resp = api_client.post("/habits/", json={"user_id": str(user.user_id), "habit_name": "Water",
+                                             "entry_date": "2025-01-01", "status": "done"})
+    assert resp.status_code == 400
+    assert db_session.query(DailyHabitEntry).count() == 0
+
+
+def test_habit_update_fails_and_rolls_back_when_job_insert_fails(db_session, db_engine, user):
+    _log_days(db_session, user, "Water", 1)
+    entry = db_session.query(DailyHabitEntry).one()
+    Job.__table__.drop(db_engine)
+
+    with pytest.raises(Exception):
+        habit_service.create_habit_entry(db_session, {"user_id": user.user_id, "habit_name": "Water",
+                                                      "date": entry.date, "status": "missed",
+                                                      "notes": "changed"})
+    with pytest.raises(Exception):
+        habit_service.update_habit_entry(db_session, entry.entry_id, {"notes": "changed"})
+
+    # The session is usable again and the entry kept its old values
+    db_session.expire_all()
+    stored = db_session.query(DailyHabitEntry).one()
+    assert stored.status == HabitStatus.DONE and stored.notes is None
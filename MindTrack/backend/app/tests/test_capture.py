@@ -0,0 +1,74 @@
+import json
+import uuid
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.observability import capture
+
+
+def test_redaction_keeps_shape_but_no_personal_data():
+    redactor = capture.Redactor(salt=b"k")
+    user_id = uuid.uuid4()
+    body = {"user_id": str(user_id), "habit_name": "Call mom", "entry_date": "2025-01-02",
+            "status": "done", "notes": "felt awful", "mood": 2.0, "preferences": {"voice": "female"}}
+
+    out = redactor.value(None, body)
+
+    assert "Call mom" not in json.dumps(out) and "felt awful" not in json.dumps(out)
+    assert out["user_id"] == redactor.pseudonym(user_id.hex) != str(user_id)
+    assert capture.is_uuid(out["user_id"])
+    assert out["habit_name"] == redactor.habit("Call mom")
+    assert (out["entry_date"], out["status"], out["mood"]) == ("2025-01-02", "done", 2.0)
+    assert out["notes"] == "<redacted:10>"
+    assert out["preferences"] == {"voice": "<redacted:6>"}
+    assert redactor.path(f"/habits/user/{user_id}") == f"/habits/user/{out['user_id']}"
+    assert redactor.query("days=30&q=secret") == [("days", "30"), ("q", "<redacted:6>")]
+    assert capture.Redactor(salt=b"other").pseudonym(str(user_id)) != out["user_id"]
+
+
+def test_middleware_writes_sampled_requests(tmp_path):
+    app = FastAPI()
+
+    @app.post("/habits/")
+    def create(payload: dict):
+        return payload
+
+    @app.get("/health")
+    def health():
+        return {}
+
+    writer = capture.CaptureWriter(str(tmp_path)).start()
+    app.add_middleware(capture.CaptureMiddleware, sample_rate=1.0, writer=writer, redactor=capture.Redactor(b"k"))
+    client = TestClient(app)
+    try:
+        assert client.post("/habits/?days=7", json={"habit_name": "Read", "notes": "private"}).status_code == 200
+        client.get("/health")
+        writer.flush()
+    finally:
+        writer.stop()
+
+    records = list(capture.read_captures([str(tmp_path)]))
+    assert len(records) == 1
+    record = records[0]
+    assert (record["method"], record["path"], record["route"], record["status"]) == ("POST", "/habits/", "/habits/", 200)
+    assert record["query"] == [["days", "7"]]
+    assert record["body"]["notes"] == "<redacted:7>"
+    assert record["body"]["habit_name"].startswith("habit-")
+    assert record["duration_ms"] > 0
+
+
+def test_writer_rotates_and_keeps_newest_files(tmp_path):
+    writer = capture.CaptureWriter(str(tmp_path), max_bytes=200, max_files=2).start()
+    try:
+        for i in range(20):
+            writer.submit({"ts": float(i), "path": "/x" * 20})
+        writer.flush()
+    finally:
+        writer.stop()
+
+    assert writer.files > 2
+    files = capture.capture_files(str(tmp_path))
+    assert len(files) == 2
+    timestamps = [r["ts"] for r in capture.read_captures([str(tmp_path)])]
+    assert timestamps and timestamps[-1] == 19.0
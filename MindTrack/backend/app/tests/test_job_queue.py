@@ -0,0 +1,88 @@
+from datetime import timedelta
+
+import pytest
+
+from app.models import Job
+from app.services import job_queue
+
+
+@pytest.fixture
+def calls():
+    calls = []
+
+    @job_queue.handler("test.record")
+    def record(db, payload):
+        calls.append(payload["n"])
+
+    @job_queue.handler("test.flaky")
+    def flaky(db, payload):
+        calls.append("flaky")
+        if len(calls) < payload["fail_times"] + 1:
+            raise RuntimeError("boom")
+
+    return calls
+
+
+def _enqueue(db, kind, payload, **kwargs):
+    job = job_queue.enqueue(db, kind, payload, **kwargs)
+    db.commit()
+    return job.id
+
+
+def test_enqueue_is_part_of_the_callers_transaction(db_session, session_factory, calls):
+    job_queue.enqueue(db_session, "test.record", {"n": 1})
+    db_session.rollback()
+    assert job_queue.JobWorker(session_factory).run_once() == 0
+    assert calls == []
+
+
+def test_claims_are_exclusive_and_fifo(db_session, session_factory, calls):
+    for n in range(3):
+        _enqueue(db_session, "test.record", {"n": n})
+    a, b = session_factory(), session_factory()
+    first = job_queue.claim(a, limit=2)
+    second = job_queue.claim(b, limit=2)
+    assert [j.payload["n"] for j in first] == [0, 1]
+    assert [j.payload["n"] for j in second] == [2]
+    assert job_queue.claim(b, limit=2) == []
+    a.close()
+    b.close()
+
+
+def test_failed_job_retries_with_backoff_then_succeeds(db_session, session_factory, calls):
+    job_id = _enqueue(db_session, "test.flaky", {"fail_times": 1}, max_attempts=3)
+    worker = job_queue.JobWorker(session_factory, backoff=60)
+    worker.run_once()
+    job = db_session.get(Job, job_id)
+    assert (job.status, job.attempts) == ("queued", 1)
+    assert "boom" in job.last_error
+    # Backoff: not due yet
+    assert worker.run_once() == 0
+
+    later = job_queue._utcnow() + timedelta(seconds=61)
+    retry = job_queue.claim(db_session, now=later)
+    assert [j.id for j in retry] == [job_id]
+    assert job_queue.run_job(db_session, retry[0])
+    db_session.expire_all()
+    assert db_session.get(Job, job_id).status == "done"
+    assert job_queue.stats(db_session)["done"] == 1
+
+
+def test_expired_lock_is_redelivered(db_session, calls):
+    job_id = _enqueue(db_session, "test.record", {"n": 7})
+    crashed = job_queue.claim(db_session, lease_seconds=30)
+    assert [j.id for j in crashed] == [job_id]
+    assert job_queue.claim(db_session) == []  # still locked
+
+    later = job_queue._utcnow() + timedelta(seconds=31)
+    redelivered = job_queue.claim(db_session, now=later)
+    assert [(j.id, j.attempts) for j in redelivered] == [(job_id, 2)]
+    assert job_queue.run_job(db_session, redelivered[0])
+    assert calls == [7]
+
+
+def test_gives_up_after_max_attempts(db_session, session_factory, calls):
+    job_id = _enqueue(db_session, "test.flaky", {"fail_times": 5}, max_attempts=1)
+    job_queue.JobWorker(session_factory).run_once()
+    job = db_session.get(Job, job_id)
+    assert job.status == "failed" and job.attempts == 1
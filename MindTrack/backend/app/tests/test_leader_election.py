@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta, timezone
+
+from app.services.leader_election import DatabaseLeaseBackend, FileLockBackend, LeaderElector
+
+
+def test_database_lease_single_holder_and_expiry(session_factory):
+    now = [datetime(2025, 1, 10, 8, 0, tzinfo=timezone.utc)]
+    clock = lambda: now[0]  # noqa: E731
+    a = DatabaseLeaseBackend(holder="a", ttl=15, session_factory=session_factory, clock=clock)
+    b = DatabaseLeaseBackend(holder="b", ttl=15, session_factory=session_factory, clock=clock)
+
+    assert a.try_acquire() is True
+    assert b.try_acquire() is False
+    now[0] += timedelta(seconds=10)
+    assert a.try_acquire() is True   # renewal pushes expiry to 08:00:25
+    now[0] += timedelta(seconds=10)
+    assert b.try_acquire() is False
+
+    # a dies without releasing: b takes over once the lease lapses
+    now[0] += timedelta(seconds=6)
+    assert b.try_acquire() is True
+    assert a.try_acquire() is False
+
+    b.release()
+    assert a.try_acquire() is True
+
+
+def test_file_lock_is_exclusive_until_released(tmp_path):
+    path = str(tmp_path / "scheduler.lock")
+    first, second = FileLockBackend(path), FileLockBackend(path)
+    assert first.try_acquire() is True
+    assert second.try_acquire() is False
+    first.release()
+    assert second.try_acquire() is True
+    second.release()
+
+
+def test_elector_starts_and_stops_jobs_on_transitions(tmp_path):
+    events = []
+    backend = FileLockBackend(str(tmp_path / "scheduler.lock"))
+    rival = FileLockBackend(backend.path)
+    elector = LeaderElector(backend, lambda: events.append("elected"), lambda: events.append("demoted"))
+
+    assert rival.try_acquire()
+    assert elector.step() is False
+    rival.release()
+    assert elector.step() is True
+    assert elector.step() is True    # renewal does not re-run on_elected
+    elector.stop()
+    assert events == ["elected", "demoted"]
+    assert rival.try_acquire() is True
+    rival.release()
+
+
+def test_leader_starts_only_the_enabled_jobs(monkeypatch):
+    from app import main
+    from app.services import nightly_jobs, reminder_delivery, reminder_scheduler
+
+    monkeypatch.setenv("REMINDER_SCHEDULER_ENABLED", "false")
+    monkeypatch.setenv("NIGHTLY_JOBS_ENABLED", "true")
+    main.start_periodic_jobs()
+    try:
+        assert nightly_jobs._runner is not None
+        assert reminder_scheduler.get_scheduler() is None
+        assert reminder_delivery.get_pipeline() is None
+    finally:
+        main.stop_periodic_jobs()
+    assert nightly_jobs._runner is None
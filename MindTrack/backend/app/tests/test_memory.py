@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from app.observability import memory
+
+
+def test_deep_sizeof_counts_shared_buffers_once():
+    arr = np.zeros(100_000)
+    single = memory.deep_sizeof({"a": arr})
+    shared = memory.deep_sizeof({"a": arr, "b": arr, "view": arr[:10]})
+    assert single >= arr.nbytes
+    assert shared < single + arr.nbytes
+
+
+def test_snapshot_diff_reports_growth():
+    memory.start(frames=5)
+    try:
+        base = memory.take_snapshot()
+        retained = [bytearray(1024) for _ in range(2000)]  # noqa: F841
+        current = memory.take_snapshot()
+
+        top = memory.top(current, limit=5)
+        assert top["total_bytes"] > 2_000_000
+        diff = memory.diff(base, current, limit=5)
+        assert diff["top"][0]["size_diff_bytes"] > 2_000_000
+        assert any(__file__ in site for site in diff["top"][0]["site"])
+        with pytest.raises(KeyError):
+            memory.top(9999)
+    finally:
+        memory.stop()
+    with pytest.raises(RuntimeError):
+        memory.take_snapshot()
+
+
+def test_admin_memory_endpoints(api_client, monkeypatch):
+    monkeypatch.setenv("MINDTRACK_ADMIN_TOKEN", "secret")
+    headers = {"X-Admin-Token": "secret"}
+    assert api_client.get("/admin/memory").status_code == 403
+
+    report = api_client.get("/admin/memory", headers=headers).json()
+    assert {"rss_bytes", "ml_pipeline", "forest_flat_cache", "reminder_listing_cache", "db_pool"} <= report.keys()
+
+    assert api_client.post("/admin/memory/snapshots", headers=headers).status_code == 409
+    try:
+        assert api_client.post("/admin/memory/tracemalloc/start", headers=headers).json()["tracing"]
+        first = api_client.post("/admin/memory/snapshots", headers=headers).json()["id"]
+        second = api_client.post("/admin/memory/snapshots", headers=headers).json()["id"]
+        assert api_client.get(f"/admin/memory/snapshots/{first}/top?limit=3", headers=headers).status_code == 200
+        diff = api_client.get(f"/admin/memory/diff?base={first}&current={second}", headers=headers)
+        assert diff.status_code == 200 and "top" in diff.json()
+        assert api_client.get("/admin/memory/snapshots/9999/top", headers=headers).status_code == 404
+    finally:
+        api_client.post("/admin/memory/tracemalloc/stop", headers=headers)
@@ -0,0 +1,68 @@
+import threading
+
+from app.models import User
+from app.observability import metrics
+
+
+def test_counter_and_histogram_merge_thread_shards():
+    counter = metrics.Counter("t_events_total", "Events.", ("kind",))
+    hist = metrics.Histogram("t_latency_seconds", "Latency.", buckets=(0.1, 1.0))
+
+    def work():
+        for _ in range(1000):
+            counter.inc(kind="a")
+        hist.observe(0.05)
+        hist.observe(0.5)
+        hist.observe(5)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert counter.values() == {("a",): 4000}
+    lines = hist.collect()
+    assert 't_latency_seconds_bucket{le="0.1"} 4' in lines
+    assert 't_latency_seconds_bucket{le="1"} 8' in lines
+    assert 't_latency_seconds_bucket{le="+Inf"} 12' in lines
+    assert "t_latency_seconds_count 12" in lines
+    assert counter.collect()[1] == "# TYPE t_events_total counter"
+
+
+def test_exited_threads_fold_their_shards_into_the_total():
+    counter = metrics.Counter("t_jobs_total", "Jobs.")
+    hist = metrics.Histogram("t_wait_seconds", "Wait.", buckets=(1.0,))
+    counter.inc()
+    hist.observe(0.5)
+
+    for _ in range(50):
+        t = threading.Thread(target=lambda: (counter.inc(2), hist.observe(2.0)))
+        t.start()
+        t.join()
+
+    # Only the live (main) thread keeps a shard
+    assert len(counter._shards) == 1 and len(hist._shards) == 1
+    assert counter.values() == {(): 101}
+    assert hist.values() == {(): [1, 50, 100.5]}
+    counter.inc()
+    assert counter.values() == {(): 102}
+
+
+def test_metrics_endpoint_reports_routes(api_client, db_session):
+    user = User(name="Ana", timezone="UTC", preferences={})
+    db_session.add(user)
+    db_session.commit()
+    assert api_client.get(f"/habits/user/{user.user_id}").status_code == 200
+    api_client.get("/no/such/page")
+
+    resp = api_client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = resp.text
+    assert 'http_requests_total{method="GET",route="/habits/user/{user_id}",status="200"}' in body
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/habits/user/{user_id}",le="+Inf"}' in body
+    assert 'http_request_db_queries_count{method="GET",route="/habits/user/{user_id}"}' in body
+    assert 'route="<unmatched>",status="404"' in body
+    assert "# TYPE db_pool_connections gauge" in body
+    assert str(user.user_id) not in body
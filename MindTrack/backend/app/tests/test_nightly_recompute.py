@@ -0,0 +1,105 @@
+import json
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app.db.database import Base
+from app.jobs import nightly_recompute
+from app.models import Badge, DailyHabitEntry, User, UserDailyRollup
+from app.models.habit_entry import HabitStatus
+
+AS_OF = date(2025, 3, 31)
+
+
+def _seed(db, n_users, streak_days=7):
+    users = [User(name=f"u{i}", timezone="UTC", preferences={}) for i in range(n_users)]
+    db.add_all(users)
+    db.flush()
+    for user in users:
+        for offset in range(streak_days):
+            db.add(DailyHabitEntry(user_id=user.user_id, habit_name="Water",
+                                   date=AS_OF - timedelta(days=offset), status=HabitStatus.DONE))
+    db.commit()
+    return users
+
+
+def _count(db, model):
+    return db.execute(select(func.count()).select_from(model)).scalar()
+
+
+def test_recompute_resumes_from_checkpoint(db_session, session_factory, tmp_path, monkeypatch):
+    _seed(db_session, 7)
+    checkpoint = str(tmp_path / "recompute.json")
+    kwargs = dict(as_of=AS_OF, days=7, shard_size=2, batch_size=2, checkpoint=checkpoint,
+                  session_factory=session_factory)
+
+    real = nightly_recompute.process_shard
+    def flaky(shard, params, factory=None):
+        if shard["index"] == 2:
+            raise KeyboardInterrupt
+        return real(shard, params, factory)
+    monkeypatch.setattr(nightly_recompute, "process_shard", flaky)
+    with pytest.raises(KeyboardInterrupt):
+        nightly_recompute.run(**kwargs)
+    with open(checkpoint) as fh:
+        assert sorted(json.load(fh)["done"]) == ["0", "1"]
+
+    monkeypatch.setattr(nightly_recompute, "process_shard", real)
+    report = nightly_recompute.run(**kwargs)
+    assert report["shards"] == 4  # 2+2+2 users and an open-ended tail shard
+    assert report["shards_skipped"] == 2
+    assert report["users"] == 7 and report["users_this_run"] == 3
+    assert report["rollup_rows"] == 7 * 7
+    # 3- and 7-day streak badges for everyone
+    assert report["streak_badges"] == 14
+    assert _count(db_session, Badge) == 14
+
+    with pytest.raises(ValueError):
+        nightly_recompute.run(**{**kwargs, "days": 30})
+
+
+def test_recompute_process_pool(tmp_path):
+    url = f"sqlite:///{tmp_path / 'recompute.db'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    _seed(db, 5, streak_days=3)
+
+    report = nightly_recompute.run(as_of=AS_OF, days=7, shard_size=2, batch_size=2, workers=2,
+                                   database_url=url)
+    assert report["users"] == 5
+    assert _count(db, UserDailyRollup) == 15
+    assert _count(db, Badge) == 5
+    assert report["users_per_s"] > 0
+    db.close()
+    engine.dispose()
+
+
+def test_recompute_resume_keeps_checkpoint_as_of(db_session, session_factory, tmp_path, monkeypatch):
+    _seed(db_session, 3)
+    checkpoint = str(tmp_path / "recompute.json")
+    kwargs = dict(days=7, shard_size=2, batch_size=2, checkpoint=checkpoint, session_factory=session_factory)
+    monkeypatch.setattr(nightly_recompute, "_utcnow",
+                        lambda: datetime(2025, 4, 1, 23, 59, tzinfo=timezone.utc))
+
+    real = nightly_recompute.process_shard
+    def flaky(shard, params, factory=None):
+        if shard["index"] == 1:
+            raise KeyboardInterrupt
+        return real(shard, params, factory)
+    monkeypatch.setattr(nightly_recompute, "process_shard", flaky)
+    with pytest.raises(KeyboardInterrupt):
+        nightly_recompute.run(**kwargs)
+
+    # Resumed after midnight: the default as_of would now be April 1st
+    monkeypatch.setattr(nightly_recompute, "_utcnow",
+                        lambda: datetime(2025, 4, 2, 0, 5, tzinfo=timezone.utc))
+    monkeypatch.setattr(nightly_recompute, "process_shard", real)
+    report = nightly_recompute.run(**kwargs)
+    assert report["params"]["as_of"] == AS_OF.isoformat()
+    assert report["shards_skipped"] == 1
+
+    with pytest.raises(ValueError, match="--as-of"):
+        nightly_recompute.run(**{**kwargs, "as_of": AS_OF + timedelta(days=1)})
@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from app.main import create_app
+from app.routers import ml_predictions
+from app.services import drift_service, forest_service
+
+FEATURES = [
+    "TotalSteps", "VeryActiveMinutes", "FairlyActiveMinutes", "LightlyActiveMinutes",
+    "SedentaryMinutes", "Calories", "total_active_minutes", "avg_steps_7d",
+    "prev_day_sleep", "is_weekend",
+]
+
+SAMPLE_REQUEST = {
+    "total_steps": 10198,
+    "very_active_minutes": 17,
+    "fairly_active_minutes": 20,
+    "lightly_active_minutes": 195,
+    "sedentary_minutes": 1208,
+    "calories": 1755,
+    "avg_steps_7d": 12157.0,
+    "prev_day_sleep": 480.0,
+    "is_weekend": 0,
+}
+
+
+def _synthetic_frame(n: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(rng.uniform(0, 1000, size=(n, len(FEATURES))), columns=FEATURES)
+    df["is_weekend"] = rng.integers(0, 2, size=n)
+    return df
+
+
+@pytest.fixture(scope="module")
+def pipeline():
+    """Small pipeline shaped like data/pipeline.pkl, fitted on synthetic data."""
+    X = _synthetic_frame(300)
+    y = 300 + 0.2 * X["TotalSteps"] - 0.1 * X["SedentaryMinutes"] + np.random.default_rng(1).normal(0, 20, 300)
+    numeric = Pipeline(steps=[("imputer", SimpleImputer(strategy="median")), ("scaler", StandardScaler())])
+    pre = ColumnTransformer(transformers=[("num", numeric, FEATURES)], remainder="drop")
+    rf = RandomForestRegressor(n_estimators=15, max_depth=6, random_state=42)
+    pipe = Pipeline(steps=[("preprocessor", pre), ("model", rf)])
+    return pipe.fit(X, y)
+
+
+def test_per_tree_matrix_matches_estimators(pipeline):
+    X = _synthetic_frame(25, seed=7)
+    matrix = forest_service.per_tree_predictions(pipeline, X)
+    assert matrix.shape == (25, 15)
+
+    X_trans = pipeline[:-1].transform(X)
+    expected = np.column_stack([est.predict(X_trans) for est in pipeline.named_steps["model"].estimators_])
+    np.testing.assert_allclose(matrix, expected)
+    np.testing.assert_allclose(matrix.mean(axis=1), pipeline.predict(X))
+
+
+def test_prediction_intervals_bracket_median(pipeline):
+    matrix = forest_service.per_tree_predictions(pipeline, _synthetic_frame(5, seed=3))
+    intervals = forest_service.prediction_intervals(matrix, 0.8)
+    assert len(intervals) == 5
+    for band in intervals:
+        assert band["level"] == 0.8
+        assert band["lower"] <= band["median"] <= band["upper"]
+
+
+@pytest.fixture
+def client(pipeline, monkeypatch):
+    monkeypatch.setattr(ml_predictions, "ml_pipeline", pipeline)
+    with TestClient(create_app()) as tc:
+        yield tc
+
+
+def test_predict_sleep_interval_is_optional(client):
+    plain = client.post("/predictions/sleep", json=SAMPLE_REQUEST)
+    assert plain.status_code == 200, plain.text
+    assert "prediction_interval" not in plain.json()
+
+    with_band = client.post("/predictions/sleep", params={"interval": 0.9}, json=SAMPLE_REQUEST)
+    assert with_band.status_code == 200, with_band.text
+    body = with_band.json()
+    assert body["prediction_interval"]["level"] == 0.9
+    assert abs(body["predicted_sleep_minutes"] - plain.json()["predicted_sleep_minutes"]) <= 1
+
+
+def test_predict_sleep_batch(client):
+    items = [SAMPLE_REQUEST, {**SAMPLE_REQUEST, "total_steps": 2000, "sedentary_minutes": 1300}]
+    resp = client.post("/predictions/sleep/batch", params={"interval": 0.8}, json={"items": items})
+    assert resp.status_code == 200, resp.text
+    body = resp.json()
+    assert body["count"] == 2
+    assert all("prediction_interval" in p for p in body["predictions"])
+
+    resp = client.post("/predictions/sleep/batch", params={"interval": 1.5}, json={"items": items})
+    assert resp.status_code == 422
+
+
+def test_drift_report_counts_live_inputs(client):
+    monitor = drift_service.get_monitor(ml_predictions.PIPELINE_PATH)
+    if monitor is None:
+        pytest.skip("no drift reference next to the pipeline artifact")
+    monitor.reset()
+
+    for _ in range(3):
+        assert client.post("/predictions/sleep", json=SAMPLE_REQUEST).status_code == 200
+    report = client.get("/predictions/drift", params={"min_samples": 2}).json()
+    assert report["samples"] == 3
+    assert report["features"]["TotalSteps"]["live_mean"] == SAMPLE_REQUEST["total_steps"]
+    assert report["status"] in ("stable", "moderate", "significant")
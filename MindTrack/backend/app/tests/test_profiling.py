@@ -0,0 +1,119 @@
+import asyncio
+import time
+from collections import Counter
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import httpx
+
+from app.observability import profiling
+
+
+def test_ring_keeps_newest_profiles(tmp_path):
+    ids = [profiling.save_profile(Counter({"main;work": i + 1}), {"path": f"/p{i}"}, str(tmp_path), ring_size=3)
+           for i in range(5)]
+    stored = profiling.list_profiles(str(tmp_path))
+    assert [p["id"] for p in stored] == ids[:1:-1]
+    assert "stacks" not in stored[0]
+    assert profiling.load_profile(ids[0], str(tmp_path)) is None
+    assert profiling.to_folded(profiling.load_profile(ids[-1], str(tmp_path))) == "main;work 5\n"
+    assert profiling.load_profile("../etc/passwd", str(tmp_path)) is None
+
+
+def test_middleware_profiles_only_admin_requests(tmp_path, monkeypatch):
+    monkeypatch.setenv("MINDTRACK_ADMIN_TOKEN", "secret")
+    app = FastAPI()
+
+    def busy_wait():
+        end = time.perf_counter() + 0.05
+        while time.perf_counter() < end:
+            pass
+
+    @app.get("/slow")
+    def slow():
+        busy_wait()
+        return {"ok": True}
+
+    app.add_middleware(profiling.ProfilingMiddleware, directory=str(tmp_path))
+    client = TestClient(app)
+
+    assert "x-profile-id" not in client.get("/slow").headers
+    assert "x-profile-id" not in client.get("/slow", headers={"X-Profile": "1", "X-Admin-Token": "nope"}).headers
+    resp = client.get("/slow", headers={"X-Profile": "1", "X-Admin-Token": "secret"})
+    assert resp.status_code == 200
+
+    profile = profiling.load_profile(resp.headers["x-profile-id"], str(tmp_path))
+    assert profile["route"] == "/slow" and profile["status"] == 200
+    assert any("busy_wait" in stack for stack in profile["stacks"])
+
+
+def test_profile_excludes_concurrent_requests(tmp_path, monkeypatch):
+    monkeypatch.setenv("MINDTRACK_ADMIN_TOKEN", "secret")
+    app = FastAPI()
+
+    async def spin(seconds):
+        # Busy in 10ms slices, yielding in between so the requests interleave on the loop
+        for _ in range(int(seconds / 0.01)):
+            end = time.perf_counter() + 0.01
+            while time.perf_counter() < end:
+                pass
+            await asyncio.sleep(0)
+
+    async def spin_profiled():
+        await spin(0.15)
+
+    async def spin_other():
+        await spin(0.15)
+
+    def block_other():
+        end = time.perf_counter() + 0.15
+        while time.perf_counter() < end:
+            pass
+
+    @app.get("/profiled")
+    async def profiled():
+        await spin_profiled()
+        return {}
+
+    @app.get("/other")
+    async def other():
+        await spin_other()
+        return {}
+
+    @app.get("/blocking")
+    def blocking():
+        block_other()
+        return {}
+
+    app.add_middleware(profiling.ProfilingMiddleware, directory=str(tmp_path))
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://t") as client:
+            return await asyncio.gather(
+                client.get("/profiled", headers={"X-Profile": "1", "X-Admin-Token": "secret"}),
+                client.get("/other"), client.get("/blocking"))
+
+    resp = asyncio.run(run())[0]
+    profile = profiling.load_profile(resp.headers["x-profile-id"], str(tmp_path))
+    stacks = "\n".join(profile["stacks"])
+    assert "spin_profiled" in stacks
+    # The shared event loop and threadpool were busy with other requests too
+    assert "spin_other" not in stacks and "block_other" not in stacks
+    assert profile["shared_samples"] > 0
+
+
+def test_admin_profile_endpoints_are_gated(api_client, tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    profile_id = profiling.save_profile(Counter({"a;b": 2}), {"path": "/x"})
+
+    monkeypatch.delenv("MINDTRACK_ADMIN_TOKEN", raising=False)
+    assert api_client.get("/admin/profiles").status_code == 404
+    monkeypatch.setenv("MINDTRACK_ADMIN_TOKEN", "secret")
+    assert api_client.get("/admin/profiles", headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+    headers = {"X-Admin-Token": "secret"}
+    listing = api_client.get("/admin/profiles", headers=headers).json()
+    assert [p["id"] for p in listing["profiles"]] == [profile_id]
+    assert api_client.get(f"/admin/profiles/{profile_id}", headers=headers).text == "a;b 2\n"
+    assert api_client.get(f"/admin/profiles/{profile_id}?format=json", headers=headers).json()["path"] == "/x"
+    assert api_client.get("/admin/profiles/missing", headers=headers).status_code == 404
@@ -0,0 +1,152 @@
+"""
+Query-plan and query-count regression tests.
+
+The hot queries below must keep using their index (checked with EXPLAIN
+QUERY PLAN on a seeded, ANALYZEd database), and each endpoint must stay
+within its statement budget whatever the amount of data, so a dropped index
+or a reintroduced N+1 fails here before it shows up as a p99 spike.
+"""
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import text
+
+from app.db import instrumentation, slow_query
+from app.models import Badge, DailyHabitEntry, Reminder, User
+from app.models.habit_entry import HabitStatus
+from app.models.reminder import RepeatEnum
+from app.services import badge_service, habit_service, reminder_service
+
+TODAY = date(2025, 3, 31)
+
+# (method, route) -> max SQL statements per request
+QUERY_BUDGETS = {
+    ("POST", "/habits/"): 5,  # includes the done-dates read for inline streak badges
+    ("POST", "/habits/bulk"): 4,
+    ("GET", "/habits/user/{user_id}"): 1,
+    ("GET", "/insights/user/{user_id}"): 4,
+    ("GET", "/badges/user/{user_id}"): 1,
+    ("POST", "/badges/award-check/{user_id}"): 3,
+    ("GET", "/reminders/user/{user_id}"): 1,
+}
+
+
+def _seed_user(db, habits: int, days: int = 30) -> User:
+    user = User(name=f"user-{habits}", timezone="UTC", preferences={})
+    db.add(user)
+    db.flush()
+    db.add_all(
+        DailyHabitEntry(user_id=user.user_id, habit_name=f"habit-{h}", date=TODAY - timedelta(days=d),
+                        status=HabitStatus.DONE if d % 5 else HabitStatus.MISSED, timestamp=datetime(2025, 1, 1))
+        for h in range(habits) for d in range(days)
+    )
+    db.add_all(Badge(user_id=user.user_id, name=f"Badge {i}", description="") for i in range(3))
+    db.add_all(
+        Reminder(user_id=user.user_id, habit_name=f"habit-{h}", time_of_day="08:00", repeat=RepeatEnum.DAILY,
+                 enabled=h % 2 == 0,
+                 next_fire_at=datetime(2025, 4, 1, 8, tzinfo=timezone.utc) + timedelta(hours=h))
+        for h in range(habits)
+    )
+    return user
+
+
+@pytest.fixture
+def seeded(db_engine, db_session):
+    users = [_seed_user(db_session, habits=1 + i % 8) for i in range(40)]
+    db_session.commit()
+    with db_engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    instrumentation.install(db_engine)
+    return users
+
+
+@pytest.fixture
+def plans(db_engine):
+    """Collect (statement, EXPLAIN QUERY PLAN lines) of every SELECT run while the fixture is active."""
+    captured = []
+
+    def listener(statement, parameters, elapsed, conn):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append((" ".join(statement.split()), slow_query.explain(conn, statement, parameters)))
+
+    instrumentation.add_listener(listener)
+    yield captured
+    instrumentation.remove_listener(listener)
+
+
+def _assert_indexed(captured, table: str, index: str):
+    relevant = []
+    for sql, plan in captured:
+        lines = [line for line in plan if f" {table} " in f" {line} "]
+        # Primary-key lookups (refresh after a write) always hit the key's index
+        if f"FROM {table}" in sql and not any("sqlite_autoindex" in line for line in lines):
+            relevant.append((sql, plan, lines))
+    assert relevant, f"no query on {table} was captured"
+    for sql, plan, lines in relevant:
+        assert slow_query.full_scans(plan) == [], f"full scan: {sql}\n{plan}"
+        assert any(index in line for line in lines), f"{index} not used: {sql}\n{plan}"
+
+
+def test_upsert_lookup_uses_user_habit_date_index(seeded, db_session, plans):
+    habit_service.create_habit_entry(db_session, {"user_id": seeded[3].user_id, "habit_name": "habit-0",
+                                                  "date": TODAY, "status": "done"})
+    _assert_indexed(plans, "habit_entries", "ix_habit_entries_user_habit_date")
+
+
+def test_streak_fetch_uses_user_habit_date_index(seeded, db_session, plans):
+    habit_service.compute_streaks(db_session, seeded[5].user_id, "habit-1")
+    habit_service.compute_all_streaks(db_session, seeded[5].user_id, ["habit-0", "habit-1"])
+    _assert_indexed(plans, "habit_entries", "ix_habit_entries_user_habit_date")
+
+
+def test_completion_window_uses_user_date_index(seeded, db_session, plans):
+    habit_service.compute_completion_rate(db_session, seeded[7].user_id, TODAY - timedelta(days=7), TODAY)
+    habit_service.get_user_habits(db_session, seeded[7].user_id, TODAY - timedelta(days=7), TODAY)
+    _assert_indexed(plans, "habit_entries", "ix_habit_entries_user_date")
+
+
+def test_badge_existence_uses_unique_index(seeded, db_session, plans):
+    assert badge_service.badge_exists(db_session, seeded[2].user_id, "Badge 1")
+    badge_service.get_badge_names(db_session, seeded[2].user_id)
+    _assert_indexed(plans, "badges", "ux_badges_user_id_name")
+
+
+def test_due_reminders_use_partial_index(seeded, db_session, plans):
+    due = reminder_service.get_due_reminders(db_session, datetime(2025, 4, 1, 10, tzinfo=timezone.utc))
+    assert due and all(r.enabled for r in due)
+    _assert_indexed(plans, "reminders", "ix_reminders_enabled_next_fire_at")
+
+
+def _endpoint_counts(api_client, user_id: str, habits: int):
+    entries = [{"habit_name": f"habit-{h}", "entry_date": (TODAY - timedelta(days=d)).isoformat(), "status": "done"}
+               for h in range(habits) for d in range(5)]
+    calls = [
+        ("POST", "/habits/bulk", "/habits/bulk", {"user_id": user_id, "entries": entries}),
+        ("POST", "/habits/", "/habits/", {"user_id": user_id, "habit_name": "habit-0",
+                                          "entry_date": TODAY.isoformat(), "status": "done"}),
+        ("GET", "/habits/user/{user_id}", f"/habits/user/{user_id}", None),
+        ("GET", "/insights/user/{user_id}", f"/insights/user/{user_id}", None),
+        ("GET", "/badges/user/{user_id}", f"/badges/user/{user_id}", None),
+        ("POST", "/badges/award-check/{user_id}", f"/badges/award-check/{user_id}", None),
+        ("GET", "/reminders/user/{user_id}", f"/reminders/user/{user_id}", None),
+    ]
+    counts = {}
+    for method, route, url, body in calls:
+        resp = api_client.request(method, url, json=body)
+        assert resp.status_code < 300, (route, resp.text)
+        counts[(method, route)] = int(resp.headers["x-db-query-count"])
+    return counts
+
+
+def test_endpoint_query_budgets_do_not_grow_with_data(api_client, seeded, monkeypatch):
+    monkeypatch.setenv("SQL_DEBUG_HEADERS", "true")
+    small = next(u for u in seeded if len({r.habit_name for r in u.reminders}) == 1)
+    large = next(u for u in seeded if len({r.habit_name for r in u.reminders}) == 8)
+
+    small_counts = _endpoint_counts(api_client, str(small.user_id), habits=1)
+    large_counts = _endpoint_counts(api_client, str(large.user_id), habits=8)
+
+    assert small_counts.keys() == QUERY_BUDGETS.keys()
+    for key, budget in QUERY_BUDGETS.items():
+        assert large_counts[key] <= budget, f"{key} ran {large_counts[key]} statements (budget {budget})"
+        assert large_counts[key] == small_counts[key], f"{key} query count grows with data"
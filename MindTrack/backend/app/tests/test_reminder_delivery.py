@@ -0,0 +1,76 @@
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.services.reminder_delivery import DeliveryPipeline, FileSink, group_digests
+from app.services.reminder_scheduler import ScheduledReminder
+
+UTC = timezone.utc
+DUE = datetime(2025, 1, 10, 8, 0, tzinfo=UTC)
+
+
+def _due(user_id, habit, at=DUE):
+    return ScheduledReminder(reminder_id=f"{user_id}-{habit}", user_id=user_id, habit_name=habit,
+                             time_of_day=at.strftime("%H:%M"), repeat="daily", timezone="UTC",
+                             created_at=None, next_fire_at=at)
+
+
+def test_group_digests_per_user_and_minute():
+    digests = group_digests([
+        _due("u1", "Water"), _due("u1", "Walk", DUE + timedelta(seconds=20)), _due("u2", "Read"),
+        _due("u1", "Sleep", DUE + timedelta(hours=12)),
+    ])
+    by_user = sorted((d.user_id, len(d.items)) for d in digests)
+    assert by_user == [("u1", 1), ("u1", 2), ("u2", 1)]
+
+
+class FlakySink:
+    def __init__(self, failures):
+        self.failures = failures
+        self.sent = []
+
+    def send(self, notification):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("sink down")
+        self.sent.append(notification)
+
+
+def test_pipeline_retries_and_reports_lag():
+    sink = FlakySink(failures=2)
+    pipeline = DeliveryPipeline(sink=sink, workers=2, retry_backoff=0, max_attempts=3,
+                                clock=lambda: DUE + timedelta(seconds=3), sleep=lambda s: None)
+    pipeline.start()
+    assert pipeline.submit([_due("u1", "Water"), _due("u1", "Walk"), _due("u2", "Read")]) == []
+    pipeline.drain()
+    pipeline.stop()
+
+    stats = pipeline.stats()
+    assert len(sink.sent) == 2
+    assert stats["delivered"] == 2 and stats["reminders_delivered"] == 3
+    assert stats["retried"] == 2 and stats["failed"] == 0
+    assert stats["lag_s"]["max"] == 3.0
+
+
+def test_full_queue_applies_backpressure_then_drops(tmp_path):
+    path = tmp_path / "reminders.jsonl"
+    pipeline = DeliveryPipeline(sink=FileSink(str(path)), max_queue=1, put_timeout=0.01)
+    # Workers not started: the first digest fills the queue, the second is dropped
+    assert pipeline.submit([_due("u1", "Water"), _due("u2", "Read")]) == ["u2-Read"]
+    assert pipeline.stats()["dropped"] == 1 and pipeline.stats()["enqueued"] == 1
+
+    pipeline.start()
+    pipeline.drain()
+    pipeline.stop()
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert lines == [{"user_id": "u1", "due_at": DUE.isoformat(),
+                      "items": [{"reminder_id": "u1-Water", "habit_name": "Water", "time_of_day": "08:00"}]}]
+
+
+def test_backpressure_wait_is_bounded_per_submit():
+    pipeline = DeliveryPipeline(max_queue=1, put_timeout=0.2)
+    started = time.monotonic()
+    dropped = pipeline.submit([_due(f"u{i}", "Water") for i in range(6)])
+    # One shared deadline, not put_timeout per dropped digest (which would be 1s)
+    assert time.monotonic() - started < 0.6
+    assert sorted(dropped) == [f"u{i}-Water" for i in range(1, 6)]
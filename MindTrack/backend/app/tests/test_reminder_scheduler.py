@@ -0,0 +1,229 @@
+from datetime import datetime, timezone
+
+from app.models import Reminder, User
+from app.models.reminder import RepeatEnum
+from app.services.reminder_scheduler import ReminderScheduler
+from app.services.reminder_service import compute_next_fire
+
+UTC = timezone.utc
+
+
+def test_compute_next_fire_daily_uses_user_timezone():
+    # 08:00 in Kolkata (UTC+5:30) is 02:30 UTC
+    after = datetime(2025, 1, 10, 1, 0, tzinfo=UTC)
+    assert compute_next_fire("08:00", RepeatEnum.DAILY, "Asia/Kolkata", after) == datetime(2025, 1, 10, 2, 30, tzinfo=UTC)
+
+    after = datetime(2025, 1, 10, 3, 0, tzinfo=UTC)
+    assert compute_next_fire("08:00", RepeatEnum.DAILY, "Asia/Kolkata", after) == datetime(2025, 1, 11, 2, 30, tzinfo=UTC)
+
+
+def test_compute_next_fire_weekly_and_unknown_timezone():
+    anchor = datetime(2025, 1, 6, 12, 0, tzinfo=UTC)  # a Monday
+    after = datetime(2025, 1, 8, 12, 0, tzinfo=UTC)   # Wednesday
+    assert compute_next_fire("09:15", "weekly", None, after, anchor) == datetime(2025, 1, 13, 9, 15, tzinfo=UTC)
+    assert compute_next_fire("09:15", "daily", "Not/AZone", after) == datetime(2025, 1, 9, 9, 15, tzinfo=UTC)
+
+
+def _naive_utc(value):
+    # SQLite hands DateTime(timezone=True) values back naive
+    return value.astimezone(UTC).replace(tzinfo=None) if value.tzinfo else value
+
+
+def _add_reminder(db, user, time_of_day, enabled=True):
+    reminder = Reminder(user_id=user.user_id, habit_name=f"habit {time_of_day}", time_of_day=time_of_day,
+                        repeat=RepeatEnum.DAILY, enabled=enabled)
+    db.add(reminder)
+    db.commit()
+    return reminder
+
+
+def test_scheduler_fires_only_due_reminders(db_session, session_factory):
+    user = User(name="Alice", timezone="UTC", preferences={})
+    db_session.add(user)
+    db_session.commit()
+    early = _add_reminder(db_session, user, "08:00")
+    _add_reminder(db_session, user, "20:00")
+    _add_reminder(db_session, user, "09:00", enabled=False)
+
+    now = [datetime(2025, 1, 10, 7, 0, tzinfo=UTC)]
+    dispatched = []
+    scheduler = ReminderScheduler(session_factory=session_factory, dispatch=dispatched.extend, clock=lambda: now[0])
+    assert scheduler.load() == 2
+    assert scheduler.next_fire_at() == datetime(2025, 1, 10, 8, 0, tzinfo=UTC)
+
+    assert scheduler.run_pending(datetime(2025, 1, 10, 7, 59, tzinfo=UTC)) == []
+    fired = scheduler.run_pending(datetime(2025, 1, 10, 8, 0, 30, tzinfo=UTC))
+    assert [f.habit_name for f in fired] == ["habit 08:00"]
+    assert dispatched == fired
+    # Re-queued for tomorrow; the evening reminder is now at the head
+    assert scheduler.next_fire_at() == datetime(2025, 1, 10, 20, 0, tzinfo=UTC)
+
+    db_session.expire_all()
+    assert db_session.get(Reminder, early.reminder_id).last_triggered is not None
+
+
+def test_scheduler_applies_crud_changes_incrementally(session_factory):
+    now = datetime(2025, 1, 10, 7, 0, tzinfo=UTC)
+    scheduler = ReminderScheduler(session_factory=session_factory, dispatch=lambda due: None, clock=lambda: now)
+    rid = "7f1c2c5e-0c1b-4f43-9b4e-4a4de3a3f001"
+
+    scheduler.schedule(rid, "u1", "Walk", "10:00", "daily", "UTC")
+    scheduler.schedule(rid, "u1", "Walk", "07:30", "daily", "UTC")  # edited: earlier time replaces old entry
+    assert len(scheduler) == 1
+    assert scheduler.next_fire_at() == datetime(2025, 1, 10, 7, 30, tzinfo=UTC)
+
+    scheduler.unschedule(rid.replace("-", ""))  # hex form of the same id
+    assert scheduler.next_fire_at() is None
+    assert scheduler.run_pending(datetime(2025, 1, 11, tzinfo=UTC)) == []
+
+
+def test_scheduler_reenabled_reminder_ignores_its_old_heap_entry(db_session, session_factory):
+    user = User(name="Alice", timezone="UTC", preferences={})
+    db_session.add(user)
+    db_session.commit()
+    reminder = _add_reminder(db_session, user, "07:30")
+    reminder.next_fire_at = datetime(2025, 1, 10, 7, 30)
+    db_session.commit()
+
+    now = datetime(2025, 1, 10, 7, 0, tzinfo=UTC)
+    scheduler = ReminderScheduler(session_factory=session_factory, dispatch=lambda due: None, clock=lambda: now)
+    rid = reminder.reminder_id
+    scheduler.schedule(rid, user.user_id, "Walk", "10:00", "daily", "UTC")
+    scheduler.schedule(rid, user.user_id, "Walk", "10:00", "daily", "UTC", enabled=False)
+    scheduler.schedule(rid, user.user_id, "Walk", "07:30", "daily", "UTC")
+
+    assert len(scheduler.run_pending(datetime(2025, 1, 10, 7, 31, tzinfo=UTC))) == 1
+    # The tuple pushed for 10:00 before the disable must not match the re-enabled entry
+    assert scheduler.run_pending(datetime(2025, 1, 10, 10, 1, tzinfo=UTC)) == []
+    assert len(scheduler) == 1
+    assert scheduler.next_fire_at() == datetime(2025, 1, 11, 7, 30, tzinfo=UTC)
+
+
+def test_scheduler_keeps_undelivered_reminders_due(db_session, session_factory):
+    user = User(name="Alice", timezone="UTC", preferences={})
+    db_session.add(user)
+    db_session.commit()
+    kept = _add_reminder(db_session, user, "08:00")
+    dropped = _add_reminder(db_session, user, "08:00")
+
+    now = datetime(2025, 1, 10, 7, 0, tzinfo=UTC)
+    reject = [str(dropped.reminder_id)]
+    calls = []
+
+    def dispatch(due):
+        calls.append([e.reminder_id for e in due])
+        return reject
+
+    scheduler = ReminderScheduler(session_factory=session_factory, dispatch=dispatch, clock=lambda: now)
+    scheduler.load()
+    fired = scheduler.run_pending(datetime(2025, 1, 10, 8, 0, 30, tzinfo=UTC))
+    assert [f.habit_name for f in fired] == ["habit 08:00"] and fired[0].reminder_id == str(kept.reminder_id)
+
+    db_session.expire_all()
+    assert db_session.get(Reminder, dropped.reminder_id).last_triggered is None
+    assert _naive_utc(db_session.get(Reminder, dropped.reminder_id).next_fire_at) == datetime(2025, 1, 10, 8, 0)
+    assert db_session.get(Reminder, kept.reminder_id).last_triggered is not None
+
+    # Churn that compacts the heap keeps the retry time
+    for i in range(70):
+        scheduler.schedule(f"churn-{i}", user.user_id, "churn", "09:00", RepeatEnum.DAILY, "UTC")
+        scheduler.unschedule(f"churn-{i}")
+    assert len(scheduler._heap) < 64
+    # So does a rename pushed by reminder_service
+    scheduler.schedule(dropped.reminder_id, user.user_id, "renamed", "08:00", RepeatEnum.DAILY, "UTC",
+                       next_fire_at=datetime(2025, 1, 10, 8, 0, tzinfo=UTC))
+
+    # Retried after RETRY_SECONDS, then advanced once accepted
+    assert scheduler.run_pending(datetime(2025, 1, 10, 8, 0, 40, tzinfo=UTC)) == []
+    reject.clear()
+    retried = scheduler.run_pending(datetime(2025, 1, 10, 8, 1, 5, tzinfo=UTC))
+    assert [f.reminder_id for f in retried] == [str(dropped.reminder_id)]
+    assert len(calls) == 2
+    db_session.expire_all()
+    assert _naive_utc(db_session.get(Reminder, dropped.reminder_id).next_fire_at) == datetime(2025, 1, 11, 8, 0)
+
+
+def test_due_query_catches_missed_windows_and_advances_in_one_update(db_session):
+    from sqlalchemy import event, text
+
+    from app.services import reminder_service
+
+    user = User(name="Bob", timezone="UTC", preferences={})
+    db_session.add(user)
+    db_session.commit()
+    created = datetime(2025, 1, 10, 6, 0, tzinfo=UTC)
+    for time_of_day in ("08:00", "09:00", "20:00"):
+        reminder = _add_reminder(db_session, user, time_of_day)
+        reminder.next_fire_at = compute_next_fire(time_of_day, RepeatEnum.DAILY, "UTC", created)
+    db_session.commit()
+
+    # The poller was down from 07:00 until 10:30: both morning windows are still due
+    now = datetime(2025, 1, 10, 10, 30, tzinfo=UTC)
+    due = reminder_service.get_due_reminders(db_session, now)
+    assert [r.time_of_day for r in due] == ["08:00", "09:00"]
+
+    statements = []
+    engine = db_session.get_bind()
+    listener = lambda conn, cursor, stmt, *args: statements.append(stmt)  # noqa: E731
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        assert reminder_service.advance_due_reminders(db_session, due, now) == 2
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    assert sum(stmt.lstrip().upper().startswith("UPDATE") for stmt in statements) == 1
+
+    db_session.expire_all()
+    assert reminder_service.get_due_reminders(db_session, now) == []
+    tomorrow = [_naive_utc(r.next_fire_at) for r in db_session.query(Reminder).order_by(Reminder.time_of_day)]
+    assert tomorrow[:2] == [datetime(2025, 1, 11, 8, 0), datetime(2025, 1, 11, 9, 0)]
+
+    plan = db_session.execute(
+        text("EXPLAIN QUERY PLAN SELECT reminder_id FROM reminders WHERE enabled = 1 AND next_fire_at <= :now"),
+        {"now": now},
+    ).fetchall()
+    assert any("ix_reminders_enabled_next_fire_at" in row[-1] for row in plan)
+
+
+def test_scheduler_picks_up_writes_from_other_workers(db_session, session_factory):
+    user = User(name="Dana", timezone="UTC", preferences={})
+    db_session.add(user)
+    db_session.commit()
+    morning = _add_reminder(db_session, user, "08:00")
+
+    now = [datetime(2025, 1, 10, 7, 0, tzinfo=UTC)]
+    scheduler = ReminderScheduler(session_factory=session_factory, dispatch=lambda due: None, clock=lambda: now[0])
+    scheduler.load()
+
+    # Another worker disables the loaded reminder and adds a new one; no notification reaches us
+    morning.enabled = False
+    late = _add_reminder(db_session, user, "07:30")
+    late.next_fire_at = datetime(2025, 1, 10, 7, 30, tzinfo=UTC)
+    db_session.commit()
+
+    assert scheduler.sync_upcoming() == 0  # 07:30 is beyond the look-ahead window at 07:00
+    now[0] = datetime(2025, 1, 10, 7, 29, 30, tzinfo=UTC)
+    assert scheduler.sync_upcoming() == 1
+    fired = scheduler.run_pending(datetime(2025, 1, 10, 8, 1, tzinfo=UTC))
+    assert [f.habit_name for f in fired] == ["habit 07:30"]
+    assert len(scheduler) == 1
+
+
+def test_rename_keeps_a_due_occurrence(db_session):
+    from app.services import reminder_service
+
+    user = User(name="Cleo", timezone="UTC", preferences={})
+    db_session.add(user)
+    db_session.commit()
+    reminder = _add_reminder(db_session, user, "08:00")
+    # Due (e.g. waiting out a delivery retry) but not fired yet
+    due_at = datetime(2025, 1, 10, 8, 0)
+    reminder.next_fire_at = due_at
+    db_session.commit()
+
+    reminder_service.update_reminder(db_session, reminder.reminder_id, {"habit_name": "Stretch"})
+    db_session.expire_all()
+    assert _naive_utc(db_session.get(Reminder, reminder.reminder_id).next_fire_at) == due_at
+
+    reminder_service.update_reminder(db_session, reminder.reminder_id, {"time_of_day": "09:00"})
+    db_session.expire_all()
+    assert _naive_utc(db_session.get(Reminder, reminder.reminder_id).next_fire_at) > datetime.utcnow()
@@ -0,0 +1,108 @@
+import uuid
+from datetime import datetime
+
+from sqlalchemy import event
+
+from app.models import Reminder, User
+from app.models.reminder import RepeatEnum
+from app.services import reminder_scheduler, reminder_service
+from app.services.reminder_scheduler import ReminderScheduler
+
+
+def _make_user(db_session):
+    user = User(name="Carol", timezone="UTC", preferences={})
+    db_session.add(user)
+    db_session.commit()
+    return str(user.user_id)
+
+
+def _count_selects(engine):
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cur, stmt, *a: statements.append(stmt))
+    return statements
+
+
+def test_reminder_crud_and_cached_listing(api_client, db_session, db_engine):
+    user_id = _make_user(db_session)
+    created = api_client.post("/reminders/", json={"user_id": user_id, "habit_name": "Water",
+                                                   "time_of_day": "08:00", "repeat": "daily"})
+    assert created.status_code == 201, created.text
+    reminder = created.json()
+    assert reminder["next_fire_at"] is not None
+
+    first = api_client.get(f"/reminders/user/{user_id}").json()
+    statements = _count_selects(db_engine)
+    assert api_client.get(f"/reminders/user/{user_id}").json() == first
+    assert not [s for s in statements if "FROM reminders" in s]  # served from cache
+
+    updated = api_client.put(f"/reminders/{reminder['reminder_id']}", json={"time_of_day": "09:30"})
+    assert updated.status_code == 200, updated.text
+    listing = api_client.get(f"/reminders/user/{user_id}").json()
+    assert [r["time_of_day"] for r in listing] == ["09:30"]  # invalidated by the write
+
+    assert api_client.delete(f"/reminders/{reminder['reminder_id']}").status_code == 204
+    assert api_client.get(f"/reminders/user/{user_id}").json() == []
+    assert api_client.get(f"/reminders/{reminder['reminder_id']}").status_code == 404
+
+
+def test_bulk_upsert_syncs_and_feeds_scheduler(api_client, db_session, session_factory, monkeypatch):
+    scheduler = ReminderScheduler(session_factory=session_factory, dispatch=lambda due: None)
+    monkeypatch.setattr(reminder_scheduler, "_scheduler", scheduler)
+    user_id = _make_user(db_session)
+
+    items = [
+        {"habit_name": "Water", "time_of_day": "08:00"},
+        {"habit_name": "Read", "time_of_day": "21:00", "repeat": "weekly"},
+    ]
+    body = api_client.put(f"/reminders/user/{user_id}/bulk", json={"items": items}).json()
+    assert (body["created"], body["updated"], body["unchanged"]) == (2, 0, 0)
+    assert len(scheduler) == 2
+
+    # Re-sync: one edit, one unchanged, Read dropped via replace
+    items = [{"habit_name": "Water", "time_of_day": "08:00", "enabled": False},
+             {"habit_name": "Walk", "time_of_day": "18:00"}]
+    body = api_client.put(f"/reminders/user/{user_id}/bulk", json={"items": items, "replace": True}).json()
+    assert (body["created"], body["updated"], body["deleted"]) == (1, 1, 1)
+    assert sorted(r["habit_name"] for r in body["reminders"]) == ["Walk", "Water"]
+    assert len(scheduler) == 1  # Water disabled, Read removed, Walk added
+
+    missing = api_client.put(f"/reminders/user/{user_id}/bulk", json={"items": [
+        {"reminder_id": "00000000-0000-0000-0000-000000000000", "habit_name": "X", "time_of_day": "07:00"}]})
+    assert missing.status_code == 404
+
+
+def test_bulk_rename_keeps_a_due_occurrence(api_client, db_session):
+    user_id = _make_user(db_session)
+    body = api_client.put(f"/reminders/user/{user_id}/bulk",
+                          json={"items": [{"habit_name": "Water", "time_of_day": "08:00"}]}).json()
+    rid = body["reminders"][0]["reminder_id"]
+    reminder = db_session.get(Reminder, uuid.UUID(rid))
+    reminder.next_fire_at = datetime(2025, 1, 10, 8, 0)  # due, not fired yet
+    db_session.commit()
+
+    body = api_client.put(f"/reminders/user/{user_id}/bulk", json={"items": [
+        {"reminder_id": rid, "habit_name": "Hydrate", "time_of_day": "08:00"}]}).json()
+    assert body["updated"] == 1
+    db_session.expire_all()
+    stored = db_session.get(Reminder, uuid.UUID(rid))
+    assert stored.habit_name == "Hydrate"
+    assert stored.next_fire_at.replace(tzinfo=None) == datetime(2025, 1, 10, 8, 0)
+
+
+def test_listing_cache_expires_and_is_bounded(db_session, monkeypatch):
+    users = [_make_user(db_session) for _ in range(3)]
+    reminder_service.create_reminder(db_session, {"user_id": users[0], "habit_name": "Water", "time_of_day": "08:00"})
+    monkeypatch.setattr(reminder_service, "LISTING_CACHE_MAX_USERS", 2)
+    for user_id in users:
+        reminder_service.list_user_reminders_cached(db_session, user_id)
+    assert users[0] not in reminder_service._listing_cache  # least recently used, evicted
+    assert set(users[1:]) <= set(reminder_service._listing_cache)
+
+    # A write through another worker is picked up once the entry expires
+    reminder_service.list_user_reminders_cached(db_session, users[0])
+    db_session.add(Reminder(user_id=uuid.UUID(users[0]), habit_name="Read", time_of_day="21:00",
+                             repeat=RepeatEnum.DAILY))
+    db_session.commit()
+    assert len(reminder_service.list_user_reminders_cached(db_session, users[0])) == 1
+    monkeypatch.setattr(reminder_service, "LISTING_CACHE_TTL_SECONDS", 0)
+    assert len(reminder_service.list_user_reminders_cached(db_session, users[0])) == 2
@@ -0,0 +1,70 @@
+import logging
+
+import pytest
+from sqlalchemy import text
+
+from app.db import instrumentation, slow_query
+
+
+def test_normalize_collapses_literals_and_in_lists():
+    a = slow_query.normalize("SELECT * FROM badges WHERE user_id IN (?, ?, ?) AND name = 'x' LIMIT 10")
+    b = slow_query.normalize("SELECT *  FROM badges\n WHERE user_id IN (?, ?) AND name = 'other' LIMIT 5")
+    assert a == b == "SELECT * FROM badges WHERE user_id IN (?, ...) AND name = ? LIMIT ?"
+    assert slow_query.normalize("SELECT a FROM t WHERE x = %(x_1)s") == "SELECT a FROM t WHERE x = ?"
+
+
+def test_full_scans_from_plans():
+    assert slow_query.full_scans(["SCAN habit_entries"]) == ["habit_entries"]
+    assert slow_query.full_scans(["SEARCH habit_entries USING INDEX ix (user_id=?)"]) == []
+    assert slow_query.full_scans(["SCAN badges USING COVERING INDEX ux_badges_user_id_name"]) == []
+    assert slow_query.full_scans(["Seq Scan on reminders  (cost=0.00..1.10 rows=10 width=4)"]) == ["reminders"]
+
+
+@pytest.fixture
+def slow_log(db_engine):
+    now = [1000.0]
+    log = slow_query.SlowQueryLog(threshold_s=0.0, dedup_seconds=60, max_per_minute=2, clock=lambda: now[0])
+    instrumentation.install(db_engine)
+    instrumentation.add_listener(log)
+    log.now = now
+    yield log
+    instrumentation.remove_listener(log)
+
+
+def test_reports_plan_once_per_window(db_engine, slow_log, caplog):
+    caplog.set_level(logging.WARNING, logger="app.db.slow_query")
+    scan = text("SELECT entry_id FROM habit_entries WHERE notes = :notes")
+    with db_engine.connect() as conn:
+        for note in ("a", "b", "c"):
+            conn.execute(scan, {"notes": note})
+        slow_log.now[0] += 61
+        conn.execute(scan, {"notes": "d"})
+
+    reports = [r.getMessage() for r in caplog.records if "notes = ?" in r.getMessage()]
+    assert len(reports) == 2
+    assert "[full scan on habit_entries]" in reports[0] and "'a'" not in reports[0]
+    assert "params=['str']" in reports[0]
+    assert "(+2 similar since last report)" in reports[1]
+    stats = next(s for s in slow_log.recent() if "notes = ?" in s["fingerprint"])
+    assert stats["count"] == 4 and stats["full_scans"] == ["habit_entries"]
+
+
+def test_rate_limit_caps_reports_per_minute(db_engine, slow_log, caplog):
+    caplog.set_level(logging.WARNING, logger="app.db.slow_query")
+    with db_engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        conn.execute(text("SELECT name FROM badges"))
+        conn.execute(text("SELECT habit_name FROM reminders"))
+    assert len([r for r in caplog.records if r.getMessage().startswith("Slow query")]) == 2
+
+
+def test_failed_explain_leaves_the_transaction_usable(db_engine):
+    with db_engine.connect() as conn:
+        conn.execute(text("INSERT INTO badges (badge_id, user_id, name, description, awarded_at) "
+                          "VALUES ('b1', 'u1', 'Kept', '', '2025-01-01')"))
+        with pytest.raises(Exception):
+            slow_query.explain(conn, "SELECT missing_column FROM badges", ())
+        assert slow_query.explain(conn, "SELECT name FROM badges WHERE name = ?", ("Kept",))
+        conn.commit()
+    with db_engine.connect() as conn:
+        assert conn.execute(text("SELECT name FROM badges")).scalars().all() == ["Kept"]
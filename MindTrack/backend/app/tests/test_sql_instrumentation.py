@@ -0,0 +1,42 @@
+import logging
+
+from sqlalchemy import text
+
+from app.db import instrumentation
+from app.models import User
+
+
+def test_track_counts_statements_and_flags_repeats(db_engine, caplog):
+    instrumentation.install(db_engine)
+    with caplog.at_level(logging.WARNING, logger="app.db.instrumentation"):
+        with instrumentation.track("GET /loop", threshold=3) as stats:
+            with db_engine.connect() as conn:
+                for i in range(5):
+                    conn.execute(text("SELECT :i"), {"i": i})
+                conn.execute(text("SELECT 42"))
+    assert stats.queries == 6
+    assert stats.db_time > 0
+    assert stats.repeated(3) == {"SELECT ?": 5}
+    assert "Possible N+1 in GET /loop: statement ran 5 times" in caplog.text
+
+    # Outside a tracked scope only process totals move
+    before = instrumentation.totals()["queries"]
+    with db_engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert instrumentation.current() is None
+    assert instrumentation.totals()["queries"] == before + 1
+
+
+def test_debug_headers_report_request_queries(api_client, db_engine, db_session, monkeypatch):
+    instrumentation.install(db_engine)
+    monkeypatch.setenv("SQL_DEBUG_HEADERS", "true")
+    user = User(name="Ana", timezone="UTC", preferences={})
+    db_session.add(user)
+    db_session.commit()
+    resp = api_client.get(f"/habits/user/{user.user_id}")
+    assert resp.status_code == 200
+    assert int(resp.headers["x-db-query-count"]) == 1
+    assert float(resp.headers["x-db-time-ms"]) >= 0
+
+    monkeypatch.setenv("SQL_DEBUG_HEADERS", "false")
+    assert "x-db-query-count" not in api_client.get("/").headers
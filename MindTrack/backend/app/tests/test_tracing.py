@@ -0,0 +1,89 @@
+from datetime import date
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.db import instrumentation
+from app.models import User
+from app.observability import tracing
+from app.services import habit_service
+
+
+class ListSink:
+    def __init__(self):
+        self.traces = []
+
+    def send(self, trace):
+        self.traces.append(trace)
+
+
+def _exporter(monkeypatch):
+    sink = ListSink()
+    exporter = tracing.SpanExporter(sink).start()
+    monkeypatch.setattr(tracing, "_exporter", exporter)
+    return sink, exporter
+
+
+def test_parse_traceparent():
+    tid, sid = "4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7"
+    assert tracing.parse_traceparent(f"00-{tid}-{sid}-01") == (tid, sid, True)
+    assert tracing.parse_traceparent(f"00-{tid}-{sid}-00") == (tid, sid, False)
+    assert tracing.parse_traceparent(f"00-{'0' * 32}-{sid}-01") is None
+    assert tracing.parse_traceparent("garbage") is None
+
+
+def test_service_and_db_spans_nest_under_root(db_engine, db_session, monkeypatch):
+    instrumentation.install(db_engine)
+    instrumentation.add_listener(tracing.record_statement)
+    sink, exporter = _exporter(monkeypatch)
+    user = User(name="Ana", timezone="UTC", preferences={})
+    db_session.add(user)
+    db_session.commit()
+    try:
+        with tracing.start_trace("GET /insights", sample_rate=1.0) as root:
+            habit_service.compute_completion_rate(db_session, user.user_id, date(2025, 1, 1), date(2025, 1, 31))
+        with tracing.start_trace("GET /insights", sample_rate=0.0) as unsampled:
+            habit_service.compute_completion_rate(db_session, user.user_id, date(2025, 1, 1), date(2025, 1, 31))
+        exporter.flush()
+    finally:
+        instrumentation.remove_listener(tracing.record_statement)
+        exporter.stop()
+
+    assert unsampled is None
+    assert len(sink.traces) == 1
+    spans = {s.name: s for s in sink.traces[0].spans}
+    service = spans["habit_service.compute_completion_rate"]
+    assert service.parent_id == root.span_id
+    assert spans["db.query"].parent_id == service.span_id
+    assert "SELECT" in spans["db.query"].attributes["db.statement"]
+
+    otlp = tracing.to_otlp(sink.traces[0])["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert {s["traceId"] for s in otlp} == {root.trace_id}
+    assert "parentSpanId" not in otlp[0]
+
+
+def test_middleware_samples_at_head_and_honours_traceparent(monkeypatch):
+    sink, exporter = _exporter(monkeypatch)
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    def item(item_id: int):
+        with tracing.span("work", item=item_id):
+            return {"id": item_id}
+
+    app.add_middleware(tracing.TracingMiddleware, sample_rate=1.0)
+    client = TestClient(app)
+    resp = client.get("/items/7")
+    tid = "4bf92f3577b34da6a3ce929d0e0e4736"
+    skipped = client.get("/items/8", headers={"traceparent": f"00-{tid}-00f067aa0ba902b7-00"})
+    continued = client.get("/items/9", headers={"traceparent": f"00-{tid}-00f067aa0ba902b7-01"})
+    exporter.flush()
+    exporter.stop()
+
+    assert "x-trace-id" not in skipped.headers
+    assert continued.headers["x-trace-id"] == tid
+    assert [t.trace_id for t in sink.traces] == [resp.headers["x-trace-id"], tid]
+    root = next(s for s in sink.traces[0].spans if s.parent_id is None)
+    assert root.name == "GET /items/{item_id}" and root.attributes["http.status_code"] == 200
+    work = next(s for s in sink.traces[0].spans if s.name == "work")
+    assert work.parent_id == root.span_id and work.attributes == {"item": 7}
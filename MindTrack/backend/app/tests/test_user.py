@@ -88,4 +88,16 @@ def test_validation_missing_fields(client: TestClient):
     # missing timezone
     bad_payload = {"name": "NoTZ", "preferences": {}}
     resp = client.post("/users", json=bad_payload)
-    assert resp.status_code == 422
\ No newline at end of file
+    assert resp.status_code == 422
+
+def test_get_user_by_string_id(api_client: TestClient):
+    # the frontend checks the user exists before saving; a 404 here makes it create a new one
+    created = api_client.post("/users/", json=SAMPLE_USER_1)
+    assert created.status_code == 201, created.text
+    user_id = created.json()["user_id"]
+
+    resp = api_client.get(f"/users/{user_id}")
+    assert resp.status_code == 200, resp.text
+    assert resp.json()["user_id"] == user_id
+
+    assert api_client.get("/users/not-a-uuid").status_code == 404
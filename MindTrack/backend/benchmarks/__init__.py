@@ -0,0 +1,2 @@
+# Benchmark and load-testing harnesses for the MindTrack backend.
+# Run modules from MindTrack/backend, e.g. `python -m benchmarks.bench_ml`.
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Inference and serving benchmarks for the ML router.
+
+Measures, for the pipeline configured by PIPELINE_PATH (or --pipeline):
+- cold_load:     fresh-interpreter import + joblib.load of the artifact
+- features:      request -> feature dict -> single-row DataFrame construction
+- pipeline:      direct pipeline.predict and the per-tree interval pass
+- http:          POST /predictions/sleep through the FastAPI app in-process
+- concurrency:   throughput and latency with N in-flight requests
+
+Usage (from MindTrack/backend):
+
+    python -m benchmarks.bench_ml
+    python -m benchmarks.bench_ml --repeats 500 --concurrency 1,8,32 --output results/ml.json
+    python -m benchmarks.bench_ml --compare benchmarks/results/ml-20250101T000000Z.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+import warnings
+from typing import Any, Dict, List, Optional
+
+from benchmarks.common import BACKEND_DIR, compare, summarize, time_calls, write_results
+
+SAMPLE_REQUEST = {
+    "total_steps": 10198,
+    "very_active_minutes": 17,
+    "fairly_active_minutes": 20,
+    "lightly_active_minutes": 195,
+    "sedentary_minutes": 1208,
+    "calories": 1755,
+    "avg_steps_7d": 12157.0,
+    "prev_day_sleep": 480.0,
+    "is_weekend": 0,
+}
+
+_COLD_LOAD_SNIPPET = """
+import time, warnings, json
+warnings.simplefilter("ignore")
+t0 = time.perf_counter()
+import joblib, sklearn.ensemble, pandas
+t1 = time.perf_counter()
+joblib.load({path!r})
+t2 = time.perf_counter()
+print(json.dumps({{"import_ms": (t1 - t0) * 1000, "load_ms": (t2 - t1) * 1000}}))
+"""
+
+
+def bench_cold_load(path: str, runs: int) -> Dict[str, Any]:
+    """Time imports and unpickling of the artifact in fresh interpreters."""
+    imports, loads = [], []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", _COLD_LOAD_SNIPPET.format(path=path)],
+            capture_output=True, text=True, cwd=BACKEND_DIR, check=True,
+        )
+        sample = json.loads(out.stdout.strip().splitlines()[-1])
+        imports.append(sample["import_ms"])
+        loads.append(sample["load_ms"])
+    return {
+        "artifact_bytes": os.path.getsize(path),
+        "import": summarize(imports),
+        "load": summarize(loads),
+    }
+
+
+def bench_features(repeats: int) -> Dict[str, Any]:
+    import pandas as pd
+    from app.routers.ml_predictions import SleepPredictionRequest, _build_input_features
+
+    request = SleepPredictionRequest(**SAMPLE_REQUEST)
+    features = _build_input_features(request)
+    return {
+        "validate_request": summarize(time_calls(lambda: SleepPredictionRequest(**SAMPLE_REQUEST), repeats)),
+        "build_features": summarize(time_calls(lambda: _build_input_features(request), repeats)),
+        "dataframe": summarize(time_calls(lambda: pd.DataFrame([features]), repeats)),
+    }
+
+
+def bench_pipeline(pipeline: Any, repeats: int, batch_sizes: List[int]) -> Dict[str, Any]:
+    import pandas as pd
+    from app.routers.ml_predictions import SleepPredictionRequest, _build_input_features
+    from app.services import forest_service
+
+    features = _build_input_features(SleepPredictionRequest(**SAMPLE_REQUEST))
+    single = pd.DataFrame([features])
+    results: Dict[str, Any] = {
+        "predict_1": summarize(time_calls(lambda: pipeline.predict(single), repeats)),
+        "intervals_1": summarize(time_calls(lambda: forest_service.per_tree_predictions(pipeline, single), repeats)),
+    }
+    for size in batch_sizes:
+        frame = pd.DataFrame([features] * size)
+        samples = time_calls(lambda: pipeline.predict(frame), max(5, repeats // 10))
+        results[f"predict_{size}"] = summarize(samples)
+        results[f"predict_{size}"]["rows_per_s"] = size / (results[f"predict_{size}"]["p50_ms"] / 1000.0)
+    return results
+
+
+async def _http_sequential(client: Any, repeats: int, params: Dict[str, Any]) -> List[float]:
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        resp = await client.post("/predictions/sleep", json=SAMPLE_REQUEST, params=params)
+        samples.append((time.perf_counter() - start) * 1000.0)
+        resp.raise_for_status()
+    return samples
+
+
+async def _http_concurrent(client: Any, total: int, concurrency: int) -> Dict[str, Any]:
+    semaphore = asyncio.Semaphore(concurrency)
+    samples: List[float] = []
+    errors = 0
+
+    async def one() -> None:
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            resp = await client.post("/predictions/sleep", json=SAMPLE_REQUEST)
+            samples.append((time.perf_counter() - start) * 1000.0)
+            if resp.status_code != 200:
+                errors += 1
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    wall = time.perf_counter() - wall_start
+    result = summarize(samples)
+    result.update({"concurrency": concurrency, "requests": total, "errors": errors,
+                   "throughput_rps": total / wall if wall else 0.0})
+    return result
+
+
+async def bench_http(repeats: int, concurrency_levels: List[int]) -> Dict[str, Any]:
+    import httpx
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await _http_sequential(client, 5, {})
+        results: Dict[str, Any] = {
+            "sleep": summarize(await _http_sequential(client, repeats, {})),
+            "sleep_interval": summarize(await _http_sequential(client, repeats, {"interval": 0.8})),
+            "concurrency": {},
+        }
+        for level in concurrency_levels:
+            results["concurrency"][str(level)] = await _http_concurrent(client, max(repeats, level * 10), level)
+    return results
+
+
+def _print_section(name: str, data: Dict[str, Any], indent: int = 0) -> None:
+    pad = " " * indent
+    if "p50_ms" in data:
+        extra = f"  {data['throughput_rps']:8.1f} req/s" if "throughput_rps" in data else ""
+        print(f"{pad}{name:<22} p50={data['p50_ms']:8.3f}ms  p99={data['p99_ms']:8.3f}ms{extra}")
+        return
+    print(f"{pad}{name}")
+    for key, value in data.items():
+        if isinstance(value, dict):
+            _print_section(key, value, indent + 2)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pipeline", help="artifact to benchmark (default: PIPELINE_PATH / data/pipeline.pkl)")
+    parser.add_argument("--repeats", type=int, default=300)
+    parser.add_argument("--cold-runs", type=int, default=5)
+    parser.add_argument("--batch-sizes", default="10,100,1000")
+    parser.add_argument("--concurrency", default="1,4,16,64")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/ml-<timestamp>.json)")
+    parser.add_argument("--compare", help="previous results file to diff against")
+    args = parser.parse_args(argv)
+
+    warnings.simplefilter("ignore")
+    from app.routers import ml_predictions
+
+    # app.main configures INFO logging; per-request httpx lines would swamp the report
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    if args.pipeline:
+        ml_predictions.PIPELINE_PATH = os.path.abspath(args.pipeline)
+        ml_predictions.ml_pipeline = None
+    path = os.path.abspath(ml_predictions.PIPELINE_PATH)
+    pipeline = ml_predictions.load_pipeline()
+    if pipeline is None:
+        print(f"Pipeline could not be loaded from {path}")
+        return 1
+
+    results: Dict[str, Any] = {"pipeline_path": path}
+    results["cold_load"] = bench_cold_load(path, args.cold_runs)
+    results["features"] = bench_features(args.repeats)
+    results["pipeline"] = bench_pipeline(pipeline, args.repeats, [int(s) for s in args.batch_sizes.split(",") if s])
+    results["http"] = asyncio.run(bench_http(args.repeats, [int(c) for c in args.concurrency.split(",") if c]))
+
+    for section in ("cold_load", "features", "pipeline", "http"):
+        _print_section(section, results[section])
+
+    path_written = write_results("ml", results, args.output)
+    print(f"\nWrote {path_written}")
+    if args.compare:
+        print(f"\nCompared with {args.compare}:")
+        for line in compare(args.compare, results):
+            print("  " + line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the habit and badge service hot paths.
+
+For every history size (entries of one user, spread over five habits with
+realistic done/missed runs) times:
+
+- calculate_streak:       _calculate_streak over the size's done dates (pure Python)
+- compute_streaks:        one habit's streaks (query + scan)
+- compute_completion_30d: the 30-day completion window the insights page asks for
+- get_user_habits:        the user's full history, serialized
+- create_entry_update:    create_habit_entry upserting today's entry
+- create_entry_insert:    create_habit_entry adding a new day
+- award_check:            check_and_award_streak_badges in steady state
+
+and reports, per function, how p50 grows with the history size (the slope of
+log(p50) against log(size): ~0 is flat, ~1 linear). Indexed lookups should
+stay flat; only get_user_habits and calculate_streak are expected to be linear.
+
+Each size gets its own user in a scratch SQLite file (or --database-url).
+Results can be saved as a baseline; --check fails (exit 1) when a p50 is
+more than --threshold slower than the baseline.
+
+Usage (from MindTrack/backend):
+
+    python -m benchmarks.bench_services
+    python -m benchmarks.bench_services --sizes 10,1000,100000 --repeats 100
+    python -m benchmarks.bench_services --save-baseline   # refresh benchmarks/baselines/services.json
+    python -m benchmarks.bench_services --check --threshold 0.3
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import uuid
+import warnings
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.common import BACKEND_DIR, compare, regressions, summarize, time_calls, write_results
+
+BASELINE_PATH = os.path.join(BACKEND_DIR, "benchmarks", "baselines", "services.json")
+HABITS = ("Drink Water", "Morning Exercise", "Read", "Meditate", "Walk")
+DEFAULT_SIZES = "10,100,1000,10000,100000"
+
+
+def seed_history(engine: Any, size: int, rng: np.random.Generator, end: date) -> uuid.UUID:
+    """Create a user with `size` entries over HABITS, done days in geometric runs."""
+    from app.models.habit_entry import DailyHabitEntry, HabitStatus
+    from app.models.user import User
+
+    user_id = uuid.uuid4()
+    per_habit = -(-size // len(HABITS))
+    rows = []
+    for h, habit in enumerate(HABITS):
+        count = min(per_habit, size - h * per_habit)
+        if count <= 0:
+            break
+        # Alternate done runs (mean 6 days) and other runs (mean 2 days)
+        runs = []
+        done = True
+        while sum(len(r) for r in runs) < count:
+            length = int(rng.geometric(1 / 6 if done else 1 / 2))
+            runs.append([done] * length)
+            done = not done
+        flags = [f for r in runs for f in r][:count]
+        others = rng.random(count) < 0.45
+        for i, flag in enumerate(flags):
+            day = end - timedelta(days=count - 1 - i)
+            status = HabitStatus.DONE if flag else (HabitStatus.PARTIAL if others[i] else HabitStatus.MISSED)
+            rows.append({"entry_id": uuid.uuid4(), "user_id": user_id, "date": day, "habit_name": habit,
+                         "status": status, "target_value": 1.0,
+                         "timestamp": datetime.combine(day, datetime.min.time())})
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [{"user_id": user_id, "name": f"bench-{size}", "timezone": "UTC",
+                                                "created_at": datetime.utcnow(), "preferences": {}}])
+        for i in range(0, len(rows), 10000):
+            conn.execute(DailyHabitEntry.__table__.insert(), rows[i:i + 10000])
+    return user_id
+
+
+def _repeats_for(size: int, repeats: int) -> int:
+    # Keep the large sizes from dominating the run time
+    return max(5, min(repeats, int(repeats * 1000 / max(size, 1))))
+
+
+def bench_size(session_factory: Any, engine: Any, size: int, repeats: int, seed: int) -> Dict[str, Any]:
+    from app.services import badge_service, habit_service
+
+    # Seeded per size, so a size's data does not depend on which other sizes run
+    rng = np.random.default_rng([seed, size])
+    today = date.today()
+    user_id = seed_history(engine, size, rng, today - timedelta(days=1))
+    n = _repeats_for(size, repeats)
+    db = session_factory()
+    try:
+        done_dates = sorted(
+            date.fromordinal(today.toordinal() - 1 - i) for i in range(size) if rng.random() < 0.7
+        )
+        insert_day = [today]
+
+        def insert_entry() -> None:
+            insert_day[0] += timedelta(days=1)
+            habit_service.create_habit_entry(db, {"user_id": user_id, "habit_name": HABITS[0],
+                                                  "date": insert_day[0], "status": "done"})
+
+        calls: Dict[str, Callable[[], Any]] = {
+            "calculate_streak": lambda: habit_service._calculate_streak(done_dates),
+            "compute_streaks": lambda: habit_service.compute_streaks(db, user_id, HABITS[0]),
+            "compute_completion_30d": lambda: habit_service.compute_completion_rate(
+                db, user_id, today - timedelta(days=30), today),
+            "get_user_habits": lambda: habit_service.get_user_habits(db, user_id),
+            "create_entry_update": lambda: habit_service.create_habit_entry(
+                db, {"user_id": user_id, "habit_name": HABITS[1], "date": today, "status": "done"}),
+            "create_entry_insert": insert_entry,
+            "award_check": lambda: badge_service.check_and_award_streak_badges(db, user_id),
+        }
+        results: Dict[str, Any] = {}
+        for name, fn in calls.items():
+            results[name] = summarize(time_calls(fn, n, warmup=min(5, n)))
+            # Keep the identity map from growing across calls
+            db.expire_all()
+        return results
+    finally:
+        db.close()
+
+
+def scaling(results: Dict[str, Dict[str, Any]]) -> Dict[str, float]:
+    """Per function, the least-squares slope of log(p50) over log(size)."""
+    sizes = sorted(int(s) for s in results)
+    if len(sizes) < 2:
+        return {}
+    out = {}
+    for name in results[str(sizes[0])]:
+        x = np.log(sizes)
+        y = np.log([max(results[str(s)][name]["p50_ms"], 1e-6) for s in sizes])
+        out[name] = float(np.polyfit(x, y, 1)[0])
+    return out
+
+
+def _print_table(by_size: Dict[str, Dict[str, Any]], slopes: Dict[str, float]) -> None:
+    sizes = list(by_size)
+    names = list(by_size[sizes[0]])
+    print(f"{'p50 ms':<24}" + "".join(f"{s:>11}" for s in sizes) + f"{'slope':>8}")
+    for name in names:
+        cells = "".join(f"{by_size[s][name]['p50_ms']:>11.3f}" for s in sizes)
+        slope = f"{slopes[name]:>8.2f}" if name in slopes else ""
+        print(f"{name:<24}{cells}{slope}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="history sizes (entries per user)")
+    parser.add_argument("--repeats", type=int, default=200, help="calls per function at <= 1000 entries")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database-url", help="database to seed (default: a scratch SQLite file)")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/services-<timestamp>.json)")
+    parser.add_argument("--compare", help="previous results file to diff against")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="also write the results as --baseline")
+    parser.add_argument("--check", action="store_true", help="exit 1 if p50 regressed past --threshold")
+    parser.add_argument("--threshold", type=float, default=0.3, help="allowed p50 slowdown (fraction)")
+    parser.add_argument("--min-delta-ms", type=float, default=0.25, help="ignore smaller slowdowns (noise)")
+    args = parser.parse_args(argv)
+
+    warnings.simplefilter("ignore")
+    logging.getLogger("app").setLevel(logging.WARNING)
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from app.db import instrumentation
+    from app.db.database import Base, connect_args_for
+    import app.models  # noqa: F401  (register every model on Base.metadata)
+
+    scratch = None
+    url = args.database_url
+    if url is None:
+        scratch = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        scratch.close()
+        url = f"sqlite:///{scratch.name}"
+    engine = create_engine(url, connect_args=connect_args_for(url))
+    # Same statement hooks as the application engine, so their overhead is included
+    instrumentation.install(engine)
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    by_size: Dict[str, Dict[str, Any]] = {}
+    try:
+        for size in (int(s) for s in args.sizes.split(",") if s):
+            print(f"  {size} entries ...")
+            by_size[str(size)] = bench_size(session_factory, engine, size, args.repeats, args.seed)
+    finally:
+        engine.dispose()
+        if scratch is not None:
+            os.unlink(scratch.name)
+
+    slopes = scaling(by_size)
+    results = {"sizes": by_size, "scaling": slopes, "database": url.split("@")[-1] if args.database_url else "sqlite-scratch"}
+    print()
+    _print_table(by_size, slopes)
+
+    path_written = write_results("services", results, args.output)
+    print(f"\nWrote {path_written}")
+    if args.save_baseline:
+        print(f"Baseline {write_results('services', results, args.baseline)}")
+    if args.compare:
+        print(f"\nCompared with {args.compare}:")
+        for line in compare(args.compare, results):
+            print("  " + line)
+    if args.check and not args.save_baseline:
+        if not os.path.exists(args.baseline):
+            print(f"No baseline at {args.baseline}; run with --save-baseline first")
+            return 1
+        failed = regressions(args.baseline, results, args.threshold, min_delta_ms=args.min_delta_ms)
+        print(f"\n{len(failed)} regression(s) against {args.baseline}")
+        for line in failed:
+            print("  " + line)
+        return 1 if failed else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+"""
+Shared helpers for the benchmark harnesses.
+
+Every suite writes one JSON document with the same envelope:
+
+    {"suite": ..., "created_at": ..., "environment": {...}, "results": {...}}
+
+so runs taken on different commits or machines can be diffed with compare().
+"""
+import json
+import os
+import platform
+import subprocess
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "results")
+
+
+def summarize(samples_ms: Iterable[float]) -> Dict[str, float]:
+    """Latency summary (milliseconds) used by every suite."""
+    arr = np.asarray(list(samples_ms), dtype=np.float64)
+    if arr.size == 0:
+        return {"n": 0}
+    return {
+        "n": int(arr.size),
+        "mean_ms": float(arr.mean()),
+        "min_ms": float(arr.min()),
+        "p50_ms": float(np.percentile(arr, 50)),
+        "p90_ms": float(np.percentile(arr, 90)),
+        "p99_ms": float(np.percentile(arr, 99)),
+        "max_ms": float(arr.max()),
+    }
+
+
+def time_calls(fn: Callable[[], Any], repeats: int, warmup: int = 5) -> List[float]:
+    """Call fn repeatedly and return per-call wall times in milliseconds."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    return samples
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+            capture_output=True, text=True, timeout=10,
+        )
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _package_versions(names: Iterable[str]) -> Dict[str, Optional[str]]:
+    from importlib import metadata
+
+    versions = {}
+    for name in names:
+        try:
+            versions[name] = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            versions[name] = None
+    return versions
+
+
+def environment_metadata() -> Dict[str, Any]:
+    """Facts needed to decide whether two result files are comparable."""
+    return {
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "database_url": os.getenv("DATABASE_URL", "sqlite:///./mindtrack.db").split("@")[-1],
+        "packages": _package_versions(
+            ["numpy", "pandas", "scikit-learn", "fastapi", "starlette", "sqlalchemy", "httpx", "uvicorn"]
+        ),
+    }
+
+
+def write_results(suite: str, results: Dict[str, Any], output: Optional[str] = None) -> str:
+    """Write results with the common envelope; returns the path written."""
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+        output = os.path.join(RESULTS_DIR, f"{suite}-{stamp}.json")
+    else:
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    doc = {
+        "suite": suite,
+        "created_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "environment": environment_metadata(),
+        "results": results,
+    }
+    with open(output, "w") as fh:
+        json.dump(doc, fh, indent=2, default=str)
+    return output
+
+
+def _flatten(prefix: str, value: Any, out: Dict[str, float]) -> None:
+    if isinstance(value, dict):
+        for k, v in value.items():
+            _flatten(f"{prefix}.{k}" if prefix else str(k), v, out)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        out[prefix] = float(value)
+
+
+def compare(baseline_path: str, current: Dict[str, Any], keys: Iterable[str] = ("p50_ms", "p99_ms")) -> List[str]:
+    """
+    Print-ready lines comparing latency metrics in `current` results against a
+    previously written results file.
+    """
+    with open(baseline_path) as fh:
+        baseline = json.load(fh)["results"]
+    old, new = {}, {}
+    _flatten("", baseline, old)
+    _flatten("", current, new)
+    lines = []
+    for name in sorted(new):
+        if name.rsplit(".", 1)[-1] not in keys or name not in old or old[name] == 0:
+            continue
+        delta = (new[name] - old[name]) / old[name] * 100.0
+        lines.append(f"{name:<60} {old[name]:10.3f} -> {new[name]:10.3f}  ({delta:+6.1f}%)")
+    return lines
+
+
+def regressions(baseline_path: str, current: Dict[str, Any], threshold: float = 0.25,
+                key: str = "p50_ms", min_delta_ms: float = 0.05) -> List[str]:
+    """
+    Metrics named `key` that got slower than the baseline by more than
+    `threshold` (fraction) and by at least `min_delta_ms`, as print-ready
+    lines; empty when there is no regression.
+    """
+    with open(baseline_path) as fh:
+        baseline = json.load(fh)["results"]
+    old, new = {}, {}
+    _flatten("", baseline, old)
+    _flatten("", current, new)
+    lines = []
+    for name in sorted(new):
+        if name.rsplit(".", 1)[-1] != key or name not in old or old[name] == 0:
+            continue
+        if new[name] > old[name] * (1.0 + threshold) and new[name] - old[name] >= min_delta_ms:
+            lines.append(f"{name:<60} {old[name]:10.3f} -> {new[name]:10.3f}  "
+                         f"(+{(new[name] - old[name]) / old[name] * 100.0:.1f}% > {threshold * 100.0:.0f}%)")
+    return lines
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+End-to-end HTTP load test replaying the Streamlit page flows.
+
+Each virtual user picks a scenario by weight, runs its requests in order
+(as the page would) and repeats until --duration elapses:
+
+- home_save:      GET user, POST /habits/ per selected habit, GET /habits/user
+- dashboard:      GET /habits/user twice (load_user_habits + saved habit details)
+- checkin:        POST /habits/ for one habit (Done/Partial/Missed button)
+- save_progress:  GET user, POST /habits/bulk, POST /badges/award-check
+- insights:       GET /insights/user?days=30
+- prediction:     POST /predictions/sleep
+
+Latency is recorded per endpoint (route template, so user ids do not split
+the series) and per scenario, with throughput and error counts.
+
+Without --base-url a uvicorn server is started on a free port against
+--database-url (default DATABASE_URL) and stopped afterwards. Users are
+sampled from that database when it has any (see benchmarks.generate_data);
+otherwise, or against a remote --base-url, --users users are created through
+the API and given a week of history first.
+
+Usage (from MindTrack/backend):
+
+    python -m benchmarks.load_test --duration 30 --concurrency 16
+    python -m benchmarks.load_test --database-url sqlite:///./bench.db --server-workers 4 --concurrency 64
+    python -m benchmarks.load_test --base-url http://staging:8000 --mix dashboard=3,checkin=1
+    python -m benchmarks.load_test --compare benchmarks/results/load_test-20250101T000000Z.json
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from contextvars import ContextVar
+from datetime import date, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from benchmarks.common import BACKEND_DIR, compare, summarize, write_results
+
+HABITS = ("Drink Water", "Morning Exercise", "Read", "Meditate", "Walk")
+STATUSES = ("done", "partial", "missed")
+SLEEP_REQUEST = {
+    "total_steps": 10198, "very_active_minutes": 17, "fairly_active_minutes": 20,
+    "lightly_active_minutes": 195, "sedentary_minutes": 1208, "calories": 1755,
+    "avg_steps_7d": 12157.0, "prev_day_sleep": 480.0, "is_weekend": 0,
+}
+DEFAULT_MIX = "dashboard=30,checkin=25,save_progress=15,prediction=15,insights=10,home_save=5"
+
+# Failed requests of the scenario the current virtual user (task) is running
+_flow_errors: ContextVar[Optional[List[int]]] = ContextVar("flow_errors", default=None)
+
+
+class Recorder:
+    """Latency samples and status counts per endpoint template and per scenario."""
+
+    def __init__(self) -> None:
+        self.endpoints: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.scenarios: Dict[str, List[float]] = defaultdict(list)
+        self.scenario_errors: Dict[str, int] = defaultdict(int)
+
+    async def call(self, client: Any, name: str, method: str, url: str, **kwargs) -> Any:
+        start = time.perf_counter()
+        try:
+            resp = await client.request(method, url, **kwargs)
+        except Exception:
+            resp = None
+        self.endpoints[name].append((time.perf_counter() - start) * 1000.0)
+        if resp is None or resp.status_code >= 400:
+            self.errors[name] += 1
+            flow = _flow_errors.get()
+            if flow is not None:
+                flow[0] += 1
+        return resp
+
+
+class Scenarios:
+    """The page flows; each takes (client, user_id) and issues the page's requests."""
+
+    def __init__(self, recorder: Recorder, rng: random.Random):
+        self.rec = recorder
+        self.rng = rng
+
+    async def home_save(self, client: Any, user_id: str) -> None:
+        await self.rec.call(client, "GET /users/{user_id}", "GET", f"/users/{user_id}")
+        for habit in self.rng.sample(HABITS, self.rng.randint(1, 3)):
+            await self.rec.call(client, "POST /habits/", "POST", "/habits/", json={
+                "user_id": user_id, "habit_name": habit, "entry_date": str(date.today()),
+                "status": "done", "target_value": 1.0, "notes": "Initial setup", "mood": 5.0,
+            })
+        await self.rec.call(client, "GET /habits/user/{user_id}", "GET", f"/habits/user/{user_id}")
+
+    async def dashboard(self, client: Any, user_id: str) -> None:
+        for _ in range(2):
+            await self.rec.call(client, "GET /habits/user/{user_id}", "GET", f"/habits/user/{user_id}")
+
+    async def checkin(self, client: Any, user_id: str) -> None:
+        status = self.rng.choice(STATUSES)
+        await self.rec.call(client, "POST /habits/", "POST", "/habits/", json={
+            "user_id": user_id, "habit_name": self.rng.choice(HABITS), "entry_date": str(date.today()),
+            "status": status, "target_value": {"done": 1.0, "partial": 0.5, "missed": 0.0}[status],
+            "notes": "Checked in via dashboard", "mood": 3.0,
+        })
+
+    async def save_progress(self, client: Any, user_id: str) -> None:
+        await self.rec.call(client, "GET /users/{user_id}", "GET", f"/users/{user_id}")
+        entries = [{"habit_name": h, "entry_date": str(date.today()), "status": self.rng.choice(STATUSES)}
+                   for h in self.rng.sample(HABITS, self.rng.randint(2, len(HABITS)))]
+        await self.rec.call(client, "POST /habits/bulk", "POST", "/habits/bulk",
+                            json={"user_id": user_id, "entries": entries})
+        await self.rec.call(client, "POST /badges/award-check/{user_id}", "POST", f"/badges/award-check/{user_id}")
+
+    async def insights(self, client: Any, user_id: str) -> None:
+        await self.rec.call(client, "GET /insights/user/{user_id}", "GET", f"/insights/user/{user_id}",
+                            params={"days": 30})
+
+    async def prediction(self, client: Any, user_id: str) -> None:
+        body = dict(SLEEP_REQUEST, total_steps=self.rng.randint(2000, 20000))
+        await self.rec.call(client, "POST /predictions/sleep", "POST", "/predictions/sleep", json=body)
+
+
+def parse_mix(spec: str) -> List[Tuple[str, float]]:
+    mix = []
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if not hasattr(Scenarios, name) or name.startswith("_"):
+            raise ValueError(f"Unknown scenario {name!r}")
+        mix.append((name, float(weight or 1)))
+    return mix
+
+
+# ---- server and users ----
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(database_url: str, workers: int) -> Tuple[subprocess.Popen, str]:
+    port = _free_port()
+    env = dict(os.environ, DATABASE_URL=database_url)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    return proc, f"http://127.0.0.1:{port}"
+
+
+async def wait_ready(client: Any, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.25)
+    raise RuntimeError("server did not become ready")
+
+
+def users_from_db(database_url: str, limit: int) -> List[str]:
+    """Ids of existing users, so a generated dataset is exercised as-is."""
+    from sqlalchemy import create_engine, text
+
+    from app.db.database import connect_args_for
+
+    engine = create_engine(database_url, connect_args=connect_args_for(database_url))
+    try:
+        with engine.connect() as conn:
+            rows = conn.execute(text("SELECT user_id FROM users LIMIT :n"), {"n": limit}).fetchall()
+    except Exception:
+        return []
+    finally:
+        engine.dispose()
+    # SQLite stores UUIDs as 32-char hex
+    return [str(uuid.UUID(str(r[0]))) for r in rows]
+
+
+async def create_users(client: Any, count: int, rng: random.Random) -> List[str]:
+    """Create users through the API with a week of entries each."""
+    ids = []
+    for i in range(count):
+        resp = await client.post("/users/", json={"name": f"load-user-{i:05d}", "timezone": "UTC"})
+        resp.raise_for_status()
+        user_id = resp.json()["user_id"]
+        entries = [{"habit_name": h, "entry_date": str(date.today() - timedelta(days=d)),
+                    "status": rng.choice(STATUSES)}
+                   for d in range(1, 8) for h in HABITS[:3]]
+        (await client.post("/habits/bulk", json={"user_id": user_id, "entries": entries})).raise_for_status()
+        ids.append(user_id)
+    return ids
+
+
+# ---- run ----
+
+
+async def virtual_user(scenarios: Scenarios, client: Any, users: List[str], mix: List[Tuple[str, float]],
+                       deadline: float, rng: random.Random, think_s: float) -> None:
+    names = [m[0] for m in mix]
+    weights = [m[1] for m in mix]
+    rec = scenarios.rec
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        flow: Callable[[Any, str], Awaitable[None]] = getattr(scenarios, name)
+        failed = [0]
+        _flow_errors.set(failed)
+        start = time.perf_counter()
+        await flow(client, rng.choice(users))
+        rec.scenarios[name].append((time.perf_counter() - start) * 1000.0)
+        if failed[0]:
+            rec.scenario_errors[name] += 1
+        if think_s:
+            await asyncio.sleep(rng.expovariate(1.0 / think_s))
+
+
+async def run(base_url: str, args: argparse.Namespace, database_url: Optional[str]) -> Dict[str, Any]:
+    import httpx
+
+    rng = random.Random(args.seed)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        await wait_ready(client)
+        users = users_from_db(database_url, args.users) if database_url else []
+        source = "database"
+        if not users:
+            users, source = await create_users(client, args.users, rng), "created"
+
+        recorder = Recorder()
+        scenarios = Scenarios(recorder, rng)
+        mix = parse_mix(args.mix)
+        if args.warmup:
+            await asyncio.gather(*(virtual_user(Scenarios(Recorder(), rng), client, users, mix,
+                                                time.perf_counter() + args.warmup, rng, 0.0)
+                                   for _ in range(args.concurrency)))
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*(virtual_user(scenarios, client, users, mix, deadline,
+                                            random.Random(rng.random()), args.think_ms / 1000.0)
+                               for _ in range(args.concurrency)))
+        wall = time.perf_counter() - started
+
+    total = sum(len(s) for s in recorder.endpoints.values())
+    endpoints = {}
+    for name, samples in sorted(recorder.endpoints.items()):
+        endpoints[name] = summarize(samples)
+        endpoints[name].update({"errors": recorder.errors[name], "throughput_rps": len(samples) / wall})
+    scenario_results = {}
+    for name, samples in sorted(recorder.scenarios.items()):
+        scenario_results[name] = summarize(samples)
+        scenario_results[name].update({"errors": recorder.scenario_errors[name],
+                                       "throughput_rps": len(samples) / wall})
+    return {
+        "config": {"base_url": base_url, "concurrency": args.concurrency, "duration_s": args.duration,
+                   "mix": args.mix, "think_ms": args.think_ms, "users": len(users), "user_source": source,
+                   "server_workers": None if args.base_url else args.server_workers, "seed": args.seed},
+        "total": {"requests": total, "errors": sum(recorder.errors.values()),
+                  "throughput_rps": total / wall if wall else 0.0, "wall_s": wall},
+        "endpoints": endpoints,
+        "scenarios": scenario_results,
+    }
+
+
+def _print_table(title: str, rows: Dict[str, Dict[str, Any]]) -> None:
+    print(f"\n{title}")
+    print(f"  {'':<40} {'n':>7} {'req/s':>8} {'p50':>9} {'p90':>9} {'p99':>9} {'err':>5}")
+    for name, r in rows.items():
+        if not r.get("n"):
+            continue
+        print(f"  {name:<40} {r['n']:>7} {r['throughput_rps']:>8.1f} {r['p50_ms']:>8.1f}ms "
+              f"{r['p90_ms']:>8.1f}ms {r['p99_ms']:>8.1f}ms {r['errors']:>5}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", help="existing server to load (default: start uvicorn locally)")
+    parser.add_argument("--database-url", help="database for the local server (default: DATABASE_URL)")
+    parser.add_argument("--server-workers", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=16, help="virtual users")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of measured load")
+    parser.add_argument("--warmup", type=float, default=3.0, help="seconds of unmeasured load first")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="mean pause between scenarios per user")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="scenario weights, e.g. dashboard=3,checkin=1")
+    parser.add_argument("--users", type=int, default=50, help="users to sample or create")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="results file (default: benchmarks/results/load_test-<timestamp>.json)")
+    parser.add_argument("--compare", help="previous results file to diff against")
+    args = parser.parse_args(argv)
+    try:
+        parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    from app.db.database import DATABASE_URL
+
+    proc = None
+    database_url = None
+    if args.base_url:
+        base_url = args.base_url.rstrip("/")
+    else:
+        database_url = args.database_url or DATABASE_URL
+        proc, base_url = start_server(database_url, args.server_workers)
+    try:
+        results = asyncio.run(run(base_url, args, database_url))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+    if database_url:
+        # Recorded so runs against different backends are not mistaken for each other
+        results["config"]["database"] = database_url.split("@")[-1]
+    total = results["total"]
+    print(f"{total['requests']} requests in {total['wall_s']:.1f}s: {total['throughput_rps']:.1f} req/s, "
+          f"{total['errors']} errors ({args.concurrency} virtual users, {results['config']['users']} "
+          f"{results['config']['user_source']} users)")
+    _print_table("Endpoints", results["endpoints"])
+    _print_table("Scenarios", results["scenarios"])
+
+    path_written = write_results("load_test", results, args.output)
+    print(f"\nWrote {path_written}")
+    if args.compare:
+        print(f"\nCompared with {args.compare}:")
+        for line in compare(args.compare, results):
+            print("  " + line)
+    return 1 if total["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Replay captured traffic against a local instance and compare latencies.
+
+Reads the .jsonl.gz files written by app/observability/capture.py (files or
+directories) and re-issues every request at its original offset from the
+first one, divided by --speed (1 = original timing, 10 = ten times faster,
+0 = back to back as fast as --concurrency allows).
+
+Captured records are redacted, so each request is rebuilt before sending:
+
+- every pseudonymous id is mapped, in first-seen order, to a local user
+  (sampled from the server's database, or created through the API); ids of
+  entries or reminders therefore resolve to nothing and answer 404, as
+  they would for another user's data
+- "<redacted:N>" strings become N filler characters
+- habit pseudonyms are sent as habit names
+
+The report compares, per route, the captured and replayed latency
+distributions (p50/p90/p99 and their ratio) and status classes, plus how far
+the replay fell behind its schedule. Without --base-url a uvicorn server is
+started as in benchmarks.load_test.
+
+Usage (from MindTrack/backend):
+
+    python -m benchmarks.replay /tmp/mindtrack-captures --speed 1
+    python -m benchmarks.replay captures/ --speed 20 --database-url sqlite:///./bench.db
+    python -m benchmarks.replay capture-20250101T000000.000000-123-00000.jsonl.gz --speed 0 --base-url http://localhost:8000
+"""
+import argparse
+import asyncio
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+from benchmarks.common import compare, summarize, write_results
+from benchmarks.load_test import create_users, start_server, users_from_db, wait_ready
+
+
+class IdMapper:
+    """Maps pseudonymous ids to local user ids, round-robin in first-seen order."""
+
+    def __init__(self, users: List[str]):
+        self.users = users
+        self.mapping: Dict[str, str] = {}
+
+    def get(self, pseudonym: str) -> str:
+        if pseudonym not in self.mapping:
+            self.mapping[pseudonym] = self.users[len(self.mapping) % len(self.users)]
+        return self.mapping[pseudonym]
+
+
+def materialize(value: Any, ids: IdMapper) -> Any:
+    """A redacted value with ids mapped to local users and redacted strings filled in."""
+    from app.observability.capture import REDACTED, is_uuid
+
+    if isinstance(value, dict):
+        return {k: materialize(v, ids) for k, v in value.items()}
+    if isinstance(value, list):
+        return [materialize(v, ids) for v in value]
+    if isinstance(value, str):
+        if is_uuid(value):
+            return ids.get(value)
+        match = REDACTED.match(value)
+        if match:
+            return "x" * int(match.group(1))
+    return value
+
+
+def build_request(record: Dict[str, Any], ids: IdMapper) -> Dict[str, Any]:
+    path = "/".join(materialize(p, ids) if p else p for p in record["path"].split("/"))
+    request: Dict[str, Any] = {"method": record["method"], "url": path,
+                               "params": [(k, materialize(v, ids)) for k, v in record.get("query") or []]}
+    if record.get("body") is not None:
+        request["json"] = materialize(record["body"], ids)
+    elif record.get("body_bytes"):
+        request["content"] = b"x" * record["body_bytes"]
+        if record.get("content_type"):
+            request["headers"] = {"content-type": record["content_type"]}
+    return request
+
+
+def _status_class(status: Optional[int]) -> str:
+    return f"{status // 100}xx" if status else "error"
+
+
+async def replay(base_url: str, records: List[Dict[str, Any]], users: List[str], speed: float,
+                 concurrency: int, timeout: float) -> Dict[str, Any]:
+    import httpx
+
+    ids = IdMapper(users)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    mismatches: Dict[str, int] = defaultdict(int)
+    lag_ms: List[float] = []
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+
+        async def fire(record: Dict[str, Any]) -> None:
+            route = f"{record['method']} {record.get('route') or record['path']}"
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    resp = await client.request(**build_request(record, ids))
+                    status = resp.status_code
+                except Exception:
+                    status = None
+                latencies[route].append((time.perf_counter() - start) * 1000.0)
+            statuses[route][_status_class(status)] += 1
+            if _status_class(status) != _status_class(record.get("status")):
+                mismatches[route] += 1
+
+        first = records[0]["ts"] if records else 0.0
+        started = time.perf_counter()
+        tasks = []
+        for record in records:
+            if speed > 0:
+                due = (record["ts"] - first) / speed
+                delay = due - (time.perf_counter() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    lag_ms.append(-delay * 1000.0)
+            tasks.append(asyncio.create_task(fire(record)))
+        await asyncio.gather(*tasks)
+        wall = time.perf_counter() - started
+
+    captured: Dict[str, List[float]] = defaultdict(list)
+    for record in records:
+        captured[f"{record['method']} {record.get('route') or record['path']}"].append(record["duration_ms"])
+    routes = {}
+    for route in sorted(latencies):
+        before, after = summarize(captured[route]), summarize(latencies[route])
+        routes[route] = {
+            "captured": before,
+            "replayed": after,
+            "p50_ratio": after["p50_ms"] / before["p50_ms"] if before.get("p50_ms") else None,
+            "p99_ratio": after["p99_ms"] / before["p99_ms"] if before.get("p99_ms") else None,
+            "statuses": dict(statuses[route]),
+            "status_mismatches": mismatches[route],
+        }
+    span = (records[-1]["ts"] - first) if records else 0.0
+    return {
+        "requests": len(records),
+        "captured_span_s": span,
+        "wall_s": wall,
+        "throughput_rps": len(records) / wall if wall else 0.0,
+        "users_mapped": len(ids.mapping),
+        "schedule_lag": summarize(lag_ms),
+        "routes": routes,
+    }
+
+
+def _print_routes(routes: Dict[str, Dict[str, Any]]) -> None:
+    print(f"  {'':<40} {'n':>6} {'captured p50/p99':>20} {'replayed p50/p99':>20} {'p50 x':>7} {'status!=':>8}")
+    for route, r in routes.items():
+        c, p = r["captured"], r["replayed"]
+        ratio = f"{r['p50_ratio']:.2f}" if r["p50_ratio"] is not None else "-"
+        print(f"  {route:<40} {p['n']:>6} {c['p50_ms']:>9.1f}/{c['p99_ms']:<9.1f} "
+              f"{p['p50_ms']:>9.1f}/{p['p99_ms']:<9.1f} {ratio:>7} {r['status_mismatches']:>8}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("captures", nargs="+", help="capture files or directories")
+    parser.add_argument("--speed", type=float, default=1.0, help="time compression (0 = no pauses)")
+    parser.add_argument("--limit", type=int, default=0, help="replay only the first N requests")
+    parser.add_argument("--concurrency", type=int, default=16, help="max requests in flight")
+    parser.add_argument("--base-url", help="existing server (default: start uvicorn locally)")
+    parser.add_argument("--database-url", help="database for the local server (default: DATABASE_URL)")
+    parser.add_argument("--server-workers", type=int, default=1)
+    parser.add_argument("--users", type=int, default=50, help="local users to map captured ids onto")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="results file (default: benchmarks/results/replay-<timestamp>.json)")
+    parser.add_argument("--compare", help="previous replay results file to diff against")
+    args = parser.parse_args(argv)
+
+    from app.db.database import DATABASE_URL
+    from app.observability.capture import read_captures
+
+    records = sorted(read_captures(args.captures), key=lambda r: r["ts"])
+    if args.limit:
+        records = records[:args.limit]
+    if not records:
+        print("No captured requests found")
+        return 1
+
+    proc = None
+    database_url = None
+    if args.base_url:
+        base_url = args.base_url.rstrip("/")
+    else:
+        database_url = args.database_url or DATABASE_URL
+        proc, base_url = start_server(database_url, args.server_workers)
+
+    async def run() -> Dict[str, Any]:
+        import httpx
+
+        async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout) as client:
+            await wait_ready(client)
+            users = users_from_db(database_url, args.users) if database_url else []
+            if not users:
+                users = await create_users(client, args.users, random.Random(args.seed))
+        return await replay(base_url, records, users, args.speed, args.concurrency, args.timeout)
+
+    try:
+        results = asyncio.run(run())
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+    results["config"] = {"captures": args.captures, "speed": args.speed, "concurrency": args.concurrency,
+                         "base_url": base_url, "database": database_url.split("@")[-1] if database_url else None}
+    lag = results["schedule_lag"]
+    print(f"Replayed {results['requests']} requests ({results['captured_span_s']:.1f}s captured) in "
+          f"{results['wall_s']:.1f}s at speed {args.speed:g}; {results['users_mapped']} ids mapped to local users")
+    if lag.get("n"):
+        print(f"  fell behind schedule {lag['n']} times (p99 {lag['p99_ms']:.1f}ms); raise --concurrency "
+              f"or lower --speed if that is large")
+    _print_routes(results["routes"])
+
+    path_written = write_results("replay", results, args.output)
+    print(f"\nWrote {path_written}")
+    if args.compare:
+        print(f"\nCompared with {args.compare}:")
+        for line in compare(args.compare, results):
+            print("  " + line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
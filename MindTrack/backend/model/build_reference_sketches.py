@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Build training-time drift reference sketches for a pipeline artifact.
+
+Writes <artifact>.reference.json (e.g. data/pipeline.reference.json) with a
+decile histogram and moments for every model input feature, computed on the
+notebook's training split. /predictions/drift compares live traffic with it.
+
+Usage (from MindTrack/backend):
+
+    python model/build_reference_sketches.py
+    python model/build_reference_sketches.py --pipeline data/pipeline_pruned.pkl --bins 20
+"""
+import argparse
+import json
+import os
+import sys
+from typing import List, Optional
+
+from training_data import DATA_DIR, DATASET_PATH, FEATURE_COLS, load_holdout_split
+
+# Make the backend's `app` package importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.drift_service import DEFAULT_BINS, build_reference, reference_path_for  # noqa: E402
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pipeline", default=os.path.join(DATA_DIR, "pipeline.pkl"),
+                        help="artifact the reference belongs to (output goes next to it)")
+    parser.add_argument("--dataset", default=DATASET_PATH)
+    parser.add_argument("--bins", type=int, default=DEFAULT_BINS)
+    args = parser.parse_args(argv)
+
+    X_train, _, _, _ = load_holdout_split(args.dataset)
+    reference = build_reference(
+        X_train, FEATURE_COLS, bins=args.bins,
+        source=f"{os.path.basename(args.dataset)} (training split)",
+    )
+    out = reference_path_for(os.path.abspath(args.pipeline))
+    with open(out, "w") as fh:
+        json.dump(reference, fh, indent=2)
+    print(f"Wrote {len(reference['features'])} feature sketches from {reference['rows']} rows to {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
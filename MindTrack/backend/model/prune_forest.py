@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Latency-budgeted pruning for the sleep RandomForest pipeline.
+
+Evaluates truncated versions of the saved forest (first-k trees combined with
+depth caps) against the notebook's held-out temporal split, prints the
+latency/MAE Pareto front and writes a serving artifact that meets the
+configured single-request p99 budget.
+
+Usage (from MindTrack/backend):
+
+    python model/prune_forest.py --budget-ms 5
+    python model/prune_forest.py --trees 25,50,100 --depths none,8,6 --mae-tolerance 0.5
+
+Point the API at the result with PIPELINE_PATH=data/pipeline_pruned.pkl.
+"""
+import argparse
+import copy
+import json
+import os
+import pickle
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import joblib
+import numpy as np
+
+from training_data import DATA_DIR, load_holdout_split
+
+DEFAULT_INPUT = os.path.join(DATA_DIR, "pipeline.pkl")
+DEFAULT_OUTPUT = os.path.join(DATA_DIR, "pipeline_pruned.pkl")
+
+# sklearn's leaf markers (sklearn.tree._tree.TREE_LEAF / TREE_UNDEFINED)
+TREE_LEAF = -1
+TREE_UNDEFINED = -2
+
+
+def _parse_depths(value: str) -> List[Optional[int]]:
+    depths = []
+    for part in value.split(","):
+        part = part.strip().lower()
+        depths.append(None if part in ("none", "full", "") else int(part))
+    return depths
+
+
+def _parse_ints(value: str) -> List[int]:
+    return [int(p) for p in value.split(",") if p.strip()]
+
+
+def cap_tree_depth(tree: Any, max_depth: int) -> Any:
+    """
+    Return a compacted copy of a fitted sklearn Tree with every node deeper than
+    max_depth removed. Internal nodes at the cap become leaves; their stored
+    value is already the mean of the samples that reached them, so predictions
+    are exactly what a depth-limited tree grown the same way would return.
+    """
+    state = tree.__getstate__()
+    nodes = state["nodes"]
+    values = state["values"]
+
+    keep: List[int] = []
+    depth_of = {0: 0}
+    stack = [0]
+    while stack:
+        node = stack.pop()
+        keep.append(node)
+        depth = depth_of[node]
+        left, right = nodes["left_child"][node], nodes["right_child"][node]
+        if left != TREE_LEAF and depth < max_depth:
+            depth_of[right] = depth + 1
+            depth_of[left] = depth + 1
+            stack.append(right)
+            stack.append(left)
+
+    remap = np.full(len(nodes), TREE_LEAF, dtype=np.int64)
+    remap[keep] = np.arange(len(keep))
+
+    new_nodes = nodes[keep].copy()
+    internal = new_nodes["left_child"] != TREE_LEAF
+    capped = internal & (np.array([depth_of[n] for n in keep]) >= max_depth)
+    new_nodes["left_child"][internal] = remap[new_nodes["left_child"][internal]]
+    new_nodes["right_child"][internal] = remap[new_nodes["right_child"][internal]]
+    new_nodes["left_child"][capped] = TREE_LEAF
+    new_nodes["right_child"][capped] = TREE_LEAF
+    new_nodes["feature"][capped] = TREE_UNDEFINED
+    new_nodes["threshold"][capped] = TREE_UNDEFINED
+
+    new_state = dict(state)
+    new_state["nodes"] = new_nodes
+    new_state["values"] = values[keep].copy()
+    new_state["node_count"] = len(keep)
+    new_state["max_depth"] = min(state["max_depth"], max_depth)
+
+    cls, args = tree.__reduce__()[:2]
+    new_tree = cls(*args)
+    new_tree.__setstate__(new_state)
+    return new_tree
+
+
+def build_candidate(pipeline: Any, n_trees: int, max_depth: Optional[int]) -> Any:
+    """Return a copy of pipeline whose forest keeps the first n_trees, depth-capped."""
+    candidate = copy.deepcopy(pipeline)
+    model = candidate.named_steps["model"]
+    estimators = model.estimators_[:n_trees]
+    if max_depth is not None:
+        for est in estimators:
+            if est.tree_.max_depth > max_depth:
+                est.tree_ = cap_tree_depth(est.tree_, max_depth)
+            est.max_depth = max_depth
+    model.estimators_ = estimators
+    model.n_estimators = len(estimators)
+    # Single-row requests pay thread-pool dispatch for nothing with n_jobs=-1
+    model.n_jobs = 1
+    return candidate
+
+
+def measure_latency(pipeline: Any, sample: Any, repeats: int, warmup: int = 10) -> Dict[str, float]:
+    """Time single-row pipeline.predict calls the way the API issues them."""
+    for _ in range(warmup):
+        pipeline.predict(sample)
+    timings = np.empty(repeats)
+    for i in range(repeats):
+        start = time.perf_counter()
+        pipeline.predict(sample)
+        timings[i] = time.perf_counter() - start
+    timings *= 1000.0
+    return {
+        "p50_ms": float(np.percentile(timings, 50)),
+        "p99_ms": float(np.percentile(timings, 99)),
+        "mean_ms": float(timings.mean()),
+    }
+
+
+def pareto_front(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Candidates not dominated on (p99 latency, MAE), ordered by latency."""
+    front = []
+    best_mae = float("inf")
+    for r in sorted(results, key=lambda r: (r["p99_ms"], r["mae"])):
+        if r["mae"] < best_mae:
+            front.append(r)
+            best_mae = r["mae"]
+    return front
+
+
+def select_candidate(results: List[Dict[str, Any]], budget_ms: float, max_mae: float) -> Optional[Dict[str, Any]]:
+    """
+    Pick the cheapest candidate within budget whose MAE stays under max_mae;
+    otherwise fall back to the most accurate candidate that fits the budget.
+    """
+    within_budget = [r for r in results if r["p99_ms"] <= budget_ms]
+    if not within_budget:
+        return None
+    accurate = [r for r in within_budget if r["mae"] <= max_mae]
+    if accurate:
+        return min(accurate, key=lambda r: (r["p99_ms"], r["mae"]))
+    return min(within_budget, key=lambda r: (r["mae"], r["p99_ms"]))
+
+
+def evaluate(pipeline: Any, tree_counts: List[int], depths: List[Optional[int]], repeats: int) -> List[Dict[str, Any]]:
+    _, _, X_test, y_test = load_holdout_split()
+    y_true = y_test.to_numpy()
+    sample = X_test.iloc[[0]]
+
+    model = pipeline.named_steps["model"]
+    X_trans = pipeline.named_steps["preprocessor"].transform(X_test)
+    n_total = len(model.estimators_)
+    tree_counts = sorted({min(k, n_total) for k in tree_counts})
+
+    results = []
+    for depth in depths:
+        if depth is None:
+            trees = [est.tree_ for est in model.estimators_]
+        else:
+            trees = [cap_tree_depth(est.tree_, depth) if est.tree_.max_depth > depth else est.tree_
+                     for est in model.estimators_]
+        # Per-tree predictions once per depth; the first-k forest is a running mean
+        X32 = np.ascontiguousarray(X_trans, dtype=np.float32)
+        per_tree = np.column_stack([t.predict(X32)[:, 0] for t in trees])
+        running_mean = np.cumsum(per_tree, axis=1) / np.arange(1, n_total + 1)
+
+        for k in tree_counts:
+            candidate = build_candidate(pipeline, k, depth)
+            mae = float(np.mean(np.abs(running_mean[:, k - 1] - y_true)))
+            latency = measure_latency(candidate, sample, repeats)
+            forest = candidate.named_steps["model"]
+            results.append({
+                "n_trees": k,
+                "max_depth": depth,
+                "mae": mae,
+                "node_count": int(sum(e.tree_.node_count for e in forest.estimators_)),
+                "size_bytes": len(pickle.dumps(forest, protocol=pickle.HIGHEST_PROTOCOL)),
+                **latency,
+            })
+            print(f"  trees={k:>4} depth={str(depth):>4}  MAE={mae:7.2f}  "
+                  f"p50={latency['p50_ms']:6.2f}ms  p99={latency['p99_ms']:6.2f}ms  "
+                  f"size={results[-1]['size_bytes'] / 1024:8.1f}KiB")
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", default=DEFAULT_INPUT, help="pipeline to prune (default: data/pipeline.pkl)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="where to write the serving artifact")
+    parser.add_argument("--budget-ms", type=float, default=5.0, help="single-request p99 budget in milliseconds")
+    parser.add_argument("--mae-tolerance", type=float, default=1.0,
+                        help="allowed MAE increase (minutes) over the full forest")
+    parser.add_argument("--trees", type=_parse_ints, default=_parse_ints("10,25,50,100,150,200"))
+    parser.add_argument("--depths", type=_parse_depths, default=_parse_depths("none,12,10,8,6,4"))
+    parser.add_argument("--repeats", type=int, default=300, help="timed predictions per candidate")
+    args = parser.parse_args(argv)
+
+    pipeline = joblib.load(args.input)
+    model = pipeline.named_steps["model"]
+    print(f"Loaded {args.input}: {len(model.estimators_)} trees, "
+          f"max depth {max(e.tree_.max_depth for e in model.estimators_)}")
+
+    results = evaluate(pipeline, args.trees, args.depths, args.repeats)
+    # Reference is the untruncated forest when it was evaluated, else the best MAE seen
+    full = max(results, key=lambda r: (r["max_depth"] is None, r["n_trees"], -r["mae"]))
+    front = pareto_front(results)
+
+    print("\nPareto front (p99 latency vs MAE):")
+    for r in front:
+        print(f"  trees={r['n_trees']:>4} depth={str(r['max_depth']):>4}  MAE={r['mae']:7.2f}  p99={r['p99_ms']:6.2f}ms")
+
+    chosen = select_candidate(results, args.budget_ms, full["mae"] + args.mae_tolerance)
+    report = {
+        "input": os.path.abspath(args.input),
+        "budget_ms": args.budget_ms,
+        "mae_tolerance": args.mae_tolerance,
+        "reference": full,
+        "candidates": results,
+        "pareto_front": front,
+        "selected": chosen,
+    }
+    report_path = os.path.splitext(args.output)[0] + ".report.json"
+    with open(report_path, "w") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"\nWrote report to {report_path}")
+
+    if chosen is None:
+        print(f"No candidate meets the {args.budget_ms}ms p99 budget; artifact not written.")
+        return 1
+
+    artifact = build_candidate(pipeline, chosen["n_trees"], chosen["max_depth"])
+    joblib.dump(artifact, args.output)
+    print(f"Selected trees={chosen['n_trees']} depth={chosen['max_depth']} "
+          f"(MAE {chosen['mae']:.2f} vs {full['mae']:.2f}, p99 {chosen['p99_ms']:.2f}ms vs {full['p99_ms']:.2f}ms, "
+          f"{chosen['size_bytes'] / 1024:.0f}KiB vs {full['size_bytes'] / 1024:.0f}KiB)")
+    print(f"Wrote serving artifact to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
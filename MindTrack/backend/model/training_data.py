@@ -0,0 +1,89 @@
+"""
+Training data helpers shared by the model tooling scripts.
+
+Mirrors the feature engineering and temporal train/test split from
+mindtrack_improved.ipynb so that offline tools evaluate the saved pipeline
+against exactly the held-out rows the notebook reported metrics on.
+"""
+import os
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+DATASET_PATH = os.path.join(DATA_DIR, "dataset.csv")
+
+FEATURE_COLS = [
+    "TotalSteps",
+    "VeryActiveMinutes",
+    "FairlyActiveMinutes",
+    "LightlyActiveMinutes",
+    "SedentaryMinutes",
+    "Calories",
+    "total_active_minutes",
+    "avg_steps_7d",
+    "prev_day_sleep",
+    "is_weekend",
+]
+TARGET_COL = "minutes_asleep"
+
+
+def load_feature_frame(dataset_path: str = DATASET_PATH) -> pd.DataFrame:
+    """Load dataset.csv and add the derived features used by the pipeline."""
+    df = pd.read_csv(dataset_path)
+
+    if "ActivityDate" in df.columns:
+        df["date"] = pd.to_datetime(df["ActivityDate"], errors="coerce").dt.date
+    else:
+        df["date"] = pd.to_datetime(df["date"], errors="coerce").dt.date
+
+    for c in ["TotalSteps", "VeryActiveMinutes", "FairlyActiveMinutes", "LightlyActiveMinutes",
+              "SedentaryMinutes", "Calories", TARGET_COL]:
+        if c not in df.columns:
+            df[c] = np.nan
+        df[c] = pd.to_numeric(df[c], errors="coerce")
+
+    df["total_active_minutes"] = df[["VeryActiveMinutes", "FairlyActiveMinutes", "LightlyActiveMinutes"]].sum(axis=1)
+    df["is_weekend"] = pd.to_datetime(df["date"]).dt.weekday.isin([5, 6]).astype(int)
+
+    if "Id" in df.columns:
+        df["Id"] = df["Id"].astype(str)
+        df = df.sort_values(["Id", "date"])
+        df["avg_steps_7d"] = df.groupby("Id")["TotalSteps"].transform(lambda x: x.rolling(7, min_periods=1).mean())
+        df["prev_day_sleep"] = df.groupby("Id")[TARGET_COL].shift(1)
+    else:
+        df = df.sort_values("date")
+        df["avg_steps_7d"] = df["TotalSteps"].rolling(7, min_periods=1).mean()
+        df["prev_day_sleep"] = df[TARGET_COL].shift(1)
+
+    # Same target cleaning as the notebook: drop missing and extreme sleep values
+    df = df.dropna(subset=[TARGET_COL])
+    df = df[(df[TARGET_COL] >= 60) & (df[TARGET_COL] <= 12 * 60)].copy()
+    df["date"] = pd.to_datetime(df["date"])
+    return df
+
+
+def temporal_split(df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Split on the 80th percentile of unique dates, as the notebook does."""
+    unique_dates = sorted(df["date"].dt.date.unique())
+    if len(unique_dates) < 5:
+        from sklearn.model_selection import train_test_split
+        return train_test_split(df, test_size=0.2, random_state=42)
+    split_date = unique_dates[int(len(unique_dates) * 0.8)]
+    train_df = df[df["date"].dt.date <= split_date].copy()
+    test_df = df[df["date"].dt.date > split_date].copy()
+    return train_df, test_df
+
+
+def load_holdout_split(dataset_path: str = DATASET_PATH):
+    """
+    Return (X_train, y_train, X_test, y_test) using the notebook's temporal split.
+    """
+    train_df, test_df = temporal_split(load_feature_frame(dataset_path))
+    return (
+        train_df[FEATURE_COLS],
+        train_df[TARGET_COL],
+        test_df[FEATURE_COLS],
+        test_df[TARGET_COL],
+    )
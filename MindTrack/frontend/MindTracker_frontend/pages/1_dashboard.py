@@ -329,30 +329,24 @@ with col2:
                     user_data = api.create_user(name=gen_name, timezone="UTC")
                     st.session_state.user_id = user_data.get("user_id", st.session_state.user_id)
 
-                # Save to backend per habit and collect errors
+                # Save every habit in one call; the backend awards badges as part of the write
                 errors = []
-                for habit, status in st.session_state.habit_entries.items():
-                    status_value = status.lower().replace(" ", "_")
-                    try:
-                        api.create_habit_entry(
-                            st.session_state.user_id,
-                            habit,
-                            today,
-                            status=status_value,
-                        )
-                    except Exception as e:
-                        errors.append(f"{habit}: {e}")
+                entries = [
+                    {"habit_name": habit, "entry_date": today, "status": status.lower().replace(" ", "_")}
+                    for habit, status in st.session_state.habit_entries.items()
+                ]
+                awarded = []
+                try:
+                    result = api.save_habit_entries(st.session_state.user_id, entries) if entries else {}
+                    awarded = result.get("awarded_badges", [])
+                except Exception as e:
+                    errors.append(str(e))
 
                 update_streaks()
 
-                # Check for badges
-                try:
-                    badge_result = api.check_and_award_badges(st.session_state.user_id)
-                    if badge_result.get("awarded_count", 0) > 0:
-                        st.balloons()
-                        st.success(f"🎉 You earned {badge_result['awarded_count']} new badge(s)!")
-                except Exception:
-                    pass
+                if awarded:
+                    st.balloons()
+                    st.success(f"🎉 You earned {len(awarded)} new badge(s)!")
 
                 if errors:
                     st.error("Failed to save some items:")
@@ -1,5 +1,14 @@
 import streamlit as st
 from datetime import time
+import sys
+import os
+
+# Add utils to path for API import
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+try:
+    from utils.api import api
+except ImportError:
+    api = None
 
 st.title("⏰ Goals & Reminders")
 
@@ -8,9 +17,33 @@ if "user_id" not in st.session_state or st.session_state.user_id is None:
     st.error("Please go back and create a demo user first.")
     st.stop()
 
-# Initialize reminders
-if "reminders" not in st.session_state:
-    st.session_state.reminders = []
+if api is None:
+    st.error("Backend API client is not available.")
+    st.stop()
+
+
+def load_reminders():
+    """Fetch the user's reminders from the backend (cached server-side per user)."""
+    try:
+        return api.get_reminders(st.session_state.user_id)
+    except Exception as e:
+        st.error(f"Could not load reminders: {e}")
+        return []
+
+
+def save(reminder):
+    """Create or update one reminder in a bulk call; returns the stored reminders.
+
+    Only the changed reminder is sent (replace=False): the listing shown here
+    may be stale, and pruning against it would delete reminders saved elsewhere.
+    """
+    item = {k: reminder[k] for k in ("reminder_id", "habit_name", "time_of_day", "repeat", "enabled")
+            if reminder.get(k) is not None}
+    result = api.sync_reminders(st.session_state.user_id, [item], replace=False)
+    return result.get("reminders", [])
+
+
+reminders = load_reminders()
 
 # ---------- Add Reminder Form ----------
 st.header("Set a new reminder")
@@ -21,32 +54,39 @@ with st.form("reminder_form"):
     else:
         st.warning("No habits selected. Go back to Home.")
         st.stop()
-    target = st.number_input("Target (e.g., minutes, glasses, pages)", min_value=1, value=1)
     frequency = st.selectbox("Frequency", ["Daily", "Weekly", "Custom"])
     reminder_time = st.time_input("Reminder Time", value=time(8, 0))
     enabled = st.checkbox("Enabled", value=True)
     submitted = st.form_submit_button("Save Reminder")
-    
+
     if submitted:
         reminder = {
-            "habit": habit,
-            "target": target,
-            "frequency": frequency,
-            "time": str(reminder_time),
-            "enabled": enabled
+            "habit_name": habit,
+            "repeat": frequency.lower(),
+            "time_of_day": reminder_time.strftime("%H:%M"),
+            "enabled": enabled,
         }
-        st.session_state.reminders.append(reminder)
-        st.success(f"Reminder set for '{habit}'!")
+        try:
+            reminders = save(reminder)
+            st.success(f"Reminder set for '{habit}'!")
+        except Exception as e:
+            st.error(f"Could not save reminder: {e}")
 
 # ---------- List of Active Reminders ----------
 st.header("Active Reminders")
 
-if st.session_state.reminders:
-    for idx, r in enumerate(st.session_state.reminders):
+if reminders:
+    for idx, r in enumerate(reminders):
         status = "✅ Enabled" if r["enabled"] else "❌ Disabled"
-        st.write(f"{idx+1}. {r['habit']} - {r['frequency']} at {r['time']} ({status})")
-        if st.button(f"Toggle {idx+1}", key=f"toggle_{idx}"):
-            r["enabled"] = not r["enabled"]
-            st.experimental_rerun()
+        st.write(f"{idx+1}. {r['habit_name']} - {r['repeat'].title()} at {r['time_of_day']} ({status})")
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button(f"Toggle {idx+1}", key=f"toggle_{r['reminder_id']}"):
+                api.update_reminder(r["reminder_id"], enabled=not r["enabled"])
+                st.rerun()
+        with col2:
+            if st.button(f"Delete {idx+1}", key=f"delete_{r['reminder_id']}"):
+                api.delete_reminder(r["reminder_id"])
+                st.rerun()
 else:
     st.info("No reminders set yet.")
@@ -71,6 +71,11 @@ class MindTrackAPI:
         }
         return self._request("POST", "/habits/", json=data)
     
+    def save_habit_entries(self, user_id: str, entries: List[Dict]) -> Dict:
+        """Create/update several entries in one call. Each entry: habit_name, entry_date, status.
+        The response lists any badges earned under 'awarded_badges'."""
+        return self._request("POST", "/habits/bulk", json={"user_id": user_id, "entries": entries})
+
     def get_user_habits(self, user_id: str, start_date: Optional[str] = None, 
                        end_date: Optional[str] = None) -> List[Dict]:
         """Get user's habit entries"""
@@ -103,6 +108,25 @@ class MindTrackAPI:
         """Check and award badges based on streaks"""
         return self._request("POST", f"/badges/award-check/{user_id}")
     
+    # Reminder endpoints
+    def get_reminders(self, user_id: str) -> List[Dict]:
+        """Get user's reminders"""
+        response = self._request("GET", f"/reminders/user/{user_id}")
+        return response if isinstance(response, list) else []
+
+    def sync_reminders(self, user_id: str, reminders: List[Dict], replace: bool = False) -> Dict:
+        """Create/update many of a user's reminders in one call; replace=True deletes the rest"""
+        return self._request("PUT", f"/reminders/user/{user_id}/bulk",
+                           json={"items": reminders, "replace": replace})
+
+    def update_reminder(self, reminder_id: str, **fields) -> Dict:
+        """Update time_of_day, repeat, habit_name or enabled of one reminder"""
+        return self._request("PUT", f"/reminders/{reminder_id}", json=fields)
+
+    def delete_reminder(self, reminder_id: str) -> None:
+        """Delete a reminder"""
+        self._request("DELETE", f"/reminders/{reminder_id}")
+
     # Insights endpoints
     def get_insights(self, user_id: str, days: int = 30) -> Dict:
         """Get comprehensive insights for user"""